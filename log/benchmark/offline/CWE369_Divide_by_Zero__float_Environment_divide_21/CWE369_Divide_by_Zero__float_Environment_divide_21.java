@@ -0,0 +1,206 @@
+/* TEMPLATE GENERATED TESTCASE FILE
+Filename: CWE369_Divide_by_Zero__float_Environment_divide_21.java
+Label Definition File: CWE369_Divide_by_Zero__float.label.xml
+Template File: sources-sinks-21.tmpl.java
+*/
+/*
+ * @description
+ * CWE: 369 Divide by zero
+ * BadSource: Environment Read data from an environment variable
+ * GoodSource: A hardcoded non-zero number (two)
+ * Sinks: divide
+ *    GoodSink: Check for zero before dividing
+ *    BadSink : Dividing by a value that may be zero
+ * Flow Variant: 21 Control flow: Flow controlled by value of a private variable. All functions contained in one file.
+ *
+ * */
+
+package testcases.CWE369_Divide_by_Zero.s01;
+import testcasesupport.*;
+
+import java.util.logging.Level;
+
+public class CWE369_Divide_by_Zero__float_Environment_divide_21 extends AbstractTestCase
+{
+    /* The variable below is used to drive control flow in the sink function */
+    private boolean badPrivate = false;
+
+    public void bad() throws Throwable
+    {
+        float data;
+
+        data = -1.0f; /* Initialize data */
+
+        /* get environment variable ADD */
+        /* POTENTIAL FLAW: Read data from an environment variable */
+        {
+            String stringNumber = System.getenv("ADD");
+            if (stringNumber != null)
+            {
+                try
+                {
+                    data = Float.parseFloat(stringNumber.trim());
+                }
+                catch (NumberFormatException exceptNumberFormat)
+                {
+                    IO.logger.log(Level.WARNING, "Number format exception parsing data from string", exceptNumberFormat);
+                }
+            }
+        }
+
+        badPrivate = true;
+        badSink(data );
+    }
+
+    private void badSink(float data ) throws Throwable
+    {
+        if (badPrivate)
+        {
+            /* POTENTIAL FLAW: Possibly divide by zero */
+            int result = (int)(100.0 / data);
+            IO.writeLine(result);
+        }
+    }
+
+    /* The variables below are used to drive control flow in the sink functions. */
+    private boolean goodB2G1Private = false;
+    private boolean goodB2G2Private = false;
+    private boolean goodG2BPrivate = false;
+
+    public void good() throws Throwable
+    {
+        goodB2G1();
+        goodB2G2();
+        goodG2B();
+    }
+
+    /* goodB2G1() - use BadSource and GoodSink by setting the variable to false instead of true */
+    private void goodB2G1() throws Throwable
+    {
+        float data;
+
+        data = -1.0f; /* Initialize data */
+
+        /* get environment variable ADD */
+        /* POTENTIAL FLAW: Read data from an environment variable */
+        {
+            String stringNumber = System.getenv("ADD");
+            if (stringNumber != null)
+            {
+                try
+                {
+                    data = Float.parseFloat(stringNumber.trim());
+                }
+                catch (NumberFormatException exceptNumberFormat)
+                {
+                    IO.logger.log(Level.WARNING, "Number format exception parsing data from string", exceptNumberFormat);
+                }
+            }
+        }
+
+        goodB2G1Private = false;
+        goodB2G1Sink(data );
+    }
+
+    private void goodB2G1Sink(float data ) throws Throwable
+    {
+        if (goodB2G1Private)
+        {
+            /* INCIDENTAL: CWE 561 Dead Code, the code below will never run */
+            IO.writeLine("Benign, fixed string");
+        }
+        else
+        {
+
+            /* FIX: Check for value of or near zero before dividing */
+            if (Math.abs(data) > 0.000001)
+            {
+                int result = (int)(100.0 / data);
+                IO.writeLine(result);
+            }
+            else
+            {
+                IO.writeLine("This would result in a divide by zero");
+            }
+
+        }
+    }
+
+    /* goodB2G2() - use BadSource and GoodSink by reversing the blocks in the if in the sink function */
+    private void goodB2G2() throws Throwable
+    {
+        float data;
+
+        data = -1.0f; /* Initialize data */
+
+        /* get environment variable ADD */
+        /* POTENTIAL FLAW: Read data from an environment variable */
+        {
+            String stringNumber = System.getenv("ADD");
+            if (stringNumber != null)
+            {
+                try
+                {
+                    data = Float.parseFloat(stringNumber.trim());
+                }
+                catch (NumberFormatException exceptNumberFormat)
+                {
+                    IO.logger.log(Level.WARNING, "Number format exception parsing data from string", exceptNumberFormat);
+                }
+            }
+        }
+
+        goodB2G2Private = true;
+        goodB2G2Sink(data );
+    }
+
+    private void goodB2G2Sink(float data ) throws Throwable
+    {
+        if (goodB2G2Private)
+        {
+            /* FIX: Check for value of or near zero before dividing */
+            if (Math.abs(data) > 0.000001)
+            {
+                int result = (int)(100.0 / data);
+                IO.writeLine(result);
+            }
+            else
+            {
+                IO.writeLine("This would result in a divide by zero");
+            }
+        }
+    }
+
+    /* goodG2B() - use GoodSource and BadSink */
+    private void goodG2B() throws Throwable
+    {
+        float data;
+
+        /* FIX: Use a hardcoded number that won't a divide by zero */
+        data = 2.0f;
+
+        goodG2BPrivate = true;
+        goodG2BSink(data );
+    }
+
+    private void goodG2BSink(float data ) throws Throwable
+    {
+        if (goodG2BPrivate)
+        {
+            /* POTENTIAL FLAW: Possibly divide by zero */
+            int result = (int)(100.0 / data);
+            IO.writeLine(result);
+        }
+    }
+
+    /* Below is the main(). It is only used when building this testcase on
+     * its own for testing or for building a binary to use in testing binary
+     * analysis tools. It is not used when compiling all the testcases as one
+     * application, which is how source code analysis tools are tested.
+     */
+    public static void main(String[] args) throws ClassNotFoundException,
+           InstantiationException, IllegalAccessException
+    {
+        mainFromParent(args);
+    }
+}
@@ -0,0 +1,145 @@
+/* TEMPLATE GENERATED TESTCASE FILE
+Filename: CWE78_OS_Command_Injection__Environment_02.java
+Label Definition File: CWE78_OS_Command_Injection.label.xml
+Template File: sources-sink-02.tmpl.java
+*/
+/*
+* @description
+* CWE: 78 OS Command Injection
+* BadSource: Environment Read data from an environment variable
+* GoodSource: A hardcoded string
+* BadSink: exec dynamic command execution with Runtime.getRuntime().exec()
+* Flow Variant: 02 Control flow: if(true) and if(false)
+*
+* */
+
+package testcases.CWE78_OS_Command_Injection;
+
+import testcasesupport.*;
+
+import javax.servlet.http.*;
+
+public class CWE78_OS_Command_Injection__Environment_02 extends AbstractTestCase
+{
+    /* uses badsource and badsink */
+    public void bad() throws Throwable
+    {
+        String data;
+        if (true)
+        {
+            /* get environment variable ADD */
+            /* POTENTIAL FLAW: Read data from an environment variable */
+            data = System.getenv("ADD");
+        }
+        else
+        {
+            /* INCIDENTAL: CWE 561 Dead Code, the code below will never run
+             * but ensure data is inititialized before the Sink to avoid compiler errors */
+            data = null;
+        }
+
+        String osCommand;
+        if(System.getProperty("os.name").toLowerCase().indexOf("win") >= 0)
+        {
+            /* running on Windows */
+            osCommand = "c:\\WINDOWS\\SYSTEM32\\cmd.exe /c dir ";
+        }
+        else
+        {
+            /* running on non-Windows */
+            osCommand = "/bin/ls ";
+        }
+
+        /* POTENTIAL FLAW: command injection */
+        Process process = Runtime.getRuntime().exec(osCommand + data);
+        process.waitFor();
+
+    }
+
+    /* goodG2B1() - use goodsource and badsink by changing true to false */
+    private void goodG2B1() throws Throwable
+    {
+        String data;
+        if (false)
+        {
+            /* INCIDENTAL: CWE 561 Dead Code, the code below will never run
+             * but ensure data is inititialized before the Sink to avoid compiler errors */
+            data = null;
+        }
+        else
+        {
+
+            /* FIX: Use a hardcoded string */
+            data = "foo";
+
+        }
+
+        String osCommand;
+        if(System.getProperty("os.name").toLowerCase().indexOf("win") >= 0)
+        {
+            /* running on Windows */
+            osCommand = "c:\\WINDOWS\\SYSTEM32\\cmd.exe /c dir ";
+        }
+        else
+        {
+            /* running on non-Windows */
+            osCommand = "/bin/ls ";
+        }
+
+        /* POTENTIAL FLAW: command injection */
+        Process process = Runtime.getRuntime().exec(osCommand + data);
+        process.waitFor();
+
+    }
+
+    /* goodG2B2() - use goodsource and badsink by reversing statements in if */
+    private void goodG2B2() throws Throwable
+    {
+        String data;
+        if (true)
+        {
+            /* FIX: Use a hardcoded string */
+            data = "foo";
+        }
+        else
+        {
+            /* INCIDENTAL: CWE 561 Dead Code, the code below will never run
+             * but ensure data is inititialized before the Sink to avoid compiler errors */
+            data = null;
+        }
+
+        String osCommand;
+        if(System.getProperty("os.name").toLowerCase().indexOf("win") >= 0)
+        {
+            /* running on Windows */
+            osCommand = "c:\\WINDOWS\\SYSTEM32\\cmd.exe /c dir ";
+        }
+        else
+        {
+            /* running on non-Windows */
+            osCommand = "/bin/ls ";
+        }
+
+        /* POTENTIAL FLAW: command injection */
+        Process process = Runtime.getRuntime().exec(osCommand + data);
+        process.waitFor();
+
+    }
+
+    public void good() throws Throwable
+    {
+        goodG2B1();
+        goodG2B2();
+    }
+
+    /* Below is the main(). It is only used when building this testcase on
+     * its own for testing or for building a binary to use in testing binary
+     * analysis tools. It is not used when compiling all the testcases as one
+     * application, which is how source code analysis tools are tested.
+     */
+    public static void main(String[] args) throws ClassNotFoundException,
+           InstantiationException, IllegalAccessException
+    {
+        mainFromParent(args);
+    }
+}
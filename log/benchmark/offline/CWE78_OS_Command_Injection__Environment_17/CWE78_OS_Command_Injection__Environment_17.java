@@ -0,0 +1,95 @@
+/* TEMPLATE GENERATED TESTCASE FILE
+Filename: CWE78_OS_Command_Injection__Environment_17.java
+Label Definition File: CWE78_OS_Command_Injection.label.xml
+Template File: sources-sink-17.tmpl.java
+*/
+/*
+* @description
+* CWE: 78 OS Command Injection
+* BadSource: Environment Read data from an environment variable
+* GoodSource: A hardcoded string
+* BadSink: exec dynamic command execution with Runtime.getRuntime().exec()
+* Flow Variant: 17 Control flow: for loops
+*
+* */
+
+package testcases.CWE78_OS_Command_Injection;
+
+import testcasesupport.*;
+
+import javax.servlet.http.*;
+
+public class CWE78_OS_Command_Injection__Environment_17 extends AbstractTestCase
+{
+    /* uses badsource and badsink */
+    public void bad() throws Throwable
+    {
+        String data;
+
+        /* get environment variable ADD */
+        /* POTENTIAL FLAW: Read data from an environment variable */
+        data = System.getenv("ADD");
+
+        for (int i = 0; i < 1; i++)
+        {
+            String osCommand;
+            if(System.getProperty("os.name").toLowerCase().indexOf("win") >= 0)
+            {
+                /* running on Windows */
+                osCommand = "c:\\WINDOWS\\SYSTEM32\\cmd.exe /c dir ";
+            }
+            else
+            {
+                /* running on non-Windows */
+                osCommand = "/bin/ls ";
+            }
+            /* POTENTIAL FLAW: command injection */
+            Process process = Runtime.getRuntime().exec(osCommand + data);
+            process.waitFor();
+        }
+    }
+
+    /* goodG2B() - use goodsource and badsink by reversing the block outside the
+     * for statement with the one in the for statement */
+    private void goodG2B() throws Throwable
+    {
+        String data;
+
+        /* FIX: Use a hardcoded string */
+        data = "foo";
+
+        for (int i = 0; i < 1; i++)
+        {
+            String osCommand;
+            if(System.getProperty("os.name").toLowerCase().indexOf("win") >= 0)
+            {
+                /* running on Windows */
+                osCommand = "c:\\WINDOWS\\SYSTEM32\\cmd.exe /c dir ";
+            }
+            else
+            {
+                /* running on non-Windows */
+                osCommand = "/bin/ls ";
+            }
+            /* POTENTIAL FLAW: command injection */
+            Process process = Runtime.getRuntime().exec(osCommand + data);
+            process.waitFor();
+        }
+    }
+
+    public void good() throws Throwable
+    {
+        goodG2B();
+    }
+
+    /* Below is the main(). It is only used when building this testcase on
+     * its own for testing or for building a binary to use in testing binary
+     * analysis tools. It is not used when compiling all the testcases as one
+     * application, which is how source code analysis tools are tested.
+     */
+    public static void main(String[] args) throws ClassNotFoundException,
+           InstantiationException, IllegalAccessException
+    {
+        mainFromParent(args);
+    }
+}
@@ -0,0 +1,186 @@
+/* TEMPLATE GENERATED TESTCASE FILE
+Filename: CWE78_OS_Command_Injection__Environment_21.java
+Label Definition File: CWE78_OS_Command_Injection.label.xml
+Template File: sources-sink-21.tmpl.java
+*/
+/*
+ * @description
+ * CWE: 78 OS Command Injection
+ * BadSource: Environment Read data from an environment variable
+ * GoodSource: A hardcoded string
+ * Sinks: exec
+ *    BadSink : dynamic command execution with Runtime.getRuntime().exec()
+ * Flow Variant: 21 Control flow: Flow controlled by value of a private variable. All functions contained in one file.
+ *
+ * */
+
+package testcases.CWE78_OS_Command_Injection;
+
+import testcasesupport.*;
+
+import javax.servlet.http.*;
+
+public class CWE78_OS_Command_Injection__Environment_21 extends AbstractTestCase
+{
+    /* The variable below is used to drive control flow in the source function */
+    private boolean badPrivate = false;
+
+    public void bad() throws Throwable
+    {
+        String data;
+
+        badPrivate = true;
+        data = bad_source();
+
+        String osCommand;
+        if(System.getProperty("os.name").toLowerCase().indexOf("win") >= 0)
+        {
+            /* running on Windows */
+            osCommand = "c:\\WINDOWS\\SYSTEM32\\cmd.exe /c dir ";
+        }
+        else
+        {
+            /* running on non-Windows */
+            osCommand = "/bin/ls ";
+        }
+
+        /* POTENTIAL FLAW: command injection */
+        Process process = Runtime.getRuntime().exec(osCommand + data);
+        process.waitFor();
+
+    }
+
+    private String bad_source() throws Throwable
+    {
+        String data;
+
+        if (badPrivate)
+        {
+            /* get environment variable ADD */
+            /* POTENTIAL FLAW: Read data from an environment variable */
+            data = System.getenv("ADD");
+        }
+        else
+        {
+            /* INCIDENTAL: CWE 561 Dead Code, the code below will never run
+             * but ensure data is inititialized before the Sink to avoid compiler errors */
+            data = null;
+        }
+
+        return data;
+    }
+
+    /* The variables below are used to drive control flow in the source functions. */
+    private boolean goodG2B1_private = false;
+    private boolean goodG2B2_private = false;
+
+    public void good() throws Throwable
+    {
+        goodG2B1();
+        goodG2B2();
+    }
+
+    /* goodG2B1() - use goodsource and badsink by setting the variable to false instead of true */
+    private void goodG2B1() throws Throwable
+    {
+        String data;
+
+        goodG2B1_private = false;
+        data = goodG2B1_source();
+
+        String osCommand;
+        if(System.getProperty("os.name").toLowerCase().indexOf("win") >= 0)
+        {
+            /* running on Windows */
+            osCommand = "c:\\WINDOWS\\SYSTEM32\\cmd.exe /c dir ";
+        }
+        else
+        {
+            /* running on non-Windows */
+            osCommand = "/bin/ls ";
+        }
+
+        /* POTENTIAL FLAW: command injection */
+        Process process = Runtime.getRuntime().exec(osCommand + data);
+        process.waitFor();
+
+    }
+
+    private String goodG2B1_source() throws Throwable
+    {
+        String data = null;
+
+        if (goodG2B1_private)
+        {
+            /* INCIDENTAL: CWE 561 Dead Code, the code below will never run
+             * but ensure data is inititialized before the Sink to avoid compiler errors */
+            data = null;
+        }
+        else
+        {
+
+            /* FIX: Use a hardcoded string */
+            data = "foo";
+
+        }
+
+        return data;
+    }
+
+    /* goodG2B2() - use goodsource and badsink by reversing the blocks in the if in the sink function */
+    private void goodG2B2() throws Throwable
+    {
+        String data;
+
+        goodG2B2_private = true;
+        data = goodG2B2_source();
+
+        String osCommand;
+        if(System.getProperty("os.name").toLowerCase().indexOf("win") >= 0)
+        {
+            /* running on Windows */
+            osCommand = "c:\\WINDOWS\\SYSTEM32\\cmd.exe /c dir ";
+        }
+        else
+        {
+            /* running on non-Windows */
+            osCommand = "/bin/ls ";
+        }
+
+        /* POTENTIAL FLAW: command injection */
+        Process process = Runtime.getRuntime().exec(osCommand + data);
+        process.waitFor();
+
+    }
+
+    private String goodG2B2_source() throws Throwable
+    {
+        String data = null;
+
+        if (goodG2B2_private)
+        {
+            /* FIX: Use a hardcoded string */
+            data = "foo";
+        }
+        else
+        {
+            /* INCIDENTAL: CWE 561 Dead Code, the code below will never run
+             * but ensure data is inititialized before the Sink to avoid compiler errors */
+            data = null;
+        }
+
+        return data;
+    }
+
+    /* Below is the main(). It is only used when building this testcase on
+     * its own for testing or for building a binary to use in testing binary
+     * analysis tools. It is not used when compiling all the testcases as one
+     * application, which is how source code analysis tools are tested.
+     */
+    public static void main(String[] args) throws ClassNotFoundException,
+           InstantiationException, IllegalAccessException
+    {
+        mainFromParent(args);
+    }
+
+}
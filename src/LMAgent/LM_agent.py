@@ -1,6 +1,8 @@
-import json
 from pathlib import Path
 from utility.function import *
+from LMAgent.prompt_registry import PromptRegistry, PromptConfig
+from utility.metrics import Metrics
+from utility.event_log import EventLog
 
 
 class LMAgent:
@@ -12,6 +14,8 @@ class LMAgent:
         self.total_input_token_cost = 0
         self.total_output_token_cost = 0
         self.time_cost = 0
+        self.metrics = Metrics()
+        self.event_log = EventLog()
         self.prompt_config_file_base = (
             Path(__file__).resolve().parent.parent.absolute() / "prompt"
         )
@@ -22,17 +26,15 @@ class LMAgent:
         """
         Construct the prompt according to prompt config file
         """
-        with open(self.prompt_config_file_base / config_file_path, "r") as read_file:
-            dump_config_dict = json.load(read_file)
-        system_role = dump_config_dict["system_role"]
-        prompt = dump_config_dict["task"]
-        prompt += "\n" + "\n".join(dump_config_dict["analysis_rules"])
-        prompt += "\n" + "\n".join(dump_config_dict["analysis_examples"])
-        prompt += "\n" + "".join(dump_config_dict["meta_prompts"])
-        prompt += "\n" + "".join(dump_config_dict["output_constraints"])
-        prompt += "\n" + "\n".join(dump_config_dict["output_examples"])
-        prompt += "\n" + "Here is the program:"
-        return system_role, prompt
+        prompt_config = self.load_prompt_config(config_file_path)
+        return prompt_config.system_role, prompt_config.general_prompt
+
+    @staticmethod
+    def load_prompt_config(config_file_path: str) -> PromptConfig:
+        """
+        Fetch the prompt config shared by all the agents in the process
+        """
+        return PromptRegistry.get(config_file_path)
 
     @staticmethod
     def process_response_item_lines(
@@ -70,3 +72,14 @@ class LMAgent:
                 continue
             ans.append(s)
         return ans
+
+    @staticmethod
+    def is_yes_no_answered(response: str) -> bool:
+        """
+        Check whether a partial response already determines the first Yes/No in the complete response,
+        which is the answer parsed by process_yes_no_list_in_response.
+        The last word is ignored until it is followed by a delimiter, as it may be incomplete, e.g., "Ye".
+        :param response: the partial response received from a stream
+        """
+        end = max(response.rfind(" "), response.rfind("\n"), response.rfind(","))
+        return len(LMAgent.process_yes_no_list_in_response(response[: end + 1])) > 0
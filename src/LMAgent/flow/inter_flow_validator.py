@@ -1,6 +1,5 @@
 import sys
 from os import path
-import json
 import subprocess
 
 sys.path.append(path.dirname(path.dirname(path.dirname(path.abspath(__file__)))))
@@ -10,6 +9,7 @@ from TSAgent.TS_analyzer import TSAnalyzer
 from utility.llm import *
 from utility.function import *
 from utility.environment import Environment
+from utility.event_log import EventLog
 from typing import List, Tuple, Set
 
 
@@ -18,14 +18,31 @@ class InterFlowValidator(LMAgent):
     InterFlowValidator class for checking whether given inter-procedural paths are feasible or not
     """
 
-    def __init__(self, file_path: str, online_model_name, openai_key, temp) -> None:
+    def __init__(
+        self,
+        file_path: str,
+        online_model_name,
+        openai_key,
+        temp,
+        is_prefix_caching: bool = False,
+        is_streaming: bool = False,
+    ) -> None:
         super().__init__()
         self.ifv_file_path = file_path
+        self.prompt_config = self.load_prompt_config(self.ifv_file_path)
         system_role = self.fetch_system_role()
         self.response_location_check = ""
         self.response_path_check = ""
         self.openai_key = openai_key
-        self.model = LLM(online_model_name, self.openai_key, temp, system_role)
+        # If is_streaming is True, the answers of the LLM path checks are streamed and read until Yes/No appears
+        self.model = LLM(
+            online_model_name,
+            self.openai_key,
+            temp,
+            system_role,
+            is_prefix_caching,
+            is_streaming,
+        )
 
     def apply(
         self,
@@ -40,33 +57,32 @@ class InterFlowValidator(LMAgent):
         determine the feasibility of the paths induced by bug candidates
         """
         if is_solver_using:
-            print("Applying path checker with solver...")
-            is_path_feasible_with_solver = self.apply_path_check_with_solver(
-                environment,
-                ts_analyzer,
-                bug_candidate,
-                bug_name,
-                solving_refine_number,
+            with self.metrics.span("solving"):
+                is_path_feasible_with_solver = self.apply_path_check_with_solver(
+                    environment,
+                    ts_analyzer,
+                    bug_candidate,
+                    bug_name,
+                    solving_refine_number,
+                )
+            # The verdict is None if the solver-aided path checker fails
+            self.event_log.emit(
+                "path_check",
+                EventLog.DETAIL,
+                method="solver",
+                verdict=is_path_feasible_with_solver,
             )
-
             if is_path_feasible_with_solver is not None:
-                print("Solver-aided path checker succeeded...")
                 return is_path_feasible_with_solver
 
-            print("Solver-aided path checker failed...")
-            print("Applying path reachability check with LLM...")
-            is_path_feasible = self.apply_reachable_program_path_check_with_LLM(
-                environment, ts_analyzer, bug_candidate
-            )
-            print("LLM-aided path checker succeeded...")
-            return is_path_feasible
-        else:
-            print("Applying path reachability check with LLM...")
+        with self.metrics.span("path_check_with_llm"):
             is_path_feasible = self.apply_reachable_program_path_check_with_LLM(
                 environment, ts_analyzer, bug_candidate
             )
-            print("LLM-aided path checker succeeded...")
-            return is_path_feasible
+        self.event_log.emit(
+            "path_check", EventLog.DETAIL, method="llm", verdict=is_path_feasible
+        )
+        return is_path_feasible
 
     def apply_path_check_with_solver(
         self,
@@ -286,6 +302,7 @@ class InterFlowValidator(LMAgent):
 
             try:
                 # Run the solving program using subprocess
+                self.metrics.increment("solver_runs")
                 completed_process = subprocess.run(
                     ["python", "-c", solving_program], capture_output=True, text=True
                 )
@@ -299,7 +316,7 @@ class InterFlowValidator(LMAgent):
                     run_output = completed_process.stderr.strip()
             except Exception as e:
                 # Handle any exceptions that occur during program execution
-                print(f"An error occurred: {str(e)}")
+                self.event_log.emit("error", EventLog.RUN, message=str(e))
                 run_output = completed_process.stdout.strip()
 
             # refine the solving program until we can obtain SAT or UNSAT as the result
@@ -314,6 +331,7 @@ class InterFlowValidator(LMAgent):
                     )
                     try:
                         # Run the program using subprocess
+                        self.metrics.increment("solver_runs")
                         completed_process = subprocess.run(
                             ["python", "-c", new_program],
                             capture_output=True,
@@ -329,7 +347,7 @@ class InterFlowValidator(LMAgent):
                             run_output = completed_process.stderr.strip()
                     except Exception as e:
                         # Handle any exceptions that occur during program execution
-                        print(f"An error occurred: {str(e)}")
+                        self.event_log.emit("error", EventLog.RUN, message=str(e))
                         run_output = completed_process.stdout.strip()
                     if run_output in {"UNSAT", "SAT"}:
                         break
@@ -351,15 +369,18 @@ class InterFlowValidator(LMAgent):
         """
         Determine the feasibility of the path using LLM
         """
-        message = self.construct_prompt_for_path_check(
+        prefix, message = self.construct_prompt_for_path_check(
             environment, ts_analyzer, bug_candidate
         )
 
         while True:
 
-            response, input_token_cost, output_token_cost = self.model.infer(message)
+            response, input_token_cost, output_token_cost = self.model.infer(
+                message, True, prefix, LMAgent.is_yes_no_answered
+            )
             self.total_input_token_cost += input_token_cost
             self.total_output_token_cost += output_token_cost
+            self.metrics.increment("llm_calls")
             self.response_path_check = response
 
             yes_no_vector = self.process_yes_no_list_in_response(
@@ -395,10 +416,6 @@ class InterFlowValidator(LMAgent):
         bug_candidate: List[Tuple[int, LocalValue]],
         condition_strs: set[str],
     ) -> str:
-        with open(self.prompt_config_file_base / self.ifv_file_path, "r") as read_file:
-            dump_config_dict = json.load(read_file)
-        global_var_info = "\n".join(dump_config_dict["global_variable_info"])
-
         fun_history = set([])
         fields_dic = {}
         for function_id, local_value in bug_candidate:
@@ -432,8 +449,8 @@ class InterFlowValidator(LMAgent):
             for static_field in static_field_dic:
                 fields_strs.append(" - " + static_field_dic[static_field] + "\n")
 
-            global_var_info = global_var_info.replace(
-                "<GLOBAL_VAR>", "\n".join(fields_strs)
+            global_var_info = self.prompt_config.global_variable_info.render(
+                {"GLOBAL_VAR": "\n".join(fields_strs)}
             )
         return global_var_info
 
@@ -442,9 +459,10 @@ class InterFlowValidator(LMAgent):
         environment: Environment,
         ts_analyzer: TSAnalyzer,
         bug_candidate: List[Tuple[int, LocalValue]],
-    ) -> str:
+    ) -> Tuple[str, str]:
         """
         Construct the prompt for path check using LLMs
+        :return: the static prefix and the dynamic suffix of the prompt
         """
         code_str = ""
         function_ids = set([])
@@ -458,10 +476,6 @@ class InterFlowValidator(LMAgent):
                     + "\n"
                 )
 
-        with open(self.prompt_config_file_base / self.ifv_file_path, "r") as read_file:
-            dump_config_dict = json.load(read_file)
-        question_template = dump_config_dict["question_template"]
-
         path_strs = InterFlowValidator.summarize_path_info(environment, bug_candidate)
         path_str = "```\n" + " --> ".join(path_strs) + "\n```\n"
 
@@ -484,44 +498,32 @@ class InterFlowValidator(LMAgent):
 
         (function_id_start, value_start) = bug_candidate[0]
         (function_id_end, value_end) = bug_candidate[-1]
-        question = (
-            question_template.replace("<VAR_1>", value_start.name)
-            .replace("<VAR_2>", value_end.name)
-            .replace("<PATH>", path_str)
-            .replace("<LINE_1>", str(value_start.line_number))
-            .replace(
-                "<FUNCTION_1>",
-                environment.analyzed_functions[function_id_start].function_name,
-            )
-            .replace("<LINE_2>", str(value_end.line_number))
-            .replace(
-                "<FUNCTION_2>",
-                environment.analyzed_functions[function_id_end].function_name,
-            )
+        question = self.prompt_config.question_template.render(
+            {
+                "VAR_1": value_start.name,
+                "VAR_2": value_end.name,
+                "PATH": path_str,
+                "LINE_1": str(value_start.line_number),
+                "FUNCTION_1": environment.analyzed_functions[
+                    function_id_start
+                ].function_name,
+                "LINE_2": str(value_end.line_number),
+                "FUNCTION_2": environment.analyzed_functions[
+                    function_id_end
+                ].function_name,
+            }
         )
 
-        answer_format = self.fetch_path_check_answer_format()
-
-        prompt = dump_config_dict["task"]
-        prompt += "\n" + "\n".join(dump_config_dict["analysis_rules"])
-        prompt += "\n" + "\n".join(dump_config_dict["additional_fact"])
-        prompt += "\n" + "\n".join(dump_config_dict["analysis_examples"])
-        prompt += "\n" + "".join(dump_config_dict["meta_prompts"])
-        prompt = (
-            prompt.replace(
-                "<PROGRAM>", self.extract_function_in_trace(environment, bug_candidate)
-            )
-            .replace("<QUESTION>", question)
-            .replace(
-                "<INIT_GLOBAL_INFO>",
-                self.extract_global_variable_info(
+        return self.prompt_config.prompt_path_check.render(
+            {
+                "PROGRAM": self.extract_function_in_trace(environment, bug_candidate),
+                "QUESTION": question,
+                "INIT_GLOBAL_INFO": self.extract_global_variable_info(
                     environment, ts_analyzer, bug_candidate, condition_strs
                 ),
-            )
-            .replace("<ANSWER>", answer_format)
-            .replace("<PATH_BRANCH_INFO>", info_str)
+                "PATH_BRANCH_INFO": info_str,
+            }
         )
-        return prompt
 
     @staticmethod
     def summarize_path_info(
@@ -673,16 +675,10 @@ class InterFlowValidator(LMAgent):
         return switch_info_strs
 
     def fetch_system_role(self):
-        with open(self.prompt_config_file_base / self.ifv_file_path, "r") as read_file:
-            dump_config_dict = json.load(read_file)
-        role = dump_config_dict["system_role"]
-        return role
+        return self.prompt_config.system_role
 
     def fetch_path_check_answer_format(self) -> str:
-        with open(self.prompt_config_file_base / self.ifv_file_path, "r") as read_file:
-            dump_config_dict = json.load(read_file)
-        answer_format = "\n".join(dump_config_dict["answer_format"])
-        return answer_format
+        return self.prompt_config.answer_format
 
     @staticmethod
     def execute_solving_program(solving_program: str):
@@ -707,7 +703,9 @@ class InterFlowValidator(LMAgent):
     def construct_solving_program(
         self, line_number: int, path_description: str, val_literal: str
     ):
-        print("Constructing solving program...")
+        self.event_log.emit(
+            "solving_program", EventLog.DETAIL, action="construct", line=line_number
+        )
         message = (
             "Please write the path condition for the line "
             + str(line_number)
@@ -778,9 +776,12 @@ class InterFlowValidator(LMAgent):
         program = ""
         while cnt < 3:
             cnt += 1
-            response, input_token_cost, output_token_cost = self.model.infer(message)
+            response, input_token_cost, output_token_cost = self.model.infer(
+                message, is_program=True
+            )
             self.total_input_token_cost += input_token_cost
             self.total_output_token_cost += output_token_cost
+            self.metrics.increment("llm_calls")
             response = response.replace("```python", "```")
 
             if response.count("```") != 2:
@@ -794,7 +795,7 @@ class InterFlowValidator(LMAgent):
         return program
 
     def refine_solving_program(self, previous_solving_program: str, error_message: str):
-        print("Refining solving program...")
+        self.event_log.emit("solving_program", EventLog.DETAIL, action="refine")
         debug_message = "```\n" + previous_solving_program + "\n```\n"
         debug_message += (
             "When I run the program, we found the following error message: \n"
@@ -814,9 +815,10 @@ class InterFlowValidator(LMAgent):
                 new_response,
                 input_token_cost,
                 output_token_cost,
-            ) = self.model.infer(debug_message)
+            ) = self.model.infer(debug_message, is_program=True)
             self.total_input_token_cost += input_token_cost
             self.total_output_token_cost += output_token_cost
+            self.metrics.increment("llm_calls")
 
             new_response = new_response.replace("```python", "```")
 
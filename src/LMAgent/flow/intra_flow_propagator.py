@@ -1,11 +1,12 @@
 import sys
 from os import path
-import json
 
 sys.path.append(path.dirname(path.dirname(path.dirname(path.abspath(__file__)))))
 from LMAgent.LM_agent import LMAgent
+from LMAgent.prompt_registry import PromptLayout
 from utility.llm import *
 from utility.function import *
+from utility.event_log import EventLog
 from typing import List, Tuple
 
 
@@ -14,12 +15,29 @@ class IntraFlowPropagator(LMAgent):
     IntraFlowPropagator class for checking whether source can flow to sink in the SSI function
     """
 
-    def __init__(self, file_path, online_model_name, openai_key, temp) -> None:
+    def __init__(
+        self,
+        file_path,
+        online_model_name,
+        openai_key,
+        temp,
+        is_prefix_caching: bool = False,
+        is_streaming: bool = False,
+    ) -> None:
         super().__init__()
         self.ifp_file_path = file_path
+        self.prompt_config = self.load_prompt_config(self.ifp_file_path)
         system_role = self.fetch_system_role()
         self.openai_key = openai_key
-        self.model = LLM(online_model_name, self.openai_key, temp, system_role)
+        # If is_streaming is True, the answers are streamed and read until Yes/No appears
+        self.model = LLM(
+            online_model_name,
+            self.openai_key,
+            temp,
+            system_role,
+            is_prefix_caching,
+            is_streaming,
+        )
         self.prompt_fscot = self.construct_prompt_skeleton_fscot()
         self.prompt_no_fscot = self.construct_prompt_skeleton_no_fscot()
         self.response = ""
@@ -60,9 +78,9 @@ class IntraFlowPropagator(LMAgent):
         """
         reachable_pairs = []
         unreachable_pairs = []
-        with open(self.prompt_config_file_base / self.ifp_file_path, "r") as read_file:
-            dump_config_dict = json.load(read_file)
-        question_template = dump_config_dict["question_template"]
+        self.metrics.increment("pairs", len(srcs) * len(sinks))
+        question_template = self.prompt_config.question_template
+        prompt_layout = self.prompt_fscot if is_fscot else self.prompt_no_fscot
 
         for src in srcs:
             for sink in sinks:
@@ -75,6 +93,7 @@ class IntraFlowPropagator(LMAgent):
                 if is_fscot:
                     if self.is_must_unreachable(src, sink, function):
                         unreachable_pairs.append((src, sink))
+                        self.metrics.increment("pairs_pruned")
                         continue
 
                 # Avoid analyzing existing reachable pairs
@@ -87,6 +106,7 @@ class IntraFlowPropagator(LMAgent):
                         break
                 if is_exist_reachable:
                     reachable_pairs.append((src, sink))
+                    self.metrics.increment("pairs_reused")
                     continue
 
                 # Avoid analyzing existing unreachable pairs
@@ -99,15 +119,9 @@ class IntraFlowPropagator(LMAgent):
                         break
                 if is_exist_unreachable:
                     unreachable_pairs.append((src, sink))
+                    self.metrics.increment("pairs_reused")
                     continue
 
-                question = (
-                    question_template.replace("<SRC_NAME>", src.name)
-                    .replace("<SRC_LINE>", str(src.line_number))
-                    .replace("<SINK_NAME>", sink.name)
-                    .replace("<SINK_LINE>", str(sink.line_number))
-                )
-
                 if src.name == sink.name:
                     cmp = "the same"
                 else:
@@ -118,35 +132,32 @@ class IntraFlowPropagator(LMAgent):
                 else:
                     used = ""
 
-                question = question.replace("<CMP>", cmp)
-                question = question.replace("<USED>", used)
-
-                if is_fscot:
-                    message = self.prompt_fscot
-                else:
-                    message = self.prompt_no_fscot
-                message = message.replace(
-                    "<PROGRAM>", function.lined_SSI_function_without_comments
+                question = question_template.render(
+                    {
+                        "SRC_NAME": src.name,
+                        "SRC_LINE": str(src.line_number),
+                        "SINK_NAME": sink.name,
+                        "SINK_LINE": str(sink.line_number),
+                        "CMP": cmp,
+                        "USED": used,
+                    }
+                )
+                prefix, message = prompt_layout.render(
+                    {
+                        "PROGRAM": function.lined_SSI_function_without_comments,
+                        "QUESTION": question,
+                    }
                 )
-                message = message.replace("<QUESTION>", question)
-
-                if is_fscot:
-                    message = message.replace(
-                        "<ANSWER>", self.fetch_answer_format_fscot()
-                    )
-                else:
-                    message = message.replace(
-                        "<ANSWER>", self.fetch_answer_format_no_fscot()
-                    )
 
                 is_reachable = False
                 while True:
 
                     output, input_token_cost, output_token_cost = self.model.infer(
-                        message, True
+                        message, True, prefix, LMAgent.is_yes_no_answered
                     )
                     self.total_input_token_cost += input_token_cost
                     self.total_output_token_cost += output_token_cost
+                    self.metrics.increment("llm_calls")
                     self.response = output
 
                     yes_no_vector = LMAgent.process_yes_no_list_in_response(
@@ -158,51 +169,39 @@ class IntraFlowPropagator(LMAgent):
                         is_reachable = True
                     break
 
+                self.event_log.emit(
+                    "propagation_query",
+                    EventLog.DETAIL,
+                    function_id=function.function_id,
+                    src=str(src),
+                    sink=str(sink),
+                    verdict=is_reachable,
+                )
                 if is_reachable:
                     reachable_pairs.append((src, sink))
                 else:
                     unreachable_pairs.append((src, sink))
         return reachable_pairs, unreachable_pairs
 
-    def construct_prompt_skeleton_fscot(self) -> str:
+    def construct_prompt_skeleton_fscot(self) -> PromptLayout:
         """
         Construct the prompt according to prompt config file
-        :return: The prompt
+        :return: The static prefix and the compiled suffix of the prompt
         """
-        with open(self.prompt_config_file_base / self.ifp_file_path, "r") as read_file:
-            dump_config_dict = json.load(read_file)
-        prompt = dump_config_dict["task"]
-        prompt += "\n" + "\n".join(dump_config_dict["analysis_rules"])
-        prompt += "\n" + "\n".join(dump_config_dict["analysis_examples"])
-        prompt += "\n" + "".join(dump_config_dict["meta_prompts"])
-        return prompt
-
-    def construct_prompt_skeleton_no_fscot(self) -> str:
+        return self.prompt_config.prompt_fscot
+
+    def construct_prompt_skeleton_no_fscot(self) -> PromptLayout:
         """
         Construct the prompt according to prompt config file
-        :return: The prompt
+        :return: The static prefix and the compiled suffix of the prompt
         """
-        with open(self.prompt_config_file_base / self.ifp_file_path, "r") as read_file:
-            dump_config_dict = json.load(read_file)
-        prompt = dump_config_dict["task"]
-        prompt += "\n" + "\n".join(dump_config_dict["analysis_rules"])
-        prompt += "\n" + "".join(dump_config_dict["meta_prompts"])
-        return prompt
+        return self.prompt_config.prompt_no_fscot
 
     def fetch_system_role(self):
-        with open(self.prompt_config_file_base / self.ifp_file_path, "r") as read_file:
-            dump_config_dict = json.load(read_file)
-        role = dump_config_dict["system_role"]
-        return role
+        return self.prompt_config.system_role
 
     def fetch_answer_format_fscot(self) -> str:
-        with open(self.prompt_config_file_base / self.ifp_file_path, "r") as read_file:
-            dump_config_dict = json.load(read_file)
-        answer_format = dump_config_dict["answer_format_cot"]
-        return "\n".join(answer_format)
+        return self.prompt_config.answer_format_cot
 
     def fetch_answer_format_no_fscot(self) -> str:
-        with open(self.prompt_config_file_base / self.ifp_file_path, "r") as read_file:
-            dump_config_dict = json.load(read_file)
-        answer_format = dump_config_dict["answer_format_no_cot"]
-        return "\n".join(answer_format)
+        return self.prompt_config.answer_format_no_cot
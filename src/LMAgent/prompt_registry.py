@@ -0,0 +1,188 @@
+import json
+import re
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+
+class PromptTemplate:
+    """
+    PromptTemplate class for the compiled form of a prompt with placeholders such as <PROGRAM>.
+    The template is split into literal segments and placeholder names once,
+    so that rendering is a single join instead of a chain of str.replace.
+    """
+
+    PLACEHOLDER_PATTERN = re.compile(r"<([A-Z][A-Z0-9_]*)>")
+
+    def __init__(self, text: str) -> None:
+        self.text: str = text
+        # Even positions are literal segments and odd positions are placeholder names
+        self.parts: List[str] = PromptTemplate.PLACEHOLDER_PATTERN.split(text)
+        self.placeholders = set(self.parts[1::2])
+
+    def render(self, values: Dict[str, str]) -> str:
+        """
+        Substitute the placeholders in a single pass.
+        The placeholders without values are kept unchanged.
+        :param values: the map from placeholder names (without angle brackets) to their values
+        :return: the rendered prompt
+        """
+        segments = []
+        for i, part in enumerate(self.parts):
+            if i % 2 == 0:
+                segments.append(part)
+            elif part in values:
+                segments.append(values[part])
+            else:
+                segments.append("<" + part + ">")
+        return "".join(segments)
+
+
+class PromptLayout:
+    """
+    PromptLayout class for a prompt split into a static prefix and a dynamic suffix.
+    The prefix (task, rules, examples, and answer format) is identical across queries,
+    so that providers can reuse its cached computation.
+    The suffix contains the program followed by the question.
+    """
+
+    def __init__(self, prefix: str, suffix: PromptTemplate) -> None:
+        self.prefix: str = prefix
+        self.suffix: PromptTemplate = suffix
+
+    def render(self, values: Dict[str, str]) -> Tuple[str, str]:
+        """
+        :param values: the map from placeholder names to their values
+        :return: the static prefix and the rendered suffix
+        """
+        return self.prefix, self.suffix.render(values)
+
+
+class PromptConfig:
+    """
+    PromptConfig class for a prompt config file that is loaded and pre-assembled once
+    """
+
+    def __init__(self, config_file_path: Path) -> None:
+        with open(config_file_path, "r") as read_file:
+            self.config: Dict = json.load(read_file)
+        self.system_role: str = self.config["system_role"]
+
+        self.question_template: Optional[PromptTemplate] = None
+        if "question_template" in self.config:
+            self.question_template = PromptTemplate(self.config["question_template"])
+
+        self.global_variable_info: Optional[PromptTemplate] = None
+        if "global_variable_info" in self.config:
+            self.global_variable_info = PromptTemplate(
+                "\n".join(self.config["global_variable_info"])
+            )
+
+        # Answer formats of propagators and validators
+        self.answer_format_cot: str = self.join_lines("answer_format_cot")
+        self.answer_format_no_cot: str = self.join_lines("answer_format_no_cot")
+        self.answer_format: str = self.join_lines("answer_format")
+
+        # Source/sink extractors
+        self.general_prompt: str = ""
+        if "output_constraints" in self.config:
+            self.general_prompt = self.construct_general_prompt()
+
+        # The regular expressions of the tokens without which a function has no source or sink
+        self.keyword_pattern: Optional[re.Pattern] = None
+        if "keywords" in self.config:
+            self.keyword_pattern = re.compile("|".join(self.config["keywords"]))
+
+        # Intra-procedural propagators
+        self.prompt_fscot: Optional[PromptLayout] = None
+        self.prompt_no_fscot: Optional[PromptLayout] = None
+        if "answer_format_cot" in self.config:
+            self.prompt_fscot = self.assemble(
+                ["analysis_rules", "analysis_examples"], self.answer_format_cot
+            )
+            self.prompt_no_fscot = self.assemble(
+                ["analysis_rules"], self.answer_format_no_cot
+            )
+
+        # Inter-procedural validators
+        self.prompt_path_check: Optional[PromptLayout] = None
+        if "additional_fact" in self.config:
+            self.prompt_path_check = self.assemble(
+                ["analysis_rules", "additional_fact", "analysis_examples"],
+                self.answer_format,
+            )
+
+    def may_match(self, program: str) -> bool:
+        """
+        A cheap lexical gate of the source/sink extractors
+        :param program: the program without comments
+        :return: False if the program contains none of the keywords, and True if there are no keywords
+        """
+        if self.keyword_pattern is None:
+            return True
+        return self.keyword_pattern.search(program) is not None
+
+    def join_lines(self, key: str) -> str:
+        if key not in self.config:
+            return ""
+        return "\n".join(self.config[key])
+
+    def assemble(self, sections: List[str], answer_format: str) -> PromptLayout:
+        """
+        Assemble the task, the given sections, and the meta prompts.
+        The meta prompts describing the answer format are moved into the static prefix,
+        while the ones carrying the program and the question keep their order in the suffix.
+        :param sections: the keys of the sections placed between the task and the meta prompts
+        :param answer_format: the answer format substituted for <ANSWER>
+        :return: the prompt layout
+        """
+        prefix = self.config["task"]
+        for section in sections:
+            prefix += "\n" + "\n".join(self.config[section])
+        prefix += "\n"
+        suffix = ""
+        for meta_prompt in self.config["meta_prompts"]:
+            if "<ANSWER>" in meta_prompt:
+                prefix += PromptTemplate(meta_prompt).render({"ANSWER": answer_format})
+            else:
+                suffix += meta_prompt
+        return PromptLayout(prefix, PromptTemplate(suffix))
+
+    def construct_general_prompt(self) -> str:
+        prompt = self.config["task"]
+        prompt += "\n" + "\n".join(self.config["analysis_rules"])
+        prompt += "\n" + "\n".join(self.config["analysis_examples"])
+        prompt += "\n" + "".join(self.config["meta_prompts"])
+        prompt += "\n" + "".join(self.config["output_constraints"])
+        prompt += "\n" + "\n".join(self.config["output_examples"])
+        prompt += "\n" + "Here is the program:"
+        return prompt
+
+
+class PromptRegistry:
+    """
+    PromptRegistry class for sharing the prompt configs under src/prompt across the whole process
+    """
+
+    prompt_config_file_base: Path = (
+        Path(__file__).resolve().parent.parent.absolute() / "prompt"
+    )
+    configs: Dict[str, PromptConfig] = {}
+    lock = threading.Lock()
+
+    @classmethod
+    def get(cls, config_file_path: str) -> PromptConfig:
+        """
+        Load the prompt config at most once per process
+        :param config_file_path: the path relative to src/prompt
+        :return: the pre-assembled prompt config
+        """
+        config = cls.configs.get(config_file_path)
+        if config is not None:
+            return config
+        with cls.lock:
+            if config_file_path not in cls.configs:
+                cls.configs[config_file_path] = PromptConfig(
+                    cls.prompt_config_file_base / config_file_path
+                )
+            return cls.configs[config_file_path]
@@ -5,8 +5,11 @@ sys.path.append(path.dirname(path.dirname(path.dirname(path.abspath(__file__))))
 from LMAgent.LM_agent import LMAgent
 from utility.llm import *
 from utility.function import *
+from utility.event_log import EventLog
 from utility.environment import *
-from TSAgent.TS_synthesis_extractor import *
+from TSAgent.TS_extractor_registry import TSExtractorRegistry
+from TSAgent.synthesis.specs import get_spec_hash
+from TSAgent.TS_visitor import ExtractionRule
 
 
 class SrcExtractor(LMAgent):
@@ -20,6 +23,7 @@ class SrcExtractor(LMAgent):
         online_model_name: str,
         openai_key: str,
         temp: float,
+        is_prefix_caching: bool = False,
     ) -> None:
         super().__init__()
         self.src_prompt_config_file_path: str = src_prompt_config_path
@@ -27,40 +31,60 @@ class SrcExtractor(LMAgent):
             self.src_prompt_config_file_path, False
         )
         self.openai_key = openai_key
-        self.model = LLM(online_model_name, self.openai_key, temp, system_role)
+        self.model = LLM(
+            online_model_name, self.openai_key, temp, system_role, is_prefix_caching
+        )
         self.prompt: str = prompt
-        self.srcs: List[LocalValue] = []
+        self.prompt_config = self.load_prompt_config(self.src_prompt_config_file_path)
 
-        assert (
-            "dbz" in self.src_prompt_config_file_path
-            or "xss" in self.src_prompt_config_file_path
-            or "ci" in self.src_prompt_config_file_path
+        # The fastest registered extractor validated against the current spec, or the built-in one
+        self.src_identifier = TSExtractorRegistry.get_extractor(
+            self.src_prompt_config_file_path,
+            get_spec_hash(
+                *TSExtractorRegistry.parse_spec_path(self.src_prompt_config_file_path)
+            ),
         )
-        if "dbz" in self.src_prompt_config_file_path:
-            self.src_identifier = find_dbz_src
-        elif "xss" in self.src_prompt_config_file_path:
-            self.src_identifier = find_xss_src
-        elif "ci" in self.src_prompt_config_file_path:
-            self.src_identifier = find_ci_src
+        self.src_rule = ExtractionRule.from_extractor(self.src_identifier)
 
-    def apply(self, function: Function, is_parse) -> None:
+    def apply(self, function: Function, is_parse) -> Tuple[LocalValue, ...]:
         """
         :param function: Function object
         :param is_parse: Whether invoke parser instead of apply the LLM
+        :return: the src values of the function in a new tuple, which is not kept by the extractor
         """
-        message = (
-            self.prompt
-            + "\n```\n"
-            + function.lined_SSI_function_without_comments
-            + "\n```\n"
-        )
+        message = "\n```\n" + function.lined_SSI_function_without_comments + "\n```\n"
+        if not is_parse and not self.prompt_config.may_match(
+            function.SSI_function_without_comments
+        ):
+            # None of the keywords of the spec occurs, so the model call is skipped
+            self.metrics.increment("skipped_llm_calls")
+            self.event_log.emit(
+                "extraction_skipped",
+                EventLog.DETAIL,
+                function_id=function.function_id,
+                kind="src",
+            )
+            return ()
         if not is_parse:
-            response, input_token_cost, output_token_cost = self.model.infer(message)
-            self.srcs = LMAgent.process_response_item_lines(response, ValueType.SRC)
-        else:
-            # TODO: we need to synthesize the parser automatically
-            # Consider DBZ only.
-            self.srcs = self.src_identifier(
+            response, input_token_cost, output_token_cost = self.model.infer(
+                message, True, self.prompt
+            )
+            self.total_input_token_cost += input_token_cost
+            self.total_output_token_cost += output_token_cost
+            self.metrics.increment("llm_calls")
+            srcs = tuple(LMAgent.process_response_item_lines(response, ValueType.SRC))
+            self.event_log.emit(
+                "extraction_query",
+                EventLog.DETAIL,
+                function_id=function.function_id,
+                kind="src",
+                value_num=len(srcs),
+                input_token_cost=input_token_cost,
+                output_token_cost=output_token_cost,
+            )
+            return srcs
+        return tuple(
+            self.src_rule.extract(
                 function.SSI_function_without_comments, function.parse_tree.root_node
             )
-        return
+        )
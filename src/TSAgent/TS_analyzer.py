@@ -5,8 +5,10 @@ import tree_sitter
 sys.path.append(path.dirname(path.dirname(path.dirname(path.abspath(__file__)))))
 
 from TSAgent.TS_parser import TSParser
-from typing import List, Tuple
+from TSAgent.TS_index import find_nodes_by_type
+from typing import List, Set, Tuple
 from utility.function import *
+from utility.metrics import Metrics
 
 
 class TSAnalyzer:
@@ -14,22 +16,113 @@ class TSAnalyzer:
     TSAnalyzer class for retrieving necessary facts or functions for LMAgent
     """
 
-    def __init__(self, java_file_path: str, support_files: List[str]) -> None:
+    def __init__(
+        self,
+        java_file_path: str,
+        support_files: List[str],
+        is_project_mode: bool = False,
+    ) -> None:
         """
         Initialize TSParser with the project path.
-        Currently we only analyze a single java file
-        :param java_file_path: The path of a java file
+        :param java_file_path: The path of a java file, or the path of a project in the project mode
+        :param support_files: The paths of the support files providing static fields
+        :param is_project_mode: Whether analyze all the java files under the project path together
         """
         self.java_file_path: str = java_file_path
         self.ts_parser: TSParser = TSParser(java_file_path)
+        self.metrics = Metrics()
 
-        self.ts_parser.extract_single_file(self.java_file_path)
-        self.ts_parser.extract_static_field_from_support_files(support_files)
+        with self.metrics.span("file_parsing"):
+            if is_project_mode:
+                self.ts_parser.extract_all(self.java_file_path)
+            else:
+                self.ts_parser.extract_single_file(self.java_file_path)
+        with self.metrics.span("static_field_extraction"):
+            self.ts_parser.extract_static_field_from_support_files(support_files)
 
-        # self.ts_parser.extract_all()
         self.main_ids: List[int] = self.find_all_top_functions()
         self.tmp_variable_count = 0
 
+        # Symbol table
+        self.fileToUsableClasses: Dict[str, List[str]] = {}
+        self.functionToClass: Dict[int, str] = {}
+        self.classMethodToIds: Dict[Tuple[str, str], List[int]] = {}
+        self.classMethodArityToIds: Dict[Tuple[str, str, int], List[int]] = {}
+        self.classToFieldNames: Dict[str, Set[str]] = {}
+        with self.metrics.span("symbol_table_construction"):
+            self.build_symbol_table()
+
+    def build_symbol_table(self) -> None:
+        """
+        Build the symbol table once after parsing,
+        so that resolving the callees of a call site only needs a few dictionary lookups
+        """
+        self.fileToUsableClasses = {}
+        self.functionToClass = {}
+        self.classMethodToIds = {}
+        self.classMethodArityToIds = {}
+        self.classToFieldNames = {}
+
+        for class_name in self.ts_parser.classToFunctions:
+            for method_id in self.ts_parser.classToFunctions[class_name]:
+                if method_id not in self.functionToClass:
+                    self.functionToClass[method_id] = class_name
+                if method_id not in self.ts_parser.methods:
+                    continue
+                (name, code) = self.ts_parser.methods[method_id]
+                self.classMethodToIds.setdefault((class_name, name), []).append(
+                    method_id
+                )
+                arity = self.ts_parser.functionToArity.get(method_id, -1)
+                if arity >= 0:
+                    self.classMethodArityToIds.setdefault(
+                        (class_name, name, arity), []
+                    ).append(method_id)
+
+        for class_name in self.ts_parser.classToFields:
+            self.classToFieldNames[class_name] = set(
+                self.ts_parser.fields[field_id]
+                for field_id in self.ts_parser.classToFields[class_name]
+            )
+
+        for file_path in set(self.ts_parser.functionToFile.values()):
+            self.fileToUsableClasses[file_path] = self.find_usable_classes(file_path)
+        return
+
+    def find_usable_classes(self, file_path: str) -> List[str]:
+        """
+        Collect the classes declared in or imported by a file
+        :param file_path: the path of the file
+        :return the sorted list of the usable class names
+        """
+        usable_classes = set([])
+        if file_path in self.ts_parser.fileToClasses:
+            usable_classes = usable_classes.union(
+                self.ts_parser.fileToClasses[file_path]
+            )
+
+        # The classes in the same package are visible without imports
+        package_name = self.ts_parser.fileToPackage.get(file_path)
+        if package_name is not None and package_name in self.ts_parser.packageToClasses:
+            usable_classes = usable_classes.union(
+                self.ts_parser.packageToClasses[package_name]
+            )
+
+        if file_path in self.ts_parser.fileToImports:
+            for import_item in self.ts_parser.fileToImports[file_path]:
+                for package_item in self.ts_parser.packageToClasses:
+                    if package_item.startswith(import_item):
+                        usable_classes = usable_classes.union(
+                            self.ts_parser.packageToClasses[package_item]
+                        )
+                    if import_item.startswith(package_item):
+                        tail_name = import_item.replace(package_item, "").replace(
+                            ".", ""
+                        )
+                        if tail_name in self.ts_parser.packageToClasses[package_item]:
+                            usable_classes.add(tail_name)
+        return sorted(usable_classes)
+
     def find_all_top_functions(self) -> List[int]:
         """
         Collect all the main functions, which are ready for analysis
@@ -56,12 +149,25 @@ class TSAnalyzer:
         """
         # TODO: If node_type is 'method_invocation',
         #  We need to ensure that the call site nodes in the list conform to the control flow order
-        nodes = []
-        if root_node.type == node_type:
-            nodes.append(root_node)
-        for child_node in root_node.children:
-            nodes.extend(TSAnalyzer.find_nodes(child_node, node_type))
-        return nodes
+        return find_nodes_by_type(root_node, node_type)
+
+    @staticmethod
+    def get_line_number(node: tree_sitter.Node) -> int:
+        """
+        Get the (1-based) line number of the start of a node from its tree-sitter point,
+        which avoids counting the newlines in the source prefix
+        :param node: the node
+        :return the line number where the node starts
+        """
+        return node.start_point[0] + 1
+
+    @staticmethod
+    def get_end_line_number(node: tree_sitter.Node) -> int:
+        """
+        :param node: the node
+        :return the (1-based) line number where the node ends
+        """
+        return node.end_point[0] + 1
 
     def find_callee(
         self, method_id: int, source_code: str, call_site_node: tree_sitter.Node
@@ -76,48 +182,129 @@ class TSAnalyzer:
         :return the list of the ids of called functions
         """
         assert call_site_node.type == "method_invocation"
+        # The name field is the method name, while the first identifier may be the receiver, e.g., B in B.foo()
         method_name = ""
-        for node2 in call_site_node.children:
-            if node2.type == "identifier":
-                method_name = source_code[node2.start_byte : node2.end_byte]
-                break
+        name_node = call_site_node.child_by_field_name("name")
+        if name_node is not None:
+            method_name = source_code[name_node.start_byte : name_node.end_byte]
 
         file_path = self.ts_parser.functionToFile[method_id]
+        usable_classes = self.fileToUsableClasses.get(file_path, [])
+        arity = TSAnalyzer.find_call_site_arity(call_site_node)
 
-        # Collect usable classes in the file named src_prompt_config_path
-        usable_classes = set([])
-        if file_path in self.ts_parser.fileToClasses:
-            usable_classes = usable_classes.union(
-                self.ts_parser.fileToClasses[file_path]
-            )
-
-        if file_path in self.ts_parser.fileToImports:
-            for import_item in self.ts_parser.fileToImports[file_path]:
-                for package_item in self.ts_parser.packageToClasses:
-                    if package_item.startswith(import_item):
-                        usable_classes = usable_classes.union(
-                            self.ts_parser.packageToClasses[package_item]
-                        )
-                    if import_item.startswith(package_item):
-                        tail_name = import_item.replace(package_item, "").replace(
-                            ".", ""
-                        )
-                        if tail_name in self.ts_parser.packageToClasses[package_item]:
-                            usable_classes.add(tail_name)
+        # Only consider the class of the receiver if it is known, which distinguishes
+        # the methods with the same name in different classes of a project
+        receiver_class = self.find_receiver_class(
+            method_id, source_code, call_site_node
+        )
+        if receiver_class in usable_classes:
+            usable_classes = [receiver_class]
 
-        # Grep callees with names
+        # Grep callees with names and arities.
+        # Fall back to names only if no callee has the same arity, e.g., varargs
         callee_ids = []
         for class_name in usable_classes:
-            if class_name not in self.ts_parser.classToFunctions:
-                continue
-            for method_id in self.ts_parser.classToFunctions[class_name]:
-                if method_id not in self.ts_parser.methods:
-                    continue
-                (name, code) = self.ts_parser.methods[method_id]
-                if name == method_name:
-                    callee_ids.append(method_id)
+            callee_ids.extend(
+                self.classMethodArityToIds.get((class_name, method_name, arity), [])
+            )
+        if len(callee_ids) == 0:
+            for class_name in usable_classes:
+                callee_ids.extend(
+                    self.classMethodToIds.get((class_name, method_name), [])
+                )
+        callee_ids = sorted(set(callee_ids))
         return callee_ids
 
+    def find_receiver_class(
+        self, method_id: int, source_code: str, call_site_node: tree_sitter.Node
+    ) -> str:
+        """
+        Find the class of the receiver of a call site when it is syntactically explicit,
+        i.e., this, a class name, or an object creation such as (new A()).foo().
+        An identifier is a class name only if it names a class in the symbol table
+        and no variable of the caller, i.e., a parameter, a local variable, or a field, has the same name
+        :param method_id: caller function id
+        :param source_code: the content of the source file
+        :param call_site_node: the node of the call site
+        :return the class name, or an empty string if it is unknown
+        """
+        receiver_node = call_site_node.child_by_field_name("object")
+        while (
+            receiver_node is not None
+            and receiver_node.type == "parenthesized_expression"
+            and receiver_node.named_child_count == 1
+        ):
+            receiver_node = receiver_node.named_children[0]
+        if receiver_node is None:
+            return ""
+        if receiver_node.type == "this":
+            return self.find_class_by_function(method_id)
+        if receiver_node.type == "object_creation_expression":
+            receiver_node = receiver_node.child_by_field_name("type")
+            if receiver_node is None:
+                return ""
+        receiver_name = source_code[receiver_node.start_byte : receiver_node.end_byte]
+        if receiver_node.type == "type_identifier":
+            return receiver_name
+        if receiver_node.type == "identifier":
+            if receiver_name not in self.ts_parser.classToFunctions:
+                return ""
+            caller_class = self.find_class_by_function(method_id)
+            if receiver_name in self.classToFieldNames.get(caller_class, set([])):
+                return ""
+            if receiver_name in TSAnalyzer.find_variable_names(
+                source_code, call_site_node
+            ):
+                return ""
+            return receiver_name
+        return ""
+
+    @staticmethod
+    def find_variable_names(
+        source_code: str, call_site_node: tree_sitter.Node
+    ) -> Set[str]:
+        """
+        Collect the names of the parameters and the local variables declared in the function of a call site
+        :param source_code: the content of the source file
+        :param call_site_node: the node of the call site
+        :return the set of the variable names
+        """
+        root_node = call_site_node
+        while root_node.parent is not None:
+            root_node = root_node.parent
+        variable_names = set([])
+        for node_type in [
+            "formal_parameter",
+            "catch_formal_parameter",
+            "variable_declarator",
+            "enhanced_for_statement",
+            "resource",
+        ]:
+            for node in find_nodes_by_type(root_node, node_type):
+                name_node = node.child_by_field_name("name")
+                if name_node is not None:
+                    variable_names.add(
+                        source_code[name_node.start_byte : name_node.end_byte]
+                    )
+        return variable_names
+
+    @staticmethod
+    def find_call_site_arity(call_site_node: tree_sitter.Node) -> int:
+        """
+        :param call_site_node: the node of a call site
+        :return the number of the arguments
+        """
+        for node in call_site_node.children:
+            if node.type == "argument_list":
+                arguments = [
+                    child
+                    for child in node.children
+                    if child.type
+                    not in {"(", ")", ",", "line_comment", "block_comment"}
+                ]
+                return len(arguments)
+        return 0
+
     @staticmethod
     def find_function_parameters(
         source_code: str, root_node: tree_sitter.Node
@@ -160,7 +347,7 @@ class TSAnalyzer:
             for child in ret_node.children:
                 if child.type == "identifier":
                     return_var = source_code[child.start_byte : child.end_byte]
-                    line_num = source_code[: child.start_byte].count("\n") + 1
+                    line_num = TSAnalyzer.get_line_number(child)
                     rets.append(LocalValue(return_var, line_num, ValueType.RET))
         return rets
 
@@ -213,9 +400,7 @@ class TSAnalyzer:
 
         # Extract the name info and line number
         for node in nodes:
-            if source_code[: node.start_byte].count("\n") == source_code[
-                : call_site_node.start_byte
-            ].count("\n"):
+            if node.start_point[0] == call_site_node.start_point[0]:
                 for child in node.children:
                     if child.type == "identifier":
                         name = source_code[child.start_byte : child.end_byte]
@@ -224,12 +409,7 @@ class TSAnalyzer:
         return outputs
 
     def find_class_by_function(self, function_id: int) -> str:
-        class_name = ""
-        for name in self.ts_parser.classToFunctions:
-            if function_id in self.ts_parser.classToFunctions[name]:
-                class_name = name
-                break
-        return class_name
+        return self.functionToClass.get(function_id, "")
 
     def find_IO_field(
         self,
@@ -266,7 +446,7 @@ class TSAnalyzer:
 
         # Extract the name info and line number
         for node in nodes:
-            line_number = source_code[: node.start_byte].count("\n")
+            line_number = node.start_point[0]
             is_equal_found = False
             for child in node.children:
                 if child.type == "=":
@@ -321,28 +501,18 @@ class TSAnalyzer:
             block_num = 0
             for sub_target in target.children:
                 if sub_target.type == "parenthesized_expression":
-                    condition_line = (
-                        source_code[: sub_target.start_byte].count("\n") + 1
-                    )
+                    condition_line = self.get_line_number(sub_target)
                     condition_str = source_code[
                         sub_target.start_byte : sub_target.end_byte
                     ]
                 if sub_target.type == "block":
                     if block_num == 0:
-                        true_branch_start_line = (
-                            source_code[: sub_target.start_byte].count("\n") + 1
-                        )
-                        true_branch_end_line = (
-                            source_code[: sub_target.end_byte].count("\n") + 1
-                        )
+                        true_branch_start_line = self.get_line_number(sub_target)
+                        true_branch_end_line = self.get_end_line_number(sub_target)
                         block_num += 1
                     elif block_num == 1:
-                        else_branch_start_line = (
-                            source_code[: sub_target.start_byte].count("\n") + 1
-                        )
-                        else_branch_end_line = (
-                            source_code[: sub_target.end_byte].count("\n") + 1
-                        )
+                        else_branch_start_line = self.get_line_number(sub_target)
+                        else_branch_end_line = self.get_end_line_number(sub_target)
                         block_num += 1
             if_statement_end_line = max(true_branch_end_line, else_branch_start_line)
             if_statements[(condition_line, if_statement_end_line)] = (
@@ -358,20 +528,18 @@ class TSAnalyzer:
         switch_statements = {}
         for target in targets:
             parenthesized_node = self.find_nodes(target, "parenthesized_expression")[0]
-            condition_line = (
-                source_code[: parenthesized_node.start_byte].count("\n") + 1
-            )
+            condition_line = self.get_line_number(parenthesized_node)
             parenthesized_node_str = source_code[
                 parenthesized_node.start_byte : parenthesized_node.end_byte
             ]
             switch_statement_start_line = condition_line
-            switch_statement_end_line = source_code[: target.end_byte].count("\n") + 1
+            switch_statement_end_line = self.get_end_line_number(target)
 
             case_group = self.find_nodes(target, "switch_block_statement_group")
             items = []
             for case_item in case_group:
-                case_start_line = source_code[: case_item.start_byte].count("\n") + 1
-                case_end_line = source_code[: case_item.end_byte].count("\n") + 1
+                case_start_line = self.get_line_number(case_item)
+                case_end_line = self.get_end_line_number(case_item)
 
                 switch_label_node = self.find_nodes(case_item, "switch_label")[0]
                 switch_label = source_code[
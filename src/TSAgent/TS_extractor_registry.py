@@ -0,0 +1,222 @@
+import importlib.util
+import json
+import os
+import sys
+import threading
+from os import path
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+sys.path.append(path.dirname(path.dirname(path.abspath(__file__))))
+from TSAgent.TS_synthesis_extractor import (
+    find_dbz_src,
+    find_dbz_sink,
+    find_xss_src,
+    find_xss_sink,
+    find_ci_src,
+    find_ci_sink,
+)
+from TSAgent.TS_query_extractor import TSQueryExtractor
+
+# The extractors in TS_synthesis_extractor.py, which are used if no registered extractor is validated
+BUILTIN_EXTRACTORS: Dict[Tuple[str, str], Callable] = {
+    ("dbz", "source"): find_dbz_src,
+    ("dbz", "sink"): find_dbz_sink,
+    ("xss", "source"): find_xss_src,
+    ("xss", "sink"): find_xss_sink,
+    ("ci", "source"): find_ci_src,
+    ("ci", "sink"): find_ci_sink,
+}
+
+# The suffixes of the extractor files of each kind
+EXTRACTOR_SUFFIXES = {"python": ".py", "query": ".scm"}
+
+
+class ExtractorEntry:
+    """
+    ExtractorEntry class for a registered extractor, i.e., a python file or a query file and its metadata file.
+    The metadata contains the bug type, the role (source or sink), the function name, the version,
+    the hash of the synthesis spec, the validation score, and the average time on the examples.
+    A query extractor additionally records the way of extracting the values from the captured nodes.
+    The file is loaded only when the extractor is selected.
+    """
+
+    def __init__(self, metadata: Dict, source_path: Path) -> None:
+        self.metadata: Dict = metadata
+        self.source_path: Path = source_path
+        self.bug_type: str = metadata["bug_type"]
+        self.role: str = metadata["role"]
+        self.fn_name: str = metadata["fn_name"]
+        self.version: int = metadata["version"]
+        self.kind: str = metadata.get("kind", "python")
+        self.spec_hash: str = metadata.get("spec_hash", "")
+        self.validation_score: float = metadata.get("validation_score", 0.0)
+        self.average_time: float = metadata.get("average_time", float("inf"))
+        self.extractor: Optional[Callable] = None
+        self.lock = threading.Lock()
+
+    def is_validated(self) -> bool:
+        return self.validation_score >= 1.0
+
+    def load(self) -> Callable:
+        """
+        Import the extractor once.
+        The python file is imported as a regular module, so that its bytecode is cached in __pycache__ across runs.
+        The query file is compiled by the query engine.
+        """
+        with self.lock:
+            if self.extractor is None and self.kind == "query":
+                with open(self.source_path, "r") as source_file:
+                    self.extractor = TSQueryExtractor(
+                        source_file.read(), self.metadata["extract"], self.role
+                    )
+            elif self.extractor is None:
+                module_spec = importlib.util.spec_from_file_location(
+                    "TSAgent.extractors." + self.source_path.stem, self.source_path
+                )
+                module = importlib.util.module_from_spec(module_spec)
+                module_spec.loader.exec_module(module)
+                self.extractor = getattr(module, self.fn_name)
+            return self.extractor
+
+
+class TSExtractorRegistry:
+    """
+    TSExtractorRegistry class for the versioned synthesized extractors under TSAgent/extractors.
+    The metadata files are scanned once per process,
+    and the fastest validated extractor of a bug type and a role is selected at runtime.
+    Only the python extractors are selected by default,
+    as the query forms are slower than the python forms with the query engine of the tree-sitter binding.
+    """
+
+    registry_dir: Path = Path(__file__).resolve().parent / "extractors"
+    entries: Optional[List[ExtractorEntry]] = None
+    lock = threading.Lock()
+
+    @staticmethod
+    def parse_spec_path(spec_file_path: str) -> Tuple[str, str]:
+        """
+        :param spec_file_path: the path of a spec file, e.g., spec/dbz_source.json
+        :return the bug type and the role, e.g., ("dbz", "source")
+        """
+        name = os.path.basename(spec_file_path).replace(".json", "")
+        bug_type, _, role = name.rpartition("_")
+        return bug_type, role
+
+    @classmethod
+    def get_entries(cls) -> List[ExtractorEntry]:
+        with cls.lock:
+            if cls.entries is None:
+                entries = []
+                if cls.registry_dir.exists():
+                    for metadata_path in sorted(cls.registry_dir.glob("*.json")):
+                        with open(metadata_path, "r") as metadata_file:
+                            metadata = json.load(metadata_file)
+                        source_path = metadata_path.with_suffix(
+                            EXTRACTOR_SUFFIXES[metadata.get("kind", "python")]
+                        )
+                        if source_path.exists():
+                            entries.append(ExtractorEntry(metadata, source_path))
+                cls.entries = entries
+            return cls.entries
+
+    @classmethod
+    def select(
+        cls,
+        bug_type: str,
+        role: str,
+        spec_hash: Optional[str],
+        kinds: Tuple[str, ...] = ("python",),
+    ) -> Optional[ExtractorEntry]:
+        """
+        Select the fastest extractor validated against the current spec,
+        where ties are broken by the latest version
+        :param bug_type: the bug type, e.g., dbz
+        :param role: source or sink
+        :param spec_hash: the hash of the current synthesis spec, or None if there is no spec
+        :param kinds: the kinds of the selectable extractors
+        :return the selected entry, or None if no registered extractor is validated against the spec
+        """
+        if spec_hash is None:
+            return None
+        candidates = [
+            entry
+            for entry in cls.get_entries()
+            if entry.bug_type == bug_type
+            and entry.role == role
+            and entry.spec_hash == spec_hash
+            and entry.kind in kinds
+            and entry.is_validated()
+        ]
+        if len(candidates) == 0:
+            return None
+        return min(candidates, key=lambda entry: (entry.average_time, -entry.version))
+
+    @classmethod
+    def get_extractor(cls, spec_file_path: str, spec_hash: Optional[str]) -> Callable:
+        """
+        :param spec_file_path: the path of the spec file of a source or sink extractor
+        :param spec_hash: the hash of the current synthesis spec of the extractor
+        :return the selected registered extractor, or the built-in one
+        """
+        bug_type, role = cls.parse_spec_path(spec_file_path)
+        entry = cls.select(bug_type, role, spec_hash)
+        if entry is not None:
+            return entry.load()
+        if (bug_type, role) not in BUILTIN_EXTRACTORS:
+            raise ValueError(f"No extractor for the spec {spec_file_path}")
+        return BUILTIN_EXTRACTORS[(bug_type, role)]
+
+    @classmethod
+    def register(
+        cls,
+        bug_type: str,
+        role: str,
+        fn_name: str,
+        source: str,
+        spec_hash: str,
+        validation_score: float,
+        average_time: float,
+        kind: str = "python",
+        extract: str = None,
+    ) -> ExtractorEntry:
+        """
+        Store a synthesized extractor as the next version of its bug type and role
+        :param bug_type: the bug type, e.g., dbz
+        :param role: source or sink
+        :param fn_name: the name of the extractor function in the source
+        :param source: the source code of the extractor, or the S-expression of the query
+        :param spec_hash: the hash of the synthesis spec
+        :param validation_score: the ratio of the examples passed by the extractor
+        :param average_time: the average seconds of running the extractor on an example
+        :param kind: python or query
+        :param extract: the way of extracting the values of a query extractor
+        :return the registered entry
+        """
+        with cls.lock:
+            cls.registry_dir.mkdir(parents=True, exist_ok=True)
+            version = 1
+            for metadata_path in cls.registry_dir.glob(f"{bug_type}_{role}_v*.json"):
+                with open(metadata_path, "r") as metadata_file:
+                    version = max(version, json.load(metadata_file)["version"] + 1)
+            name = f"{bug_type}_{role}_v{version}"
+            metadata = {
+                "bug_type": bug_type,
+                "role": role,
+                "fn_name": fn_name,
+                "version": version,
+                "spec_hash": spec_hash,
+                "validation_score": validation_score,
+                "average_time": average_time,
+                "kind": kind,
+            }
+            if kind == "query":
+                metadata["extract"] = extract
+            source_path = cls.registry_dir / (name + EXTRACTOR_SUFFIXES[kind])
+            with open(source_path, "w") as source_file:
+                source_file.write(source + "\n")
+            with open(cls.registry_dir / (name + ".json"), "w") as metadata_file:
+                json.dump(metadata, metadata_file, indent=4)
+            # Rescan the registry on the next selection
+            cls.entries = None
+        return ExtractorEntry(metadata, source_path)
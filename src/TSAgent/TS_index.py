@@ -0,0 +1,88 @@
+import threading
+import tree_sitter
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+
+
+class TSNodeIndex:
+    """
+    TSNodeIndex class for bucketing the nodes underlying a root node by their types.
+    The tree is walked once with a TreeCursor, and the nodes of each type are kept in document order,
+    so that any later query for the nodes of a type is a dictionary lookup.
+    """
+
+    def __init__(self, root_node: tree_sitter.Node) -> None:
+        self.root_node: tree_sitter.Node = root_node
+        self.type_to_nodes: Dict[str, List[tree_sitter.Node]] = {}
+
+        # Pre-order traversal, which is consistent with the recursive search
+        cursor: tree_sitter.TreeCursor = root_node.walk()
+        while True:
+            node = cursor.node
+            if node.type not in self.type_to_nodes:
+                self.type_to_nodes[node.type] = []
+            self.type_to_nodes[node.type].append(node)
+            if cursor.goto_first_child():
+                continue
+            while not cursor.goto_next_sibling():
+                if not cursor.goto_parent():
+                    return
+
+    def find_nodes(self, node_type: str) -> List[tree_sitter.Node]:
+        """
+        :param node_type: the node type
+        :return a new list of the nodes with node_type type, which can be modified by the caller
+        """
+        return list(self.type_to_nodes.get(node_type, []))
+
+
+class TSNodeIndexCache:
+    """
+    TSNodeIndexCache class for sharing the node indexes across the whole process.
+    Nodes are not hashable, so an index is keyed by the node id together with its range and type.
+    A cached index holds its nodes, which keep the parse tree alive, so the node ids cannot be reused.
+    """
+
+    max_size: int = 4096
+    indexes: OrderedDict = OrderedDict()
+    lock = threading.Lock()
+
+    @classmethod
+    def get(cls, root_node: tree_sitter.Node) -> TSNodeIndex:
+        # Leaf nodes may be stored inline in tree-sitter, whose ids are not unique
+        if root_node.child_count == 0:
+            return TSNodeIndex(root_node)
+        key: Tuple = (
+            root_node.id,
+            root_node.start_byte,
+            root_node.end_byte,
+            root_node.type,
+        )
+        with cls.lock:
+            index = cls.indexes.get(key)
+            if index is not None:
+                cls.indexes.move_to_end(key)
+                return index
+        index = TSNodeIndex(root_node)
+        with cls.lock:
+            cls.indexes[key] = index
+            while len(cls.indexes) > cls.max_size:
+                cls.indexes.popitem(last=False)
+        return index
+
+    @classmethod
+    def clear(cls) -> None:
+        with cls.lock:
+            cls.indexes.clear()
+
+
+def find_nodes_by_type(
+    root_node: tree_sitter.Node, node_type: str
+) -> List[tree_sitter.Node]:
+    """
+    Find all the nodes with node_type type underlying the root node (inclusive) in document order.
+    :param root_node: root node
+    :param node_type: the node type
+    :return a new list of the nodes with node_type type
+    """
+    return TSNodeIndexCache.get(root_node).find_nodes(node_type)
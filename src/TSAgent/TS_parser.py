@@ -1,8 +1,189 @@
+import hashlib
+import json
 import os
+import threading
 import tree_sitter
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 from tree_sitter import Language
-from typing import Dict, List
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Tuple
 from pathlib import Path
+from TSAgent.TS_index import find_nodes_by_type
+
+
+class TSLanguage:
+    """
+    TSLanguage class for the tree-sitter languages shared across the whole process.
+    A language is loaded lazily at most once, and each thread owns a pool of parsers,
+    as a parser can not be used by multiple threads at the same time.
+    """
+
+    language_path: Path = (
+        Path(__file__).resolve().parent.parent.parent / "lib/build/my-languages.so"
+    )
+    languages: Dict[Tuple[str, str], Language] = {}
+    lock = threading.Lock()
+    local = threading.local()
+
+    @classmethod
+    def get_language(cls, library_path: str = None, name: str = "java") -> Language:
+        """
+        :param library_path: The path of the language library. The default one is lib/build/my-languages.so
+        :param name: The language name
+        :return: The shared language
+        """
+        if library_path is None:
+            library_path = str(cls.language_path)
+        key = (os.path.realpath(library_path), name)
+        language = cls.languages.get(key)
+        if language is None:
+            with cls.lock:
+                if key not in cls.languages:
+                    cls.languages[key] = Language(key[0], name)
+                language = cls.languages[key]
+        return language
+
+    @classmethod
+    def get_parser(
+        cls, library_path: str = None, name: str = "java"
+    ) -> tree_sitter.Parser:
+        """
+        :param library_path: The path of the language library. The default one is lib/build/my-languages.so
+        :param name: The language name
+        :return: The parser owned by the current thread
+        """
+        language = cls.get_language(library_path, name)
+        if not hasattr(cls.local, "parsers"):
+            cls.local.parsers = {}
+        parser = cls.local.parsers.get(id(language))
+        if parser is None:
+            parser = tree_sitter.Parser()
+            parser.set_language(language)
+            cls.local.parsers[id(language)] = parser
+        return parser
+
+
+class TSParseCache:
+    """
+    TSParseCache class for sharing parse trees across the whole process.
+    The trees are keyed by the source bytes, so that each distinct function text is parsed once.
+    The cache is bounded and evicts the least recently used tree.
+    """
+
+    max_size: int = 1024
+    trees: OrderedDict = OrderedDict()
+    lock = threading.Lock()
+    hit_count: int = 0
+    miss_count: int = 0
+
+    @classmethod
+    def parse(cls, parser: tree_sitter.Parser, source_code: str) -> tree_sitter.Tree:
+        """
+        :param parser: the parser used when the tree is not cached
+        :param source_code: the source code to be parsed
+        :return: the parse tree, which should not be edited by the caller
+        """
+        key = bytes(source_code, "utf8")
+        with cls.lock:
+            tree = cls.trees.get(key)
+            if tree is not None:
+                cls.trees.move_to_end(key)
+                cls.hit_count += 1
+                return tree
+            cls.miss_count += 1
+        tree = parser.parse(key)
+        with cls.lock:
+            cls.trees[key] = tree
+            cls.trees.move_to_end(key)
+            while len(cls.trees) > cls.max_size:
+                cls.trees.popitem(last=False)
+        return tree
+
+    @classmethod
+    def clear(cls) -> None:
+        with cls.lock:
+            cls.trees.clear()
+            cls.hit_count = 0
+            cls.miss_count = 0
+
+
+class TSStaticFieldCache:
+    """
+    TSStaticFieldCache class for sharing the static fields of support files across TSParser instances.
+    The facts are keyed by the hashes of the support files and persisted to disk,
+    so that a batch computes them once and later batches load them directly.
+    """
+
+    # Bump the version when the extraction of static fields changes
+    version: int = 1
+    cache_dir: Path = (
+        Path(__file__).resolve().parent.parent.parent / "log" / "static_field_cache"
+    )
+    file_digests: Dict[Tuple[str, int, int], str] = {}
+    facts: Dict[str, Mapping[str, str]] = {}
+    lock = threading.Lock()
+
+    @classmethod
+    def compute_key(cls, support_files: List[str]) -> str:
+        """
+        :param support_files: The paths of the support files
+        :return: The hash of the contents of the support files in order
+        """
+        hasher = hashlib.sha256(str(cls.version).encode())
+        for support_file in support_files:
+            stat = os.stat(support_file)
+            file_key = (support_file, stat.st_mtime_ns, stat.st_size)
+            with cls.lock:
+                digest = cls.file_digests.get(file_key)
+            if digest is None:
+                # The file is hashed outside the lock, and the digest is stored under it
+                with open(support_file, "rb") as file:
+                    digest = hashlib.sha256(file.read()).hexdigest()
+                with cls.lock:
+                    digest = cls.file_digests.setdefault(file_key, digest)
+            hasher.update(digest.encode())
+        return hasher.hexdigest()
+
+    @classmethod
+    def get(
+        cls, support_files: List[str], ts_parser: "TSParser" = None
+    ) -> Mapping[str, str]:
+        """
+        Compute the static fields of the support files at most once
+        :param support_files: The paths of the support files
+        :param ts_parser: The parser used when the facts are neither cached nor persisted
+        :return: The read-only map from field names to their initializations
+        """
+        key = cls.compute_key(support_files)
+        static_field_info = cls.facts.get(key)
+        if static_field_info is not None:
+            return static_field_info
+        with cls.lock:
+            if key in cls.facts:
+                return cls.facts[key]
+            cache_file_path = cls.cache_dir / (key + ".json")
+            static_field_info = None
+            if cache_file_path.exists():
+                try:
+                    with open(cache_file_path, "r") as file:
+                        static_field_info = json.load(file)
+                except (OSError, ValueError):
+                    static_field_info = None
+            if static_field_info is None:
+                if ts_parser is None:
+                    ts_parser = TSParser("")
+                static_field_info = {}
+                for support_file in support_files:
+                    ts_parser.parse_static_fields(support_file, static_field_info)
+                try:
+                    os.makedirs(cls.cache_dir, exist_ok=True)
+                    with open(cache_file_path, "w") as file:
+                        json.dump(static_field_info, file, indent=4)
+                except OSError:
+                    pass
+            cls.facts[key] = MappingProxyType(static_field_info)
+            return cls.facts[key]
 
 
 class TSParser:
@@ -26,19 +207,29 @@ class TSParser:
         self.fileToImports: Dict[str, set[str]] = {}
         self.fileToClasses: Dict[str, set[str]] = {}
         self.functionToFile: Dict[int, str] = {}
+        # The number of formal parameters. -1 indicates variable arity
+        self.functionToArity: Dict[int, int] = {}
         self.packageToClasses: Dict[str, set[str]] = {}
 
-        self.static_field_info: Dict[str, str] = {}
+        self.static_field_info: Mapping[str, str] = {}
 
-        cwd = Path(__file__).resolve().parent.absolute()
-        TSPATH = cwd.parent.parent / "lib/build/"
-        language_path = TSPATH / "my-languages.so"
-        # Load the Java language
-        self.java_lang: Language = Language(str(language_path), "java")
+        # The Java language is loaded once per process
+        self.java_lang: Language = TSLanguage.get_language()
 
-        # Initialize the parser
-        self.parser: tree_sitter.Parser = tree_sitter.Parser()
-        self.parser.set_language(self.java_lang)
+    @property
+    def parser(self) -> tree_sitter.Parser:
+        """
+        The parser of the current thread
+        """
+        return TSLanguage.get_parser()
+
+    def parse(self, source_code: str) -> tree_sitter.Tree:
+        """
+        Parse the source code through the shared parse cache
+        :param source_code: The content of the source code
+        :return: The parse tree
+        """
+        return TSParseCache.parse(self.parser, source_code)
 
     def parse_package_info(
         self, file_path: str, source_code: str, root_node: tree_sitter.Tree
@@ -140,6 +331,9 @@ class TSParser:
                                     self.classToFunctions[class_name] = []
                                 self.classToFunctions[class_name].append(method_id)
                                 self.functionToFile[method_id] = file_path
+                                self.functionToArity[method_id] = (
+                                    self.parse_method_arity(child_child_node)
+                                )
 
                             # Extract fields
                             if child_child_node.type == "field_declaration":
@@ -170,6 +364,24 @@ class TSParser:
                                                     field_id
                                                 )
 
+    @staticmethod
+    def parse_method_arity(method_node: tree_sitter.Node) -> int:
+        """
+        Count the formal parameters of a method declaration
+        :param method_node: The node of the method declaration
+        :return The number of formal parameters, or -1 if the method has variable arity
+        """
+        for child_node in method_node.children:
+            if child_node.type == "formal_parameters":
+                arity = 0
+                for parameter_node in child_node.children:
+                    if parameter_node.type == "spread_parameter":
+                        return -1
+                    if parameter_node.type == "formal_parameter":
+                        arity += 1
+                return arity
+        return 0
+
     def extract_single_file(self, file_path: str) -> None:
         """
         Process a single Java file and extract method and field information.
@@ -179,7 +391,7 @@ class TSParser:
             source_code = file.read()
 
         # Parse the Java code
-        tree: tree_sitter.Tree = self.parser.parse(bytes(source_code, "utf8"))
+        tree: tree_sitter.Tree = self.parse(source_code)
 
         # Get the root node of the parse tree
         root_node: tree_sitter.Node = tree.root_node
@@ -191,73 +403,164 @@ class TSParser:
             file_path, source_code, package_name, root_node
         )
 
-    def extract_static_field_from_support_files(self, support_files):
-        def find_nodes(
-            root_node: tree_sitter.Node, node_type: str
-        ) -> List[tree_sitter.Node]:
-            nodes = []
-            if root_node.type == node_type:
-                nodes.append(root_node)
+    def extract_static_field_from_support_files(self, support_files: List[str]) -> None:
+        """
+        Obtain the static fields of the support files,
+        which are computed once and shared read-only across TSParser instances
+        :param support_files: The paths of the support files
+        """
+        self.static_field_info = TSStaticFieldCache.get(support_files, self)
 
-            for child_node in root_node.children:
-                nodes.extend(find_nodes(child_node, node_type))
-            return nodes
+    def parse_static_fields(
+        self, support_file: str, static_field_info: Dict[str, str]
+    ) -> None:
+        """
+        Extract the static fields of a single support file
+        :param support_file: The path of the support file
+        :param static_field_info: The map from field names to their initializations, which is updated in place
+        """
+        with open(support_file, "r") as file:
+            source_code = file.read()
 
-        for support_file in support_files:
-            with open(support_file, "r") as file:
-                source_code = file.read()
+        # Parse the Java code
+        tree: tree_sitter.Tree = self.parse(source_code)
 
-            # Parse the Java code
-            tree: tree_sitter.Tree = self.parser.parse(bytes(source_code, "utf8"))
+        # Get the root node of the parse tree
+        root_node: tree_sitter.Node = tree.root_node
+        class_body_items = find_nodes_by_type(root_node, "class_declaration")
 
-            # Get the root node of the parse tree
-            root_node: tree_sitter.Node = tree.root_node
-            class_body_items = find_nodes(root_node, "class_declaration")
+        for class_body_item in class_body_items:
+            class_name = ""
+            for child_node in class_body_item.children:
+                if child_node.type == "identifier":
+                    class_name = source_code[
+                        child_node.start_byte : child_node.end_byte
+                    ]
+                elif child_node.type == "class_body":
+                    for child_child_node in child_node.children:
+                        if child_child_node.type == "field_declaration":
+                            if (
+                                " static "
+                                in source_code[
+                                    child_child_node.start_byte : child_child_node.end_byte
+                                ]
+                            ):
+                                for field_token in child_child_node.children:
+                                    if field_token.type == "variable_declarator":
+                                        info_str = source_code[
+                                            field_token.start_byte : field_token.end_byte
+                                        ]
+                                        field_name = info_str.split("=")[0].rstrip()
+                                        assigned_value = info_str.split("=")[1].lstrip()
+                                        static_field_info[
+                                            class_name + "." + field_name
+                                        ] = (
+                                            class_name
+                                            + "."
+                                            + field_name
+                                            + " = "
+                                            + assigned_value
+                                        )
 
-            for class_body_item in class_body_items:
-                class_name = ""
-                for child_node in class_body_item.children:
-                    if child_node.type == "identifier":
-                        class_name = source_code[
-                            child_node.start_byte : child_node.end_byte
-                        ]
-                    elif child_node.type == "class_body":
-                        for child_child_node in child_node.children:
-                            if child_child_node.type == "field_declaration":
-                                if (
-                                    " static "
-                                    in source_code[
-                                        child_child_node.start_byte : child_child_node.end_byte
-                                    ]
-                                ):
-                                    for field_token in child_child_node.children:
-                                        if field_token.type == "variable_declarator":
-                                            info_str = source_code[
-                                                field_token.start_byte : field_token.end_byte
-                                            ]
-                                            field_name = info_str.split("=")[0].rstrip()
-                                            assigned_value = info_str.split("=")[
-                                                1
-                                            ].lstrip()
-                                            self.static_field_info[
-                                                class_name + "." + field_name
-                                            ] = (
-                                                class_name
-                                                + "."
-                                                + field_name
-                                                + " = "
-                                                + assigned_value
-                                            )
-
-    def extract_all(self) -> None:
-        """
-        Process all the files in the project path and invoke extract_single_file for each file.
+    def export_file_facts(self, file_path: str) -> Dict:
+        """
+        Export the facts of a single file in a compact and picklable form
+        :param file_path: The path of the Java file, which should have been extracted
+        :return: The facts, where methods and fields are listed in the order of their ids
+        """
+        function_to_class = {}
+        for class_name in self.classToFunctions:
+            for method_id in self.classToFunctions[class_name]:
+                function_to_class[method_id] = class_name
+        field_to_class = {}
+        for class_name in self.classToFields:
+            for field_id in self.classToFields[class_name]:
+                field_to_class[field_id] = class_name
+
+        return {
+            "file_path": file_path,
+            "package": self.fileToPackage.get(file_path),
+            "imports": sorted(self.fileToImports.get(file_path, [])),
+            "classes": sorted(self.fileToClasses.get(file_path, [])),
+            "package_classes": {
+                package_name: sorted(self.packageToClasses[package_name])
+                for package_name in self.packageToClasses
+            },
+            "methods": [
+                (
+                    function_to_class[method_id],
+                    self.methods[method_id][0],
+                    self.methods[method_id][1],
+                    self.functionToArity[method_id],
+                )
+                for method_id in sorted(self.methods)
+                if self.functionToFile.get(method_id) == file_path
+            ],
+            "fields": [
+                (
+                    field_to_class[field_id],
+                    self.fields[field_id],
+                    self.fields_init[field_id],
+                )
+                for field_id in sorted(self.fields)
+            ],
+        }
+
+    def merge_file_facts(self, facts: Dict) -> None:
+        """
+        Merge the facts of a single file exported by export_file_facts.
+        The method ids and field ids are assigned in the same way as extract_single_file
+        :param facts: The facts of a single file
         """
+        file_path = facts["file_path"]
+        if facts["package"] is not None:
+            self.fileToPackage[file_path] = facts["package"]
+        if len(facts["imports"]) > 0:
+            self.fileToImports.setdefault(file_path, set([])).update(facts["imports"])
+        if len(facts["classes"]) > 0:
+            self.fileToClasses.setdefault(file_path, set([])).update(facts["classes"])
+        for package_name, class_names in facts["package_classes"].items():
+            self.packageToClasses.setdefault(package_name, set([])).update(class_names)
+
+        for class_name, method_name, method_code, arity in facts["methods"]:
+            method_id = len(self.methods) + 1
+            self.methods[method_id] = (method_name, method_code)
+            self.classToFunctions.setdefault(class_name, []).append(method_id)
+            self.functionToFile[method_id] = file_path
+            self.functionToArity[method_id] = arity
+
+        for class_name, field_name, field_init in facts["fields"]:
+            field_id = len(self.fields)
+            self.fields[field_id] = field_name
+            self.fields_init[field_id] = field_init
+            self.classToFields.setdefault(class_name, []).append(field_id)
+
+    def extract_all(self, proj_path: str, max_workers: int = None) -> None:
+        """
+        Process all the files in the project path.
+        The files are parsed in worker processes, and their facts are merged in the order of the sorted paths,
+        so that the ids are deterministic.
+        :param proj_path: The path of the project
+        :param max_workers: The number of worker processes. The files are parsed serially if it is 1
+        """
+        self.proj_path = proj_path
+        java_file_paths = []
         for root, _, files in os.walk(self.proj_path):
             for file in files:
                 if file.endswith(".java"):
-                    file_path: str = os.path.join(root, file)
-                    self.extract_single_file(file_path)
+                    java_file_paths.append(os.path.join(root, file))
+        java_file_paths.sort()
+
+        if max_workers == 1 or len(java_file_paths) <= 1:
+            all_facts = map(extract_file_facts, java_file_paths)
+            for facts in all_facts:
+                self.merge_file_facts(facts)
+            return
+
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            for facts in executor.map(extract_file_facts, java_file_paths, chunksize=8):
+                self.merge_file_facts(facts)
+        return
 
     def get_pretty_ast(self, file_path: str) -> str:
         """
@@ -267,7 +570,7 @@ class TSParser:
             source_code = file.read()
 
         # parse source code
-        tree: tree_sitter.Tree = self.parser.parse(bytes(source_code, "utf8"))
+        tree: tree_sitter.Tree = self.parse(source_code)
 
         def traverse(node: tree_sitter.Node, depth: int) -> str:
             ret = ""
@@ -289,6 +592,17 @@ class TSParser:
             source_code = file.read()
 
         # parse source code
-        tree: tree_sitter.Tree = self.parser.parse(bytes(source_code, "utf8"))
+        tree: tree_sitter.Tree = self.parse(source_code)
 
         return tree
+
+
+def extract_file_facts(file_path: str) -> Dict:
+    """
+    Parse a single Java file and export its facts. It is the task of the worker processes in extract_all.
+    :param file_path: The path of the Java file.
+    :return: The facts of the file
+    """
+    ts_parser = TSParser(file_path)
+    ts_parser.extract_single_file(file_path)
+    return ts_parser.export_file_facts(file_path)
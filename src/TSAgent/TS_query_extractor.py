@@ -0,0 +1,375 @@
+import ast
+import bisect
+import copy
+import json
+import re
+import sys
+from os import path
+from typing import Dict, List, Optional, Tuple
+
+import tree_sitter
+
+sys.path.append(path.dirname(path.dirname(path.abspath(__file__))))
+from TSAgent.TS_parser import TSLanguage
+from utility.function import LocalValue, ValueType
+
+# The ways of extracting the values from the matched nodes
+# assignee: the assigned variable of each @scope node containing a @trigger node
+# arguments: the arguments of each @anchor method invocation
+# right_identifier: the right operand of each @anchor binary expression if it is an identifier
+EXTRACT_KINDS = ["assignee", "arguments", "right_identifier"]
+
+# The templates of the synthesized extractors, which can be compiled into queries
+SOURCE_TEMPLATE = """
+@regulate_return_value
+def {fn_name}(source_code, root_node):
+    assignments = TSUtils.find_nodes_by_type(root_node, "assignment_expression")
+    declarations = TSUtils.find_nodes_by_type(root_node, "variable_declarator")
+    assignments.extend(declarations)
+    sources = []
+    for node in assignments:
+{nested_children}
+        for child in nested_children:
+            if {condition}:
+                v: DFValue = (
+                    TSUtils.get_line_number(source_code, node),
+                    source_code[node.start_byte : node.end_byte]
+                    .split("=")[0]
+                    .strip()
+                    .split(" ")[-1],
+                    "source",
+                )
+                sources.append(v)
+    return sources
+"""
+
+SINK_TEMPLATE = """
+@regulate_return_value
+def {fn_name}(source_code, root_node):
+    nodes = TSUtils.find_nodes_by_type(root_node, {node_type})
+    sink_nodes = []
+    for node in nodes:
+        if {condition}:
+            sink_nodes.append(node)
+    sinks = []
+
+    def extract_sinks(node):
+        sink_values = []
+        line_number = TSUtils.get_line_number(source_code, node)
+{extract_body}
+        return sink_values
+
+    for node in sink_nodes:
+        sinks.extend(extract_sinks(node))
+    return sinks
+"""
+
+ARGUMENTS_EXTRACTION = """
+        arguments = TSUtils.get_argument_list(node)
+        for arg in arguments:
+            sink_values.append(
+                (line_number, source_code[arg.start_byte : arg.end_byte], "sink")
+            )
+"""
+
+RIGHT_IDENTIFIER_EXTRACTION = """
+        operands = TSUtils.get_binary_expression_operands(node)
+        if len(operands) == 2 and operands[1].type == "identifier":
+            sink_values.append(
+                (
+                    line_number,
+                    source_code[operands[1].start_byte : operands[1].end_byte],
+                    "sink",
+                )
+            )
+"""
+
+
+class TSQueryExtractor:
+    """
+    TSQueryExtractor class for a source or sink extractor in the form of a tree-sitter query.
+    The nodes are selected by the query engine, including the text predicates (#match?),
+    and the values are extracted from the captured nodes in the same way as the synthesized extractors,
+    so that the outputs are identical to the ones of the python form.
+    The query engine of the tree-sitter binding is slower than the python forms on the Juliet functions,
+    e.g., captures alone take about 1.6x the time of find_dbz_sink,
+    and thus the query forms are not selected by the registry by default.
+    """
+
+    def __init__(self, query: str, extract: str, role: str) -> None:
+        """
+        :param query: the S-expression of the query
+        :param extract: the way of extracting the values, which is one of EXTRACT_KINDS
+        :param role: source or sink
+        """
+        assert extract in EXTRACT_KINDS
+        self.query_text: str = query
+        self.extract: str = extract
+        self.role: str = role
+        self.v_type: ValueType = ValueType.SRC if role == "source" else ValueType.SINK
+        self.query: tree_sitter.Query = TSLanguage.get_language().query(query)
+
+        # The patterns are ordered as the node types are searched in the python form
+        self.scope_types: List[str] = re.findall(r"\((\w+)\) @scope", query)
+        self.trigger_types: List[str] = re.findall(r"\((\w+)\) @trigger", query)
+
+    def __call__(
+        self, source_code: str, root_node: tree_sitter.Node
+    ) -> List[LocalValue]:
+        nodes: Dict[str, Dict[str, List[tree_sitter.Node]]] = {}
+        visited = set([])
+        for node, capture in self.query.captures(root_node):
+            key = (capture, node.id, node.type)
+            if key in visited:
+                continue
+            visited.add(key)
+            nodes.setdefault(capture, {}).setdefault(node.type, []).append(node)
+        for type_to_nodes in nodes.values():
+            for type_nodes in type_to_nodes.values():
+                # Pre-order, which is consistent with find_nodes_by_type
+                type_nodes.sort(key=lambda node: (node.start_byte, -node.end_byte))
+
+        values = []
+        if self.extract == "assignee":
+            scopes = nodes.get("scope", {})
+            triggers = nodes.get("trigger", {})
+            trigger_starts = {
+                node_type: [node.start_byte for node in type_nodes]
+                for node_type, type_nodes in triggers.items()
+            }
+            for scope_type in self.scope_types:
+                for scope in scopes.get(scope_type, []):
+                    name = (
+                        source_code[scope.start_byte : scope.end_byte]
+                        .split("=")[0]
+                        .strip()
+                        .split(" ")[-1]
+                    )
+                    line_number = scope.start_point[0] + 1
+                    for trigger_type in self.trigger_types:
+                        type_nodes = triggers.get(trigger_type, [])
+                        i = bisect.bisect_left(
+                            trigger_starts.get(trigger_type, []), scope.start_byte
+                        )
+                        while (
+                            i < len(type_nodes)
+                            and type_nodes[i].start_byte < scope.end_byte
+                        ):
+                            if type_nodes[i].end_byte <= scope.end_byte:
+                                values.append(
+                                    LocalValue(name, line_number, self.v_type)
+                                )
+                            i += 1
+            return values
+
+        anchors = []
+        for type_nodes in nodes.get("anchor", {}).values():
+            anchors.extend(type_nodes)
+        anchors.sort(key=lambda node: (node.start_byte, -node.end_byte))
+        for anchor in anchors:
+            line_number = anchor.start_point[0] + 1
+            if self.extract == "arguments":
+                for child in anchor.children:
+                    if child.type == "argument_list":
+                        for arg in child.children[1:-1]:
+                            values.append(
+                                LocalValue(
+                                    source_code[arg.start_byte : arg.end_byte],
+                                    line_number,
+                                    self.v_type,
+                                )
+                            )
+                        break
+            elif self.extract == "right_identifier":
+                operand = anchor.children[2]
+                if operand.type == "identifier":
+                    values.append(
+                        LocalValue(
+                            source_code[operand.start_byte : operand.end_byte],
+                            line_number,
+                            self.v_type,
+                        )
+                    )
+        return values
+
+    def to_dict(self) -> Dict:
+        return {"query": self.query_text, "extract": self.extract, "role": self.role}
+
+    @staticmethod
+    def compile_condition(condition: ast.expr) -> Optional[str]:
+        """
+        Compile the condition on the text of a node into a regular expression,
+        e.g., "readLine" in text or text == "0" is compiled into readLine|^0$
+        :param condition: the condition in the python form
+        :return the regular expression, or None if the condition is not a disjunction of text tests
+        """
+
+        def is_text(expr: ast.expr) -> bool:
+            return (
+                isinstance(expr, ast.Subscript)
+                and isinstance(expr.slice, ast.Slice)
+                and isinstance(expr.slice.lower, ast.Attribute)
+                and expr.slice.lower.attr == "start_byte"
+                and isinstance(expr.slice.upper, ast.Attribute)
+                and expr.slice.upper.attr == "end_byte"
+            )
+
+        def is_literal(expr: ast.expr) -> bool:
+            return isinstance(expr, ast.Constant) and isinstance(expr.value, str)
+
+        tests = (
+            condition.values
+            if isinstance(condition, ast.BoolOp) and isinstance(condition.op, ast.Or)
+            else [condition]
+        )
+        alternatives = []
+        for test in tests:
+            if not isinstance(test, ast.Compare) or len(test.ops) != 1:
+                return None
+            left, op, right = test.left, test.ops[0], test.comparators[0]
+            if isinstance(op, ast.In) and is_literal(left) and is_text(right):
+                alternatives.append(re.escape(left.value))
+            elif isinstance(op, ast.Eq) and is_text(left) and is_literal(right):
+                alternatives.append("^" + re.escape(right.value) + "$")
+            elif isinstance(op, ast.Eq) and is_literal(left) and is_text(right):
+                alternatives.append("^" + re.escape(left.value) + "$")
+            else:
+                return None
+        return "|".join(alternatives)
+
+    @staticmethod
+    def normalize(function: ast.FunctionDef) -> str:
+        """
+        Dump a function without the docstrings, the pass statements, and the annotations of the parameters,
+        which do not affect the behavior of an extractor
+        """
+
+        class Normalizer(ast.NodeTransformer):
+            def visit_FunctionDef(self, node: ast.FunctionDef) -> ast.FunctionDef:
+                self.generic_visit(node)
+                node.returns = None
+                for arg in node.args.args:
+                    arg.annotation = None
+                return node
+
+            def generic_visit(self, node: ast.AST) -> ast.AST:
+                super().generic_visit(node)
+                body = getattr(node, "body", None)
+                if isinstance(body, list):
+                    node.body = [
+                        stmt
+                        for stmt in body
+                        if not isinstance(stmt, ast.Pass)
+                        and not (
+                            isinstance(stmt, ast.Expr)
+                            and isinstance(stmt.value, ast.Constant)
+                            and isinstance(stmt.value.value, str)
+                        )
+                    ]
+                return node
+
+        return ast.dump(Normalizer().visit(copy.deepcopy(function)))
+
+    @staticmethod
+    def from_python(source: str, fn_name: str) -> Optional["TSQueryExtractor"]:
+        """
+        Compile a synthesized extractor following the source or sink template into a query.
+        The extractor is compiled only if it is identical to a template instantiated with its node types
+        and its condition, up to the docstrings, the comments, and the formatting.
+        :param source: the source code containing the synthesized extractor
+        :param fn_name: the name of the extractor function
+        :return the query form, or None if the extractor cannot be expressed as a query
+        """
+        try:
+            module = ast.parse(source)
+        except SyntaxError:
+            return None
+        functions = [
+            node
+            for node in module.body
+            if isinstance(node, ast.FunctionDef) and node.name == fn_name
+        ]
+        if len(functions) == 0:
+            return None
+        function = functions[-1]
+        normalized_function = TSQueryExtractor.normalize(function)
+
+        # The node types in the order of the searches
+        calls = [
+            node
+            for node in ast.walk(function)
+            if isinstance(node, ast.Call)
+            and isinstance(node.func, ast.Attribute)
+            and node.func.attr == "find_nodes_by_type"
+            and len(node.args) == 2
+            and isinstance(node.args[1], ast.Constant)
+            and isinstance(node.args[1].value, str)
+        ]
+        calls.sort(key=lambda node: (node.lineno, node.col_offset))
+        node_types = [call.args[1].value for call in calls]
+        if len(node_types) == 0:
+            return None
+
+        # Each condition on the text of a node is tried as the condition of the template
+        for if_node in [
+            node for node in ast.walk(function) if isinstance(node, ast.If)
+        ]:
+            pattern = TSQueryExtractor.compile_condition(if_node.test)
+            if pattern is None:
+                continue
+            condition = ast.unparse(if_node.test)
+            predicate = json.dumps(pattern)
+
+            nested_types = node_types[2:]
+            if len(nested_types) > 0:
+                nested_children = [
+                    "        nested_children = TSUtils.find_nodes_by_type(node, %s)"
+                    % json.dumps(nested_types[0])
+                ]
+                nested_children += [
+                    "        nested_children.extend(TSUtils.find_nodes_by_type(node, %s))"
+                    % json.dumps(node_type)
+                    for node_type in nested_types[1:]
+                ]
+                template = SOURCE_TEMPLATE.format(
+                    fn_name=fn_name,
+                    nested_children="\n".join(nested_children),
+                    condition=condition,
+                )
+                if TSQueryExtractor.normalize(
+                    ast.parse(template).body[0]
+                ) == normalized_function and node_types[:2] == [
+                    "assignment_expression",
+                    "variable_declarator",
+                ]:
+                    patterns = [
+                        "(%s) @scope" % node_type for node_type in node_types[:2]
+                    ]
+                    patterns += [
+                        "((%s) @trigger (#match? @trigger %s))" % (node_type, predicate)
+                        for node_type in nested_types
+                    ]
+                    return TSQueryExtractor("\n".join(patterns), "assignee", "source")
+
+            # The helpers of the sink templates only accept their node types
+            for extract, node_type, extract_body in [
+                ("arguments", "method_invocation", ARGUMENTS_EXTRACTION),
+                ("right_identifier", "binary_expression", RIGHT_IDENTIFIER_EXTRACTION),
+            ]:
+                template = SINK_TEMPLATE.format(
+                    fn_name=fn_name,
+                    node_type=json.dumps(node_type),
+                    condition=condition,
+                    extract_body=extract_body,
+                )
+                if (
+                    node_types == [node_type]
+                    and TSQueryExtractor.normalize(ast.parse(template).body[0])
+                    == normalized_function
+                ):
+                    query = "((%s) @anchor (#match? @anchor %s))" % (
+                        node_type,
+                        predicate,
+                    )
+                    return TSQueryExtractor(query, extract, "sink")
+        return None
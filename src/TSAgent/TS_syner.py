@@ -29,7 +29,7 @@ def get_prompts(
 
                 def traverse(node: Node, results: List[LocalValue]):
                     if is_interesting(node):
-                        line_number = source_code[: node.start_byte].count("\n") + 1
+                        line_number = node.start_point[0] + 1
                         name = source_code[node.start_byte : node.end_byte]
                         results.append(LocalValue(name, line_number, ValueType.{'SRC' if source_or_sink == 'source' else 'SINK'}))
                         return
@@ -31,9 +31,7 @@ class TSFunctionTransformer:
         """
         # convert the function to SSI form.
         # The current implementation can not handle long call chains
-        tree: tree_sitter.Tree = self.ts_analyzer.ts_parser.parser.parse(
-            bytes(source_code, "utf8")
-        )
+        tree: tree_sitter.Tree = self.ts_analyzer.ts_parser.parse(source_code)
 
         node = tree.root_node
         # The list of (line_number, index_number, callee_name, arg_text)
@@ -58,9 +56,8 @@ class TSFunctionTransformer:
                                 arg_text = source_code[
                                     sub_mi_node.start_byte : sub_mi_node.end_byte
                                 ]
-                                arg_line_number = (
-                                    source_code[: sub_mi_node.start_byte].count("\n")
-                                    + 1
+                                arg_line_number = self.ts_analyzer.get_line_number(
+                                    sub_mi_node
                                 )
                                 arg_index_number = index
                                 index += 1
@@ -149,22 +146,27 @@ class TSFunctionTransformer:
     def remove_comments_in_function(self):
         # remove comments and remain the lines as blank
         # Find comment nodes and store their line numbers
-        tree: tree_sitter.Tree = self.ts_analyzer.ts_parser.parser.parse(
-            bytes(self.SSI, "utf8")
-        )
+        tree: tree_sitter.Tree = self.ts_analyzer.ts_parser.parse(self.SSI)
 
         root_node = tree.root_node
 
         nodes = self.ts_analyzer.find_nodes(root_node, "line_comment")
         nodes.extend(self.ts_analyzer.find_nodes(root_node, "block_comment"))
         nodes.extend(self.ts_analyzer.find_nodes(root_node, "javadoc_comment"))
+        nodes.sort(key=lambda node: node.start_byte)
 
-        self.SSI_without_comments = self.SSI
+        # Splice the byte ranges of the comments in a single pass
+        code = bytes(self.SSI, "utf8")
+        segments = []
+        current_byte = 0
         for node in nodes:
-            comment = self.SSI[node.start_byte : node.end_byte]
-            self.SSI_without_comments = self.SSI_without_comments.replace(
-                comment, "\n" * comment.count("\n")
-            )
+            if node.start_byte < current_byte:
+                continue
+            segments.append(code[current_byte : node.start_byte])
+            segments.append(b"\n" * code.count(b"\n", node.start_byte, node.end_byte))
+            current_byte = node.end_byte
+        segments.append(code[current_byte:])
+        self.SSI_without_comments = b"".join(segments).decode("utf8")
         return
 
     def attach_line_number(self):
@@ -176,13 +178,8 @@ class TSFunctionTransformer:
         new_function = (
             self.SSI_without_comments.replace("```", "").lstrip("\n").rstrip("\n")
         )
-        function_content = "1. " + new_function
-        line_no = 2
-        self.lined_SSI_function_without_comments = ""
-        for ch in function_content:
-            if ch == "\n":
-                self.lined_SSI_function_without_comments += "\n" + str(line_no) + ". "
-                line_no += 1
-            else:
-                self.lined_SSI_function_without_comments += ch
+        self.lined_SSI_function_without_comments = "\n".join(
+            str(line_no) + ". " + line
+            for line_no, line in enumerate(new_function.split("\n"), start=1)
+        )
         return
@@ -0,0 +1,119 @@
+"""
+The extraction rules of sources and sinks and the visitor evaluating them together.
+Only the node rules, e.g., the *_RULE forms attached to the manual extractors, are evaluated in one pass
+over the node index of a function. The tree rules, which wrap the synthesized extractors selected by default,
+share the node index but still walk the nodes they query separately.
+"""
+
+import sys
+from os import path
+import tree_sitter
+
+sys.path.append(path.dirname(path.dirname(path.dirname(path.abspath(__file__)))))
+from TSAgent.TS_index import TSNodeIndex, TSNodeIndexCache
+from typing import Callable, List, Optional, Tuple
+from utility.function import *
+
+
+class ExtractionRule:
+    """
+    ExtractionRule class for a source or sink rule.
+    A node rule registers the node types it is interested in and is evaluated on each node of these types.
+    A tree rule wraps an extractor function, e.g., a synthesized one, and is evaluated on the root node.
+    The synthesized extractors are arbitrary functions over the root node, so they are evaluated as tree rules,
+    which share the node index with the other rules but not the evaluation over the indexed nodes.
+    """
+
+    def __init__(
+        self,
+        node_types: Optional[List[str]],
+        visit: Callable[[str, tree_sitter.Node], List[LocalValue]],
+    ) -> None:
+        """
+        :param node_types: the interesting node types, or None for a tree rule
+        :param visit: the function mapping the source code and a node to the extracted values
+        """
+        self.node_types: Optional[List[str]] = node_types
+        self.visit = visit
+
+    @staticmethod
+    def from_extractor(
+        extractor: Callable[[str, tree_sitter.Node], List[LocalValue]],
+    ) -> "ExtractionRule":
+        """
+        :param extractor: the extractor function of a source or sink
+        :return the node rule attached to the extractor by extraction_rule, or a tree rule wrapping it
+        """
+        rule = getattr(extractor, "extraction_rule", None)
+        if isinstance(rule, ExtractionRule):
+            return rule
+        return ExtractionRule(None, extractor)
+
+    def extract(
+        self,
+        source_code: str,
+        root_node: tree_sitter.Node,
+        index: TSNodeIndex = None,
+    ) -> List[LocalValue]:
+        """
+        Evaluate the rule upon the nodes of the interesting types in the order of the types
+        :param source_code: the source code of a function
+        :param root_node: the root node of the parse tree of the function
+        :param index: the node index of the root node
+        :return the list of the extracted values
+        """
+        if self.node_types is None:
+            return self.visit(source_code, root_node)
+        if index is None:
+            index = TSNodeIndexCache.get(root_node)
+        values = []
+        for node_type in self.node_types:
+            for node in index.type_to_nodes.get(node_type, []):
+                values.extend(self.visit(source_code, node))
+        return values
+
+
+def extraction_rule(rule: ExtractionRule) -> Callable:
+    """
+    Attach a node rule to the extractor function evaluating it,
+    so that the visitor evaluates the rule upon the shared node index instead of calling the function
+    :param rule: the node rule evaluated by the decorated extractor
+    :return the decorator
+    """
+
+    def decorator(extractor: Callable) -> Callable:
+        extractor.extraction_rule = rule
+        return extractor
+
+    return decorator
+
+
+class TSExtractionVisitor:
+    """
+    TSExtractionVisitor class for evaluating the source rules and the sink rules together.
+    The tree is traversed once to build the node index shared by all the rules,
+    including the node type queries issued inside the tree rules.
+    """
+
+    def __init__(
+        self, src_rules: List[ExtractionRule], sink_rules: List[ExtractionRule]
+    ) -> None:
+        self.src_rules: List[ExtractionRule] = src_rules
+        self.sink_rules: List[ExtractionRule] = sink_rules
+
+    def apply(
+        self, source_code: str, root_node: tree_sitter.Node
+    ) -> Tuple[Tuple[LocalValue, ...], Tuple[LocalValue, ...]]:
+        """
+        :param source_code: the source code of a function
+        :param root_node: the root node of the parse tree of the function
+        :return the source values and the sink values in new tuples
+        """
+        index = TSNodeIndexCache.get(root_node)
+        srcs = []
+        for rule in self.src_rules:
+            srcs.extend(rule.extract(source_code, root_node, index))
+        sinks = []
+        for rule in self.sink_rules:
+            sinks.extend(rule.extract(source_code, root_node, index))
+        return tuple(srcs), tuple(sinks)
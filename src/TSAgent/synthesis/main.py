@@ -1,4 +1,5 @@
 from argparse import ArgumentParser
+import json
 import logging
 import warnings
 
@@ -9,99 +10,63 @@ from collections import defaultdict
 from logging import Logger
 from pathlib import Path
 import time
+from concurrent.futures import ThreadPoolExecutor
 
 sys.path.append(os.path.join(os.path.dirname(__file__), "../../"))
 from TSAgent.synthesis.utils import SynSpec, Example
 from TSAgent.synthesis.llm import GPT, LLM, Claude, Gemini
-from TSAgent.synthesis.prompts.examples import (
-    dbz_source_examples,
-    dbz_sink_examples,
-    xss_source_examples,
-    xss_sink_examples,
-    ci_source_examples,
-    ci_sink_examples,
+from TSAgent.synthesis.specs import (
+    dbz_source_spec,
+    dbz_sink_spec,
+    xss_source_spec,
+    xss_sink_spec,
+    ci_source_spec,
+    ci_sink_spec,
 )
-from TSAgent.synthesis.synthesize import synthesize
+from TSAgent.synthesis.synthesize import (
+    synthesize,
+    synthesize_parallel,
+    measure_parser,
+    measure_extractor,
+    SynthesisBudget,
+)
+from TSAgent.TS_extractor_registry import TSExtractorRegistry
+from TSAgent.TS_query_extractor import TSQueryExtractor
 
 
 def synthesize_dbz_source(model: LLM) -> tuple[str, int]:
-    rules = """
-    - If there is an integer literal node whose text is exactly `0`, that line may contain source values.
-    - If there is a floating point literal node whose text is exactly `0.0` or `0.0f`, then that line may contain source values.
-    - If any of the `parseInt`, `parseFloat`, `nextInt`, or `nextFloat` is a substring of a method invocation, the line contains source values.
-    """
-    spec = SynSpec(
-        fn_name="find_dbz_src",
-        df_type="source",
-        rules=rules,
-        examples=[Example.from_str(e) for e in dbz_source_examples],
-    )
-    return synthesize(model, spec)
+    return synthesize(model, dbz_source_spec())
 
 
 def synthesize_dbz_sink(model: LLM) -> tuple[str, int]:
-    rules = """
-    - If there is an binary operation whose text contains `/` or `%`, then the second operand (whose node type should be identifier) of the binary operation is sink.
-    """
-    spec = SynSpec(
-        fn_name="find_dbz_sink",
-        df_type="sink",
-        rules=rules,
-        examples=[Example.from_str(e) for e in dbz_sink_examples],
-    )
-    return synthesize(model, spec)
+    return synthesize(model, dbz_sink_spec())
 
 
 def synthesize_xss_source(model: LLM) -> tuple[str, int]:
-    rules = """
-    - If any of the `readLine`, `executeQuery`, `getCookies`, `getParameter`, `nextToken`, or `getProperty` is a substring of a method invocation, the line contains source values.
-    """
-    spec = SynSpec(
-        fn_name="find_xss_src",
-        df_type="source",
-        rules=rules,
-        examples=[Example.from_str(e) for e in xss_source_examples],
-    )
-    return synthesize(model, spec)
+    return synthesize(model, xss_source_spec())
 
 
 def synthesize_xss_sink(model: LLM) -> tuple[str, int]:
-    rules = """
-    - If either `println` or `print` is a substring of method invocation, then all the arguments of the method invocation are sinks. Give all the arguments as they are and do not decompose each argument.
-    """
-    spec = SynSpec(
-        fn_name="find_xss_sink",
-        df_type="sink",
-        rules=rules,
-        examples=[Example.from_str(e) for e in xss_sink_examples],
-    )
-    return synthesize(model, spec)
+    return synthesize(model, xss_sink_spec())
 
 
 def synthesize_ci_source(model: LLM) -> tuple[str, int]:
-    rules = """
-    - If any of the `readLine`, `getString`, `getenv`, `getValue`, `nextToken`, `executeQuery`, `getCookies`, `getParameter`, `nextToken`, `getProperty`, or `substring` is a substring of a method invocation, the line contains source values.
-    """
-    spec = SynSpec(
-        fn_name="find_ci_src",
-        df_type="source",
-        rules=rules,
-        examples=[Example.from_str(e) for e in ci_source_examples],
-    )
-    return synthesize(model, spec)
+    return synthesize(model, ci_source_spec())
 
 
 def synthesize_ci_sink(model: LLM) -> tuple[str, int]:
-    rules = """
-    - If `exec` is a substring of method invocation, then all the arguments of the method invocation are sinks. Give all the arguments as they are and do not decompose each argument.
-    """
-    spec = SynSpec(
-        fn_name="find_ci_sink",
-        df_type="sink",
-        rules=rules,
-        examples=[Example.from_str(e) for e in ci_sink_examples],
-    )
-    return synthesize(model, spec)
+    return synthesize(model, ci_sink_spec())
+
+
+# The extractors in the order of TS_synthesis_extractor.py
+EXTRACTOR_SPECS = {
+    "dbz_src": dbz_source_spec,
+    "dbz_sink": dbz_sink_spec,
+    "xss_src": xss_source_spec,
+    "xss_sink": xss_sink_spec,
+    "ci_src": ci_source_spec,
+    "ci_sink": ci_sink_spec,
+}
 
 
 def select_model(name: str, temperature: int, output_file: str) -> LLM:
@@ -145,42 +110,190 @@ def select_model(name: str, temperature: int, output_file: str) -> LLM:
     return model
 
 
-def run(
+def synthesize_extractor(
     fn_name: str,
     model_name: str,
-    temperature: int = 0,
-    output_file: str = "",
+    temperature: float = 0,
     log_file: str = "",
-):
+    candidates: int = 1,
+    max_iterations: int = None,
+    max_tokens: int = None,
+) -> str:
+    """
+    Synthesize a single extractor.
+    With more than one candidate, the candidates are synthesized concurrently with increasing temperatures.
+    """
+    if fn_name not in EXTRACTOR_SPECS:
+        raise ValueError(f"Unknown function name {fn_name}")
     logging.info(f"Synthesizing {fn_name} using {model_name}")
     start_at = time.time()
-    model = select_model(model_name, temperature, log_file)
-    if fn_name == "dbz_src":
-        parser, iterations = synthesize_dbz_source(model)
-    elif fn_name == "dbz_sink":
-        parser, iterations = synthesize_dbz_sink(model)
-    elif fn_name == "xss_src":
-        parser, iterations = synthesize_xss_source(model)
-    elif fn_name == "xss_sink":
-        parser, iterations = synthesize_xss_sink(model)
-    elif fn_name == "ci_src":
-        parser, iterations = synthesize_ci_source(model)
-    elif fn_name == "ci_sink":
-        parser, iterations = synthesize_ci_sink(model)
+    spec = EXTRACTOR_SPECS[fn_name]()
+    budget = SynthesisBudget(max_iterations, max_tokens)
+    if candidates == 1:
+        model = select_model(model_name, temperature, log_file)
+        parser, iterations = synthesize(model, spec, budget)
+        input_token_cost = model.input_token_cost
+        output_token_cost = model.output_token_cost
+        model.log(f"Total Iterations: {iterations}")
+        model.log(f"Total Input Token Cost: {input_token_cost}")
+        model.log(f"Total Output Token Cost: {output_token_cost}")
+        model.log(f"Total Time: {time.time() - start_at}")
+        logging.info(f"Total Input Token Cost: {input_token_cost}")
+        logging.info(f"Total Output Token Cost: {output_token_cost}")
     else:
-        raise ValueError(f"Unknown function name {fn_name}")
-    logging.info(f"Synthesized successfully in {iterations} iterations")
+        temperatures = [min(1.0, temperature + 0.2 * i) for i in range(candidates)]
+        parser, iterations = synthesize_parallel(
+            lambda t: select_model(model_name, t, log_file),
+            spec,
+            temperatures,
+            budget,
+        )
+        logging.info(f"Total Token Cost: {budget.tokens}")
+    if parser is None:
+        raise RuntimeError(f"Failed to synthesize {fn_name} within the budget")
+    if budget.winner is not None:
+        logging.info(f"Synthesized {fn_name} successfully in {iterations} iterations")
+    else:
+        logging.warning(
+            f"No synthesized {fn_name} passes all the examples within the budget"
+        )
     logging.info(f"Total Iterations: {iterations}")
-    logging.info(f"Total Input Token Cost: {model.input_token_cost}")
-    logging.info(f"Total Output Token Cost: {model.output_token_cost}")
     logging.info(f"Total Time: {time.time() - start_at}")
-    model.log(f"Total Iterations: {iterations}")
-    model.log(f"Total Input Token Cost: {model.input_token_cost}")
-    model.log(f"Total Output Token Cost: {model.output_token_cost}")
-    model.log(f"Total Time: {time.time() - start_at}")
+    return parser
+
+
+def register_extractor(fn_name: str, parser: str, emit_query: bool = False) -> None:
+    """
+    Store a synthesized extractor in the extractor registry with its validation score and timing.
+    If emit_query is True, its query form is also stored if the extractor can be compiled into a query.
+    """
+    spec = EXTRACTOR_SPECS[fn_name]()
+    bug_type = fn_name.split("_")[0]
+    validation_score, average_time = measure_parser(spec, parser)
+    entry = TSExtractorRegistry.register(
+        bug_type,
+        spec.df_type,
+        spec.fn_name,
+        parser,
+        spec.get_hash(),
+        validation_score,
+        average_time,
+    )
+    logging.info(
+        f"Registered {fn_name} as version {entry.version} "
+        f"(validation score {validation_score}, average time {average_time}s)"
+    )
+    if not emit_query:
+        return
+    query_extractor = TSQueryExtractor.from_python(parser, spec.fn_name)
+    if query_extractor is None:
+        logging.info(f"{fn_name} cannot be compiled into a query")
+        return
+    validation_score, average_time = measure_extractor(spec, query_extractor)
+    entry = TSExtractorRegistry.register(
+        bug_type,
+        spec.df_type,
+        spec.fn_name,
+        query_extractor.query_text,
+        spec.get_hash(),
+        validation_score,
+        average_time,
+        "query",
+        query_extractor.extract,
+    )
+    logging.info(
+        f"Registered the query form of {fn_name} as version {entry.version} "
+        f"(validation score {validation_score}, average time {average_time}s), "
+        f"which is not selected at runtime by default"
+    )
+
+
+def emit_queries(fn_names: list[str], parsers: list[str], output_file: str) -> None:
+    """
+    Write the query forms of the synthesized extractors that can be compiled into queries
+    """
+    queries = {}
+    for fn_name, parser in zip(fn_names, parsers):
+        spec = EXTRACTOR_SPECS[fn_name]()
+        query_extractor = TSQueryExtractor.from_python(parser, spec.fn_name)
+        if query_extractor is None:
+            logging.info(f"{fn_name} cannot be compiled into a query")
+            continue
+        queries[spec.fn_name] = query_extractor.to_dict()
     with open(output_file, "w") as f:
-        f.write(parser + "\n")
-    logging.info(f"Parser written to {output_file}")
+        json.dump(queries, f, indent=4)
+    logging.info(f"Queries written to {output_file}")
+
+
+def run(
+    fn_name: str,
+    model_name: str,
+    temperature: float = 0,
+    output_file: str = "",
+    log_file: str = "",
+    candidates: int = 1,
+    max_iterations: int = None,
+    max_tokens: int = None,
+    register: bool = False,
+    emit_query: bool = False,
+):
+    """
+    Synthesize an extractor, or all the extractors if fn_name is "all".
+    The extractors are synthesized concurrently and written to the output file in the order of EXTRACTOR_SPECS.
+    If some extractors fail to be synthesized, the others are still written and registered,
+    and the failures are reported afterwards.
+    If register is True, the extractors are also stored in the extractor registry.
+    If emit_query is True, the query forms of the extractors are written next to the output file,
+    and also stored in the extractor registry if register is True.
+    """
+    fn_names = list(EXTRACTOR_SPECS.keys()) if fn_name == "all" else [fn_name]
+    start_at = time.time()
+    with ThreadPoolExecutor(max_workers=len(fn_names)) as executor:
+        futures = {
+            name: executor.submit(
+                synthesize_extractor,
+                name,
+                model_name,
+                temperature,
+                log_file,
+                candidates,
+                max_iterations,
+                max_tokens,
+            )
+            for name in fn_names
+        }
+    logging.info(f"Total Time: {time.time() - start_at}")
+
+    # An extractor failing to be synthesized does not discard the other extractors
+    synthesized_names = []
+    parsers = []
+    failures = {}
+    for name, future in futures.items():
+        if future.exception() is not None:
+            failures[name] = future.exception()
+            logging.error(f"Failed to synthesize {name}: {future.exception()}")
+            continue
+        synthesized_names.append(name)
+        parsers.append(future.result())
+
+    if len(parsers) > 0:
+        with open(output_file, "w") as f:
+            for parser in parsers:
+                f.write(parser + "\n")
+        logging.info(f"Parser written to {output_file}")
+        if emit_query:
+            emit_queries(
+                synthesized_names,
+                parsers,
+                os.path.splitext(output_file)[0] + ".queries.json",
+            )
+        if register:
+            for name, parser in zip(synthesized_names, parsers):
+                register_extractor(name, parser, emit_query)
+    if len(failures) > 0:
+        raise RuntimeError(
+            "Failed to synthesize %s" % ", ".join(sorted(failures.keys()))
+        )
 
 
 if __name__ == "__main__":
@@ -190,8 +303,8 @@ if __name__ == "__main__":
         "--extractor",
         type=str,
         default="dbz_src",
-        choices=["dbz_src", "dbz_sink", "xss_src", "xss_sink", "ci_src", "ci_sink"],
-        help="The source/sink extractor to synthesize",
+        choices=list(EXTRACTOR_SPECS.keys()) + ["all"],
+        help="The source/sink extractor to synthesize, or all the extractors",
     )
     parser.add_argument(
         "--model",
@@ -209,10 +322,43 @@ if __name__ == "__main__":
         default="TS_synbot.py",
         help="The output python file (the extractor) being synthesized",
     )
+    parser.add_argument(
+        "--candidates",
+        type=int,
+        default=1,
+        help="The number of the candidates synthesized concurrently for each extractor",
+    )
+    parser.add_argument(
+        "--max-iterations",
+        type=int,
+        default=None,
+        help="The maximal number of the queries for each extractor",
+    )
+    parser.add_argument(
+        "--max-tokens",
+        type=int,
+        default=None,
+        help="The maximal number of the tokens for each extractor",
+    )
+    parser.add_argument(
+        "--register",
+        action="store_true",
+        help="Store the synthesized extractors in the extractor registry (src/TSAgent/extractors)",
+    )
+    parser.add_argument(
+        "--emit-query",
+        action="store_true",
+        help="Compile the synthesized extractors into tree-sitter queries where possible",
+    )
     args = parser.parse_args()
     run(
         args.extractor,
         args.model,
         temperature=args.temperature,
         output_file=args.output_file,
+        candidates=args.candidates,
+        max_iterations=args.max_iterations,
+        max_tokens=args.max_tokens,
+        register=args.register,
+        emit_query=args.emit_query,
     )
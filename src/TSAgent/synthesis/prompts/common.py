@@ -15,7 +15,7 @@ utilities = """
   The `child_node_type` must be one of the node types in the tree-sitter AST.
 
 In addition, here are some useful usage of AST nodes:
-- To get the line number of a node, use `source_code[: node.start_byte].count("\\n") + 1`.
+- To get the line number of a node, use `node.start_point[0] + 1`.
 - To get the text of a node, use `source_code[node.start_byte: node.end_byte]`.
 """
 
@@ -0,0 +1,118 @@
+import functools
+import os
+import sys
+from typing import Callable, Dict, Optional, Tuple
+
+sys.path.append(os.path.join(os.path.dirname(__file__), "../../"))
+from TSAgent.synthesis.utils import SynSpec, Example
+from TSAgent.synthesis.prompts.examples import (
+    dbz_source_examples,
+    dbz_sink_examples,
+    xss_source_examples,
+    xss_sink_examples,
+    ci_source_examples,
+    ci_sink_examples,
+)
+
+
+def dbz_source_spec() -> SynSpec:
+    rules = """
+    - If there is an integer literal node whose text is exactly `0`, that line may contain source values.
+    - If there is a floating point literal node whose text is exactly `0.0` or `0.0f`, then that line may contain source values.
+    - If any of the `parseInt`, `parseFloat`, `nextInt`, or `nextFloat` is a substring of a method invocation, the line contains source values.
+    """
+    spec = SynSpec(
+        fn_name="find_dbz_src",
+        df_type="source",
+        rules=rules,
+        examples=[Example.from_str(e) for e in dbz_source_examples],
+    )
+    return spec
+
+
+def dbz_sink_spec() -> SynSpec:
+    rules = """
+    - If there is an binary operation whose text contains `/` or `%`, then the second operand (whose node type should be identifier) of the binary operation is sink.
+    """
+    spec = SynSpec(
+        fn_name="find_dbz_sink",
+        df_type="sink",
+        rules=rules,
+        examples=[Example.from_str(e) for e in dbz_sink_examples],
+    )
+    return spec
+
+
+def xss_source_spec() -> SynSpec:
+    rules = """
+    - If any of the `readLine`, `executeQuery`, `getCookies`, `getParameter`, `nextToken`, or `getProperty` is a substring of a method invocation, the line contains source values.
+    """
+    spec = SynSpec(
+        fn_name="find_xss_src",
+        df_type="source",
+        rules=rules,
+        examples=[Example.from_str(e) for e in xss_source_examples],
+    )
+    return spec
+
+
+def xss_sink_spec() -> SynSpec:
+    rules = """
+    - If either `println` or `print` is a substring of method invocation, then all the arguments of the method invocation are sinks. Give all the arguments as they are and do not decompose each argument.
+    """
+    spec = SynSpec(
+        fn_name="find_xss_sink",
+        df_type="sink",
+        rules=rules,
+        examples=[Example.from_str(e) for e in xss_sink_examples],
+    )
+    return spec
+
+
+def ci_source_spec() -> SynSpec:
+    rules = """
+    - If any of the `readLine`, `getString`, `getenv`, `getValue`, `nextToken`, `executeQuery`, `getCookies`, `getParameter`, `nextToken`, `getProperty`, or `substring` is a substring of a method invocation, the line contains source values.
+    """
+    spec = SynSpec(
+        fn_name="find_ci_src",
+        df_type="source",
+        rules=rules,
+        examples=[Example.from_str(e) for e in ci_source_examples],
+    )
+    return spec
+
+
+def ci_sink_spec() -> SynSpec:
+    rules = """
+    - If `exec` is a substring of method invocation, then all the arguments of the method invocation are sinks. Give all the arguments as they are and do not decompose each argument.
+    """
+    spec = SynSpec(
+        fn_name="find_ci_sink",
+        df_type="sink",
+        rules=rules,
+        examples=[Example.from_str(e) for e in ci_sink_examples],
+    )
+    return spec
+
+
+# The synthesis specs of the extractors, keyed by the bug types and the roles
+SPECS: Dict[Tuple[str, str], Callable[[], SynSpec]] = {
+    ("dbz", "source"): dbz_source_spec,
+    ("dbz", "sink"): dbz_sink_spec,
+    ("xss", "source"): xss_source_spec,
+    ("xss", "sink"): xss_sink_spec,
+    ("ci", "source"): ci_source_spec,
+    ("ci", "sink"): ci_sink_spec,
+}
+
+
+@functools.lru_cache(maxsize=None)
+def get_spec_hash(bug_type: str, role: str) -> Optional[str]:
+    """
+    :param bug_type: the bug type, e.g., dbz
+    :param role: source or sink
+    :return the hash of the current synthesis spec, or None if there is no spec
+    """
+    if (bug_type, role) not in SPECS:
+        return None
+    return SPECS[(bug_type, role)]().get_hash()
@@ -1,11 +1,19 @@
-import importlib
+import itertools
 import logging
+import multiprocessing
+import random
 import re
+import threading
+import time
 import traceback
-from pathlib import Path
+import types
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable
 
-from TSAgent.synthesis.utils import SynSpec, Example, TSUtils
-from TSAgent.synthesis.llm import GPT
+from tree_sitter import Tree
+
+from TSAgent.synthesis.utils import SynSpec, Example
+from TSAgent.synthesis.llm import GPT, LLM
 from TSAgent.synthesis.prompts.common import (
     system_role,
     synthesize_task,
@@ -58,18 +66,198 @@ class Feedback:
             msg += "\n"
         return msg
 
+    def get_error_count(self) -> float:
+        """
+        The number of the missed and wrong values, or infinity if the parser cannot be evaluated
+        """
+        if self.message != "":
+            return float("inf")
+        return len(self.missed_examples) + len(self.wrong_examples)
+
+
+class SynthesisBudget:
+    """
+    SynthesisBudget class for the iterations and the tokens shared by the candidates of a synthesis.
+    The candidates stop once one of them passes all the examples or the budget is exhausted.
+    """
+
+    def __init__(self, max_iterations: int = None, max_tokens: int = None):
+        """
+        :param max_iterations: the maximal number of the queries, or None for no limit
+        :param max_tokens: the maximal number of the input and output tokens, or None for no limit
+        """
+        self.max_iterations = max_iterations
+        self.max_tokens = max_tokens
+        self.iterations = 0
+        self.tokens = 0
+        self.winner: str | None = None
+        self.best: str | None = None
+        self.best_error_count = float("inf")
+        self.lock = threading.Lock()
+
+    def acquire_iteration(self) -> bool:
+        """
+        Reserve an iteration for a candidate
+        :return False if a candidate has won or the budget is exhausted
+        """
+        with self.lock:
+            if self.winner is not None:
+                return False
+            if (
+                self.max_iterations is not None
+                and self.iterations >= self.max_iterations
+            ):
+                return False
+            if self.max_tokens is not None and self.tokens >= self.max_tokens:
+                return False
+            self.iterations += 1
+            return True
+
+    def add_tokens(self, tokens: int) -> None:
+        with self.lock:
+            self.tokens += tokens
+
+    def submit(self, parser: str, feedback: Feedback | None) -> bool:
+        """
+        Record an evaluated parser
+        :return True if the parser passes all the examples and is the first one to do so
+        """
+        with self.lock:
+            if feedback is None:
+                if self.winner is None:
+                    self.winner = parser
+                    return True
+                return False
+            if feedback.get_error_count() < self.best_error_count:
+                self.best = parser
+                self.best_error_count = feedback.get_error_count()
+            return False
+
+    def get_parser(self) -> str | None:
+        """
+        :return the winner, or the parser with the fewest errors if no candidate has won
+        """
+        with self.lock:
+            return self.winner if self.winner is not None else self.best
+
+
+# The suffixes making the names of the compiled modules unique
+module_counter = itertools.count()
+
+
+def compile_parser(spec: SynSpec, parser: str) -> types.ModuleType:
+    """
+    Compile a synthesized parser into a fresh module object in memory,
+    so that concurrent evaluations never share a module or a file
+    """
+    module = types.ModuleType(
+        f"TSAgent.synthesis.synthesized_{spec.fn_name}_{next(module_counter)}"
+    )
+    exec(
+        compile(parser + "\n", f"<synthesized {spec.fn_name}>", "exec"), module.__dict__
+    )
+    return module
+
+
+def evaluate_example(
+    parser_fn: Callable, example: Example, code: str, tree: Tree
+) -> tuple[list, list]:
+    """
+    :return the missed values and the wrong values of the parser on a single example
+    """
+    missed = []
+    wrong = []
+    local_values = parser_fn(code, tree.root_node)
+    vs = list(
+        map(
+            lambda v: (
+                v.line_number,
+                v.name,
+                "source" if v.v_type == ValueType.SRC else "sink",
+            ),
+            local_values,
+        )
+    )
+    for line, value, label in vs:
+        if (line, value, label) not in example.label:
+            wrong.append((example, line, value))
+    for line, value, label in example.label:
+        if (line, value, label) not in vs:
+            missed.append((example, line))
+    return missed, wrong
+
+
+def get_evaluation_context():
+    """
+    The evaluation processes are started by a fork server or spawned rather than forked,
+    as the synthesis process runs several threads, whose locks may be held at the time of forking.
+    The fork server imports this module once, so that each evaluation process starts quickly.
+    """
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload([__name__])
+        return context
+    return multiprocessing.get_context("spawn")
 
-def evaluate_parser(spec: SynSpec, parser: str) -> Feedback | None:
-    parent_dir = Path(__file__).resolve().parent.absolute()
-    with open(parent_dir / "synthesized_parser.py", "w") as f:
-        f.write(parser + "\n")
 
+def evaluate_examples(
+    fn_name: str, parser: str, examples: list[tuple[list[str], list]], connection
+) -> None:
+    """
+    Evaluate a synthesized parser on the examples one by one in the evaluation process.
+    The parser is compiled and the examples are parsed again in the evaluation process,
+    and a ready message is sent before the evaluation starts.
+    The result of each example is sent as soon as it is computed,
+    i.e., the lines of the missed values and the lines and names of the wrong values, or an error message.
+    """
+    spec = SynSpec(
+        fn_name, "source", "", [Example(code, label) for code, label in examples]
+    )
     try:
-        synthesized_parser_module = importlib.import_module(
-            "TSAgent.synthesis.synthesized_parser"
+        parser_fn = getattr(compile_parser(spec, parser), fn_name)
+        example_trees = spec.get_example_trees()
+    except Exception as e:
+        connection.send(
+            f"Failed to import the synthesized parser. {e}\n{traceback.format_exc()}"
         )
-        synthesized_parser_module = importlib.reload(synthesized_parser_module)
-        parser_fn = getattr(synthesized_parser_module, spec.fn_name)
+        connection.close()
+        return
+    connection.send(None)
+    for index, (code, tree) in enumerate(example_trees):
+        example = spec.examples[index]
+        try:
+            missed, wrong = evaluate_example(parser_fn, example, code, tree)
+            connection.send(
+                (
+                    [line for _, line in missed],
+                    [(line, value) for _, line, value in wrong],
+                )
+            )
+        except Exception as e:
+            connection.send(
+                f"Failed to parse the code example {example.code}. {e}\n{traceback.format_exc()}"
+            )
+            break
+    connection.close()
+
+
+def evaluate_parser(
+    spec: SynSpec, parser: str, timeout: float = 10, startup_timeout: float = 60
+) -> Feedback | None:
+    """
+    Evaluate a synthesized parser on all the examples.
+    The examples are evaluated in a separate process, which is killed once it runs out of the timeout,
+    so that a parser that never terminates does not keep running in the synthesis process.
+    The examples are evaluated one after another in a single process rather than in parallel,
+    as starting a process costs more than evaluating a parser on a small example.
+    :param spec: the specification with the examples
+    :param parser: the source code of the synthesized parser
+    :param timeout: the maximal seconds of evaluating all the examples
+    :param startup_timeout: the maximal seconds of starting the evaluation process, which is not counted in the timeout
+    :return None if the parser passes all the examples, otherwise the feedback
+    """
+    try:
+        compile_parser(spec, parser)
     except Exception as e:
         feedback = Feedback(
             spec,
@@ -78,76 +266,203 @@ def evaluate_parser(spec: SynSpec, parser: str) -> Feedback | None:
         return feedback
 
     # evaluate the synthesized parser
-    utils = TSUtils()
+    context = get_evaluation_context()
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(
+        target=evaluate_examples,
+        args=(
+            spec.fn_name,
+            parser,
+            [(example.code, example.label) for example in spec.examples],
+            sender,
+        ),
+        daemon=True,
+    )
+    process.start()
+    sender.close()
+
     missed = []
     wrong = []
-    for example in spec.examples:
-        code = "\n".join(example.code)
-        tree = utils.parse_code(code)
-        try:
-            local_values = parser_fn(code, tree.root_node)
-            vs = list(
-                map(
-                    lambda v: (
-                        v.line_number,
-                        v.name,
-                        "source" if v.v_type == ValueType.SRC else "sink",
-                    ),
-                    local_values,
+    feedback = None
+    try:
+        result = None
+        if receiver.poll(startup_timeout):
+            try:
+                result = receiver.recv()
+            except EOFError:
+                result = "The evaluation process of the synthesized parser crashes.\n"
+        else:
+            result = f"The evaluation process does not start within {startup_timeout} seconds.\n"
+        if isinstance(result, str):
+            feedback = Feedback(spec, message=result)
+        deadline = time.monotonic() + timeout
+        for index, example in enumerate(spec.examples):
+            if feedback is not None:
+                break
+            if not receiver.poll(max(0.0, deadline - time.monotonic())):
+                feedback = Feedback(
+                    spec,
+                    message=f"The synthesized parser does not terminate within {timeout} seconds "
+                    f"on the code example {example.code}.\n",
                 )
-            )
-            for line, value, label in vs:
-                if (line, value, label) not in example.label:
-                    wrong.append((example, line, value))
-            for line, value, label in example.label:
-                if (line, value, label) not in vs:
-                    missed.append((example, line))
-        except Exception as e:
-            feedback = Feedback(
-                spec,
-                message=f"Failed to parse the code example {example.code}. {e}\n{traceback.format_exc()}",
-            )
-            return feedback
+                break
+            try:
+                result = receiver.recv()
+            except EOFError:
+                feedback = Feedback(
+                    spec,
+                    message=f"The synthesized parser crashes on the code example {example.code}.\n",
+                )
+                break
+            if isinstance(result, str):
+                feedback = Feedback(spec, message=result)
+                break
+            missed.extend((example, line) for line in result[0])
+            wrong.extend((example, line, value) for line, value in result[1])
+    finally:
+        if process.is_alive():
+            process.kill()
+        process.join()
+        receiver.close()
+
+    if feedback is not None:
+        return feedback
     if len(missed) == 0 and len(wrong) == 0:
         return None
     feedback = Feedback(spec, missed_examples=missed, wrong_examples=wrong)
     return feedback
 
 
-def synthesize(model: GPT, spec: SynSpec) -> tuple[str, int]:
+def measure_parser(spec: SynSpec, parser: str, repeats: int = 5) -> tuple[float, float]:
+    """
+    Measure a synthesized parser for the extractor registry
+    :param spec: the specification with the examples
+    :param parser: the source code of the synthesized parser
+    :param repeats: the number of the runs on each example
+    :return the ratio of the passed examples and the average seconds of running the parser on an example
+    """
+    return measure_extractor(
+        spec, getattr(compile_parser(spec, parser), spec.fn_name), repeats
+    )
+
+
+def measure_extractor(
+    spec: SynSpec, extractor: Callable, repeats: int = 5
+) -> tuple[float, float]:
+    """
+    Measure an extractor in the python form or the query form on the examples
+    :param spec: the specification with the examples
+    :param extractor: the function mapping the source code and the root node to the extracted values
+    :param repeats: the number of the runs on each example
+    :return the ratio of the passed examples and the average seconds of running the extractor on an example
+    """
+    example_trees = spec.get_example_trees()
+    passed = 0
+    total_time = 0.0
+    for example, (code, tree) in zip(spec.examples, example_trees):
+        try:
+            missed, wrong = evaluate_example(extractor, example, code, tree)
+        except Exception:
+            continue
+        if len(missed) == 0 and len(wrong) == 0:
+            passed += 1
+        start_time = time.perf_counter()
+        for _ in range(repeats):
+            extractor(code, tree.root_node)
+        total_time += time.perf_counter() - start_time
+    example_num = len(spec.examples)
+    if example_num == 0:
+        return 1.0, 0.0
+    return passed / example_num, total_time / (example_num * repeats)
+
+
+def synthesize(
+    model: LLM, spec: SynSpec, budget: SynthesisBudget = None, seed: int = None
+) -> tuple[str, int]:
     """
     Synthesize source or sink extractor from the given specification.
+    :param model: the model queried by this candidate only
+    :param spec: the specification of the extractor
+    :param budget: the budget shared with other candidates, or None for an unbounded synthesis
+    :param seed: the seed shuffling the examples in the feedback, or None to keep their order
+    :return the last synthesized parser and the number of the iterations of this candidate
     """
+    if budget is None:
+        budget = SynthesisBudget()
+    rng = random.Random(seed) if seed is not None else None
     logging.info("Synthesizing the parser...")
     model.set_system_role(system_role)
-    syn_task = synthesize_task(spec)
-    prompt = f"""
+    synthesized = None
+    feedback = None
+    iterations = 0
+    while budget.acquire_iteration():
+        if feedback is None:
+            syn_task = synthesize_task(spec)
+            prompt = f"""
     {syn_task}
     {utilities}
     {ast_usage}
     """
-    resp = model.query(prompt)
-    matches = re.search(r"```(python)?\n(.*)\n```", resp, re.DOTALL | re.MULTILINE)
-    synthesized = matches.group(2)
-    feedback = evaluate_parser(spec, synthesized)
-    iterations = 1
-    while feedback is not None:
-        logging.info("Synthesized an incorrect parser. Refining the parser...")
-        ref_task = refine_task(
-            spec, feedback, script=synthesized if iterations % 5 != 0 else None
-        )
-        prompt = f"""
+        else:
+            logging.info("Synthesized an incorrect parser. Refining the parser...")
+            ref_task = refine_task(
+                spec, feedback, script=synthesized if iterations % 5 != 0 else None
+            )
+            prompt = f"""
         {ref_task}
         {utilities}
         {ast_usage}
         """
+        token_cost = model.input_token_cost + model.output_token_cost
         resp = model.query(prompt)
+        budget.add_tokens(model.input_token_cost + model.output_token_cost - token_cost)
+        iterations += 1
         matches = re.search(r"```(python)?\n(.*)\n```", resp, re.DOTALL | re.MULTILINE)
         if matches is None:
-            iterations += 1
             continue
         synthesized = matches.group(2)
         feedback = evaluate_parser(spec, synthesized)
-        iterations += 1
+        if budget.submit(synthesized, feedback) or feedback is None:
+            break
+        if rng is not None:
+            rng.shuffle(feedback.missed_examples)
+            rng.shuffle(feedback.wrong_examples)
 
     return synthesized, iterations
+
+
+def synthesize_parallel(
+    model_factory: Callable[[float], LLM],
+    spec: SynSpec,
+    temperatures: list[float],
+    budget: SynthesisBudget,
+) -> tuple[str | None, int]:
+    """
+    Synthesize source or sink extractor with several candidates concurrently.
+    Each candidate queries its own model with its own temperature and shuffles the feedback with its own seed.
+    The first candidate passing all the examples wins, and the others stop before their next iteration,
+    where the costs of the queries in flight of the other candidates are still incurred.
+    :param model_factory: the function creating a model with the given temperature
+    :param spec: the specification of the extractor
+    :param temperatures: the temperatures of the candidates
+    :param budget: the budget shared by all the candidates
+    :return the winner, or the parser with the fewest errors if the budget is exhausted, and the total iterations
+    """
+    executor = ThreadPoolExecutor(max_workers=len(temperatures))
+    pending = set(
+        executor.submit(synthesize, model_factory(temperature), spec, budget, seed)
+        for seed, temperature in enumerate(temperatures)
+    )
+    while len(pending) > 0 and budget.winner is None:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is not None:
+                logging.warning(
+                    f"A candidate of {spec.fn_name} failed: {future.exception()}"
+                )
+    # The candidates not started yet are cancelled, and the others stop before their next iteration.
+    # However, a query already in flight cannot be cancelled, so it is still paid for after a winner exists,
+    # and its result is discarded.
+    executor.shutdown(wait=False, cancel_futures=True)
+
+    return budget.get_parser(), budget.iterations
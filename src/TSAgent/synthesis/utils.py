@@ -1,3 +1,5 @@
+import hashlib
+import threading
 from pathlib import Path
 from typing import List
 
@@ -7,6 +9,8 @@ from typing import Literal, Optional
 import re
 
 from utility.function import LocalValue, ValueType
+from TSAgent.TS_index import find_nodes_by_type
+from TSAgent.TS_parser import TSLanguage
 
 DFType = Literal["source", "sink"]
 DFValue = tuple[int, str, DFType]  # line number, variable name, 'source' or 'sink'
@@ -102,6 +106,38 @@ class SynSpec:
         self.rules = rules
         self.examples = examples
 
+        # The examples are parsed once on demand and shared by all the evaluations
+        self.example_trees: list[tuple[str, Tree]] | None = None
+        self.lock = threading.Lock()
+
+    def get_example_trees(self) -> list[tuple[str, Tree]]:
+        """
+        :return the source code and the parse tree of each example
+        """
+        with self.lock:
+            if self.example_trees is None:
+                utils = TSUtils()
+                example_trees = []
+                for example in self.examples:
+                    code = "\n".join(example.code)
+                    example_trees.append((code, utils.parse_code(code)))
+                self.example_trees = example_trees
+            return self.example_trees
+
+    def get_hash(self) -> str:
+        """
+        :return the hash of the function name, the rules, and the examples,
+        which identifies the spec of a registered extractor
+        """
+        content = "\n".join(
+            [self.fn_name, self.df_type, self.rules]
+            + [
+                "\n".join(example.code) + str(example.label)
+                for example in self.examples
+            ]
+        )
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
     @staticmethod
     def get_pretty_ast(example: Example) -> str:
         code = "\n".join(example.code)
@@ -141,10 +177,14 @@ class TSUtils:
                 Path(__file__).resolve().parent.absolute()
                 / "../../../lib/build/my-languages.so"
             )
-        self.language = Language(str(library), language)
+        # The language and the parsers are shared across TSUtils instances
+        self.language_name = language
+        self.language = TSLanguage.get_language(str(library), language)
         self.library = library
-        self.parser: Parser = Parser()
-        self.parser.set_language(self.language)
+
+    @property
+    def parser(self) -> Parser:
+        return TSLanguage.get_parser(str(self.library), self.language_name)
 
     def parse_code(self, code: str) -> Tree:
         return self.parser.parse(bytes(code, "utf8"))
@@ -172,9 +212,9 @@ class TSUtils:
     @staticmethod
     def get_line_number(source_code: str, node: Node) -> int:
         """
-        Get the line number of the given byte offset.
+        Get the line number of the given node from its start point.
         """
-        return source_code[: node.start_byte].count("\n") + 1
+        return node.start_point[0] + 1
 
     @staticmethod
     def get_argument_list(node: Node) -> list[Node]:
@@ -200,13 +240,7 @@ class TSUtils:
         """
         Find a node with the given type.
         """
-        ret = []
-        if node.type == node_type:
-            ret += [node]
-        for child in node.children:
-            ret.extend(TSUtils.find_nodes_by_type(child, node_type))
-            
-        return ret
+        return find_nodes_by_type(node, node_type)
 
 
 def source_extractor(fn):
@@ -215,7 +249,7 @@ def source_extractor(fn):
             def inner(node: Node) -> list[str]:
                 _r = []
                 if (
-                    source_code[: node.start_byte].count("\n") + 1 == line_number
+                    node.start_point[0] + 1 == line_number
                     and len(node.children) > 1
                     and node.children[1].type == "="
                 ):
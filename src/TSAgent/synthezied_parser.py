@@ -24,7 +24,7 @@ def find_xss_src(source_code: str, root_node: tree_sitter.Node) -> List[LocalVal
 
     def traverse(node: Node, results: List[LocalValue]):
         if is_interesting(node):
-            line_number = source_code[: node.start_byte].count("\n") + 1
+            line_number = TSAnalyzer.get_line_number(node)
             name = source_code[node.start_byte : node.end_byte]
             results.append(LocalValue(name, line_number, ValueType.SRC))
             return
@@ -1,13 +1,20 @@
 import copy
 import os
+import time
 import shutil
 import json
+from contextlib import contextmanager
 from pathlib import Path
 from datetime import datetime
 from TSAgent.TS_analyzer import TSAnalyzer
+from TSAgent.TS_parser import TSParseCache
 from TSAgent.TS_transformer import TSFunctionTransformer
+from TSAgent.TS_visitor import TSExtractionVisitor
 from utility.function import *
 from utility.environment import Environment
+from utility.metrics import Metrics
+from utility.event_log import EventLog
+from utility.extraction_cache import ExtractionCache
 from TSAgent.TS_transformer import TSFunctionTransformer
 from LMAgent.spec.src_extractor import SrcExtractor
 from LMAgent.spec.sink_extractor import SinkExtractor
@@ -37,23 +44,43 @@ class DFA:
         solving_refine_number: int,
         openai_key: str,
         temp: float,
+        is_prefix_caching: bool = False,
+        is_project_mode: bool = False,
+        event_log: EventLog = None,
+        is_extraction_cache: bool = False,
+        is_streaming: bool = False,
     ) -> None:
         """
         Initialize DFA with a java file path.
-        Currently we only analyze a single java file
+        In the project mode, java_file_path is the path of a project,
+        and the entry points in all the java files under it are analyzed together.
+        The progress events are recorded in event_log, and discarded if it is None.
+        If is_extraction_cache is True, the values extracted by the LLMs are persisted across runs.
+        If is_streaming is True, the Yes/No answers of the propagator and the validator are streamed
         """
         self.java_file_path: str = java_file_path
         self.bug_type = bug_type
-        self.proj_path = self.java_file_path[
-            self.java_file_path.rfind("/") + 1 : self.java_file_path.rfind(".java")
-        ]
+        self.is_project_mode = is_project_mode
+        if self.is_project_mode:
+            self.proj_path = os.path.basename(os.path.normpath(self.java_file_path))
+        else:
+            self.proj_path = self.java_file_path[
+                self.java_file_path.rfind("/") + 1 : self.java_file_path.rfind(".java")
+            ]
         self.temp = temp
 
-        self.ts_analyzer = TSAnalyzer(java_file_path, support_files)
+        # Stage timing and counters of the analysis
+        self.metrics = Metrics()
+        self.event_log = event_log if event_log is not None else EventLog()
+        self.parse_cache_hit_count = TSParseCache.hit_count
+        self.parse_cache_miss_count = TSParseCache.miss_count
+
+        self.ts_analyzer = TSAnalyzer(java_file_path, support_files, is_project_mode)
         self.main_ids = self.ts_analyzer.main_ids
         self.online_model_name = online_model_name
 
         self.is_syn_parser = is_syn_parser
+        self.is_extraction_cache = is_extraction_cache
         self.is_fscot = is_fscot
         self.is_syn_solver = is_syn_solver
         self.solving_refine_number = solving_refine_number
@@ -69,10 +96,24 @@ class DFA:
 
         # LM agent list
         self.src_extractor = SrcExtractor(
-            self.src_spec_file_path, self.online_model_name, openai_key, self.temp
+            self.src_spec_file_path,
+            self.online_model_name,
+            openai_key,
+            self.temp,
+            is_prefix_caching,
         )
         self.sink_extractor = SinkExtractor(
-            self.sink_spec_file_path, self.online_model_name, openai_key, self.temp
+            self.sink_spec_file_path,
+            self.online_model_name,
+            openai_key,
+            self.temp,
+            is_prefix_caching,
+        )
+
+        # Evaluate the source and sink rules together upon one node index when the parsers are used.
+        # The synthesized extractors remain tree rules, and only the extractors with a node rule are not called
+        self.extraction_visitor = TSExtractionVisitor(
+            [self.src_extractor.src_rule], [self.sink_extractor.sink_rule]
         )
 
         self.ifp_propagator = IntraFlowPropagator(
@@ -80,17 +121,33 @@ class DFA:
             self.online_model_name,
             openai_key,
             self.temp,
+            is_prefix_caching,
+            is_streaming,
         )
 
         self.validator = InterFlowValidator(
-            self.flow_validator_file_path, self.online_model_name, openai_key, self.temp
+            self.flow_validator_file_path,
+            self.online_model_name,
+            openai_key,
+            self.temp,
+            is_prefix_caching,
+            is_streaming,
         )
 
+        for agent in [
+            self.src_extractor,
+            self.sink_extractor,
+            self.ifp_propagator,
+            self.validator,
+        ]:
+            agent.event_log = self.event_log
+
         self.log_dir_path = base_log_dir_path + "/" + self.proj_path.split("/")[-1]
 
         if not os.path.exists(self.log_dir_path):
             os.makedirs(self.log_dir_path)
-        shutil.copy(java_file_path, self.log_dir_path)
+        if not self.is_project_mode:
+            shutil.copy(java_file_path, self.log_dir_path)
 
         # Environment
         self.environment = Environment()
@@ -102,6 +159,36 @@ class DFA:
         self.bug_reports: Dict[int, List[List[Tuple[int, LocalValue]]]] = {}
         return
 
+    @contextmanager
+    def stage(self, stage: str, function_id: int):
+        """
+        Measure an analysis stage of a function,
+        and record its duration and token cost in both the metrics and the event log
+        :param stage: the name of the stage
+        :param function_id: the id of the function being analyzed
+        """
+        input_token_cost, output_token_cost = self.compute_total_token_cost()
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - start_time
+            self.metrics.add_time(stage, duration)
+            if self.event_log.is_enabled(EventLog.STAGE):
+                new_input_token_cost, new_output_token_cost = (
+                    self.compute_total_token_cost()
+                )
+                self.event_log.emit(
+                    "stage",
+                    EventLog.STAGE,
+                    file=self.proj_path,
+                    function_id=function_id,
+                    stage=stage,
+                    duration=duration,
+                    input_token_cost=new_input_token_cost - input_token_cost,
+                    output_token_cost=new_output_token_cost - output_token_cost,
+                )
+
     def extract_call_meta_data_in_single_function(
         self, current_function: Function
     ) -> Function:
@@ -113,8 +200,8 @@ class DFA:
         4. If statements
         5. Switch statements
         """
-        tree: tree_sitter.Tree = self.ts_analyzer.ts_parser.parser.parse(
-            bytes(current_function.SSI_function_without_comments, "utf8")
+        tree: tree_sitter.Tree = self.ts_analyzer.ts_parser.parse(
+            current_function.SSI_function_without_comments
         )
         current_function.set_parse_tree(tree)
         root_node: tree_sitter.Node = tree.root_node
@@ -130,12 +217,7 @@ class DFA:
                 call_site_node,
             )
             if len(callee_ids) > 0:
-                line_number = (
-                    current_function.SSI_function_without_comments[
-                        : call_site_node.start_byte
-                    ].count("\n")
-                    + 1
-                )
+                line_number = self.ts_analyzer.get_line_number(call_site_node)
 
                 # Update the environment
                 for callee_id in callee_ids:
@@ -195,26 +277,61 @@ class DFA:
         current_function.switch_statements = switch_statements
         return current_function
 
+    def extract_src_sink_values(
+        self, current_function: Function
+    ) -> Tuple[Tuple[LocalValue, ...], Tuple[LocalValue, ...]]:
+        """
+        Extract the source and sink values of a function with the parsers or the LLMs
+        """
+        if self.is_syn_parser:
+            # Use parsers to localize source and sink values in a single traversal
+            return self.extraction_visitor.apply(
+                current_function.SSI_function_without_comments,
+                current_function.parse_tree.root_node,
+            )
+
+        key = None
+        if self.is_extraction_cache:
+            key = ExtractionCache.compute_key(
+                current_function.lined_SSI_function_without_comments,
+                self.src_spec_file_path,
+                self.sink_spec_file_path,
+                self.online_model_name,
+                self.temp,
+            )
+            values = ExtractionCache.get(key)
+            if values is not None:
+                self.metrics.increment("extraction_cache_hits")
+                return values
+        values = (
+            self.src_extractor.apply(current_function, False),
+            self.sink_extractor.apply(current_function, False),
+        )
+        if key is not None:
+            ExtractionCache.put(key, values)
+        return values
+
     def construct_summary_start_end_points(
         self, current_function: Function, start_para_indexes: set[int]
     ) -> Tuple[List[LocalValue], List[LocalValue]]:
         """
         Extract the start and end points for intra-procedural summary generation
         """
-        # Extract the source and sink values
-        self.src_extractor.apply(
-            current_function, self.is_syn_parser
-        )  # True: use parser to localize source values
-
-        self.sink_extractor.apply(
-            current_function, self.is_syn_parser
-        )  # True: use parser to localize sink values
+        # Extract the source and sink values once per function
+        if current_function.extracted_srcs is None:
+            with self.stage("extraction", current_function.function_id):
+                (
+                    current_function.extracted_srcs,
+                    current_function.extracted_sinks,
+                ) = self.extract_src_sink_values(current_function)
+        else:
+            self.metrics.increment("extraction_memo_hits")
 
         # summary srcs: source values, output values of call sites, arg values of current function
-        summary_srcs: List[LocalValue] = self.src_extractor.srcs
+        summary_srcs: List[LocalValue] = list(current_function.extracted_srcs)
 
         # summary sinks: sink values, input values of call sites, return values of current function
-        summary_sinks: List[LocalValue] = self.sink_extractor.sinks
+        summary_sinks: List[LocalValue] = list(current_function.extracted_sinks)
 
         # # set interesting parameters and return values as the sources and sinks, respectively
         for para in current_function.paras:
@@ -259,28 +376,22 @@ class DFA:
             )
         )
 
-        # deduplicate srcs/sinks
-        unique_summary_srcs = []
-        unique_summary_sinks = []
-        for i in range(len(summary_srcs)):
-            is_appear = False
-            for j in range(i):
-                if str(summary_srcs[i]) == str(summary_srcs[j]):
-                    is_appear = True
-                    break
-            if not is_appear:
-                unique_summary_srcs.append(summary_srcs[i])
-
-        for i in range(len(summary_sinks)):
-            is_appear = False
-            for j in range(i):
-                if str(summary_sinks[i]) == str(summary_sinks[j]):
-                    is_appear = True
-                    break
-            if not is_appear:
-                unique_summary_sinks.append(summary_sinks[i])
+        # deduplicate srcs/sinks into new lists, keeping the first occurrences
+        unique_summary_srcs = DFA.deduplicate_values(summary_srcs)
+        unique_summary_sinks = DFA.deduplicate_values(summary_sinks)
         return unique_summary_srcs, unique_summary_sinks
 
+    @staticmethod
+    def deduplicate_values(values: List[LocalValue]) -> List[LocalValue]:
+        unique_values = []
+        appeared = set([])
+        for value in values:
+            key = str(value)
+            if key not in appeared:
+                appeared.add(key)
+                unique_values.append(value)
+        return unique_values
+
     @staticmethod
     def check_context_realizability(
         context_ids: List[int], context_id: int
@@ -330,6 +441,9 @@ class DFA:
             if end.v_type == ValueType.ARG:
                 (_, _, _, callee_ids) = function.line_to_call_site_info[end.line_number]
                 for callee_id in callee_ids:
+                    # Only the first callee of an ambiguous call site is analyzed
+                    if not self.environment.is_analyzed(callee_id):
+                        continue
                     (
                         is_realizable,
                         augmented_context_ids,
@@ -508,13 +622,13 @@ class DFA:
         if self.environment.is_analyzed(function_id):
             current_function = self.environment.analyzed_functions[function_id]
         else:
-            print("Preprocessing...")
             (name, original_function) = self.ts_analyzer.ts_parser.methods[function_id]
             current_function = Function(function_id, name, original_function)
 
-            self.function_transformer.transform(
-                function_id, current_function.original_function
-            )
+            with self.stage("ssi_transformation", function_id):
+                self.function_transformer.transform(
+                    function_id, current_function.original_function
+                )
             current_function.SSI_function = self.function_transformer.SSI
 
             current_function.SSI_function_without_comments = (
@@ -524,31 +638,30 @@ class DFA:
                 self.function_transformer.lined_SSI_function_without_comments
             )
 
-            current_function.parse_tree = self.ts_analyzer.ts_parser.parser.parse(
-                bytes(self.function_transformer.SSI_without_comments, "utf8")
-            )
-            current_function = self.extract_call_meta_data_in_single_function(
-                current_function
-            )
-            print("processing finished")
-
-        print("start to summarize...")
+            with self.stage("parsing", function_id):
+                current_function.parse_tree = self.ts_analyzer.ts_parser.parse(
+                    self.function_transformer.SSI_without_comments
+                )
+            with self.stage("call_meta_data_extraction", function_id):
+                current_function = self.extract_call_meta_data_in_single_function(
+                    current_function
+                )
+            self.metrics.increment("analyzed_functions")
 
         (summary_srcs, summary_sinks) = self.construct_summary_start_end_points(
             current_function, start_para_indexes
         )
 
-        print("Generating intra-procedural summaries...")
-        reachable_summaries, unreachable_summaries = self.ifp_propagator.apply(
-            current_function, summary_srcs, summary_sinks, self.is_fscot
-        )
+        with self.stage("propagation", function_id):
+            reachable_summaries, unreachable_summaries = self.ifp_propagator.apply(
+                current_function, summary_srcs, summary_sinks, self.is_fscot
+            )
         current_function.extend_function_summaries(
             reachable_summaries, unreachable_summaries
         )
         self.environment.set_analyzed_function(function_id, current_function)
 
         # Process callees
-        print("Processing callees...")
         for call_site_node, line_number in current_function.call_site_nodes:
             (_, args, rets, callee_ids) = current_function.line_to_call_site_info[
                 line_number
@@ -564,7 +677,9 @@ class DFA:
             self.analyze_function(callee_id, para_indexes)
 
         # CFL reachability solving
-        bug_traces = self.search_from_srcs_in_single_function(function_id)
+        with self.stage("cfl_search", function_id):
+            bug_traces = self.search_from_srcs_in_single_function(function_id)
+        self.metrics.increment("bug_candidates", len(bug_traces))
         self.bug_candidates[function_id] = bug_traces
         return
 
@@ -572,7 +687,12 @@ class DFA:
         """
         Process each main function
         """
-        print("Analyzing......")
+        self.event_log.emit(
+            "analysis_start",
+            EventLog.STAGE,
+            file=self.proj_path,
+            main_function_num=len(self.main_ids),
+        )
         for main_id in self.main_ids:
             self.analyze_function(main_id, set([]))
         return
@@ -584,21 +704,31 @@ class DFA:
         return
 
     def validate(self) -> None:
-        print("Validating......")
         existing_reports = set([])
 
         for src_function_id in self.bug_candidates:
             for trace in self.bug_candidates[src_function_id]:
-                if self.validator.apply(
-                    self.environment,
-                    self.ts_analyzer,
-                    trace,
-                    self.bug_type,
-                    self.solving_refine_number,
-                    self.is_syn_solver,
-                ):
-                    (function_id_start, value_start) = trace[0]
-                    (function_id_end, value_end) = trace[-1]
+                with self.stage("validation", src_function_id):
+                    is_feasible = self.validator.apply(
+                        self.environment,
+                        self.ts_analyzer,
+                        trace,
+                        self.bug_type,
+                        self.solving_refine_number,
+                        self.is_syn_solver,
+                    )
+                (function_id_start, value_start) = trace[0]
+                (function_id_end, value_end) = trace[-1]
+                self.event_log.emit(
+                    "verdict",
+                    EventLog.STAGE,
+                    file=self.proj_path,
+                    function_id=src_function_id,
+                    src=[function_id_start, str(value_start)],
+                    sink=[function_id_end, str(value_end)],
+                    verdict=is_feasible,
+                )
+                if is_feasible:
                     if (
                         function_id_start,
                         value_start.line_number,
@@ -620,7 +750,6 @@ class DFA:
         return
 
     def report(self) -> None:
-        print("Reporting......")
         bug_report = {}
 
         all_bugs = []
@@ -630,6 +759,7 @@ class DFA:
 
         bug_report["input_token_cost"] = input_token_cost
         bug_report["output_token_cost"] = output_token_cost
+        bug_report["llm_statistics"] = self.compute_llm_statistics()
 
         for src_function_id in self.bug_reports:
             for trace in self.bug_reports[src_function_id]:
@@ -685,7 +815,14 @@ class DFA:
         with open(self.log_dir_path + "/report.json", "w") as file:
             json.dump(bug_report, file, indent=4)
 
-        print("Report generated!\n")
+        self.compute_metrics().dump(self.log_dir_path + "/metrics.json")
+
+        self.event_log.emit(
+            "report",
+            EventLog.STAGE,
+            file=self.proj_path,
+            final_report_number=len(all_bugs),
+        )
         return
 
     def compute_total_token_cost(self):
@@ -704,3 +841,79 @@ class DFA:
         input_cost += self.validator.total_input_token_cost
         output_cost += self.validator.total_output_token_cost
         return input_cost, output_cost
+
+    def compute_llm_statistics(self) -> Dict[str, float]:
+        """
+        Summarize the latency and the provider-side prompt caching of all the LLM queries,
+        and the numbers of the extraction queries skipped by the keyword gate
+        and of the queries coalesced with the identical queries in flight,
+        and the streaming statistics
+        """
+        query_count = 0
+        skipped_query_count = 0
+        coalesced_query_count = 0
+        streamed_query_count = 0
+        stopped_query_count = 0
+        total_first_token_latency = 0.0
+        total_latency = 0.0
+        cached_input_token_cost = 0
+        for agent in [
+            self.src_extractor,
+            self.sink_extractor,
+            self.ifp_propagator,
+            self.validator,
+        ]:
+            query_count += agent.model.query_count
+            skipped_query_count += agent.metrics.counters.get("skipped_llm_calls", 0)
+            coalesced_query_count += agent.model.coalesced_query_count
+            streamed_query_count += agent.model.streamed_query_count
+            stopped_query_count += agent.model.stopped_query_count
+            total_first_token_latency += agent.model.total_first_token_latency
+            total_latency += agent.model.total_latency
+            cached_input_token_cost += agent.model.cached_input_token_cost
+
+        input_token_cost, _ = self.compute_total_token_cost()
+        return {
+            "query_count": query_count,
+            "skipped_query_count": skipped_query_count,
+            "coalesced_query_count": coalesced_query_count,
+            "total_latency": total_latency,
+            "average_latency": total_latency / query_count if query_count > 0 else 0,
+            "streamed_query_count": streamed_query_count,
+            "stopped_query_count": stopped_query_count,
+            "average_first_token_latency": (
+                total_first_token_latency / streamed_query_count
+                if streamed_query_count > 0
+                else 0
+            ),
+            "cached_input_token_cost": cached_input_token_cost,
+            "cached_input_token_ratio": (
+                cached_input_token_cost / input_token_cost
+                if input_token_cost > 0
+                else 0
+            ),
+        }
+
+    def compute_metrics(self) -> Metrics:
+        """
+        Merge the stage timing and the counters of the engine, the analyzer, and all the agents
+        """
+        metrics = Metrics()
+        metrics.merge(self.metrics)
+        metrics.merge(self.ts_analyzer.metrics)
+        for agent in [
+            self.src_extractor,
+            self.sink_extractor,
+            self.ifp_propagator,
+            self.validator,
+        ]:
+            metrics.merge(agent.metrics)
+
+        # The parse cache is shared by the process, so only the queries since the construction are counted
+        metrics.increment(
+            "parse_cache_hits", TSParseCache.hit_count - self.parse_cache_hit_count
+        )
+        metrics.increment(
+            "parse_cache_misses", TSParseCache.miss_count - self.parse_cache_miss_count
+        )
+        return metrics
@@ -4,15 +4,11 @@ import tree_sitter
 
 sys.path.append(path.dirname(path.dirname(path.dirname(path.abspath(__file__)))))
 from utility.function import *
+from TSAgent.TS_index import find_nodes_by_type
 
 
 def find_nodes(root_node: tree_sitter.Node, node_type: str) -> List[tree_sitter.Node]:
-    nodes = []
-    if root_node.type == node_type:
-        nodes.append(root_node)
-    for child_node in root_node.children:
-        nodes.extend(find_nodes(child_node, node_type))
-    return nodes
+    return find_nodes_by_type(root_node, node_type)
 
 
 # The skeleton of source extractor
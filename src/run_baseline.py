@@ -8,22 +8,12 @@ import re
 from typing import List
 from pathlib import Path
 from datetime import datetime
-import openai
 import tree_sitter
 
+from TSAgent.TS_parser import TSLanguage
 from utility.online_model import OnlineModel
 from utility.llm import LLM
 
-# Set up paths and language parser
-cwd = Path(__file__).resolve().parent.absolute()
-TSPATH = cwd.parent / "lib/build/"
-language_path = TSPATH / "my-languages.so"
-
-JAVA_LANGUAGE = tree_sitter.Language(str(language_path), "java")
-
-parser = tree_sitter.Parser()
-parser.set_language(JAVA_LANGUAGE)
-
 
 def transform_function_split_cluster_files(file_cluster: List[str]) -> None:
     """
@@ -326,7 +316,7 @@ class BaselineRun:
 
             with open(java_file, "r") as file:
                 source_code = file.read()
-                t = parser.parse(bytes(source_code, "utf8"))
+                t = TSLanguage.get_parser().parse(bytes(source_code, "utf8"))
                 new_code, original_code = BaselineRun.delete_comments(
                     source_code, t.root_node
                 )
@@ -450,6 +440,9 @@ def run():
     project_name = bug_type
 
     keys = os.environ.get("OPENAI_API_KEY").split(":")
+    # Import the SDK only when the baseline is run, so that importing this module does not load it
+    import openai
+
     openai.api_key = keys[0]
     baseline_run = BaselineRun(spec, project_name, online_model_name, keys[0], mode)
     baseline_run.start_baseline_run(main_test)
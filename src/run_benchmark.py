@@ -0,0 +1,408 @@
+import argparse
+import concurrent.futures
+import json
+import multiprocessing
+import os
+import re
+import resource
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+from engine.DFA import DFA
+from TSAgent.TS_parser import TSStaticFieldCache
+from TSAgent.TS_visitor import ExtractionRule, TSExtractionVisitor
+from TSAgent.TS_manual_extractor import (
+    find_dbz_src,
+    find_dbz_sink,
+    find_xss_src,
+    find_xss_sink,
+    find_ci_src,
+    find_ci_sink,
+)
+from utility.metrics import Metrics
+
+# The bundled suites, their spec files, and their flow files
+BENCHMARK_SUITES = {
+    "dbz": (
+        "juliet-test-suite-DBZ",
+        "spec/dbz_source.json",
+        "spec/dbz_sink.json",
+        "flow/eq_flow_propagator.json",
+        "flow/eq_flow_validator.json",
+    ),
+    "xss": (
+        "juliet-test-suite-XSS",
+        "spec/xss_source.json",
+        "spec/xss_sink.json",
+        "flow/dep_flow_propagator.json",
+        "flow/dep_flow_validator.json",
+    ),
+    "osci": (
+        "juliet-test-suite-CI",
+        "spec/ci_source.json",
+        "spec/ci_sink.json",
+        "flow/dep_flow_propagator.json",
+        "flow/dep_flow_validator.json",
+    ),
+}
+
+# The manual extractors of the suites, which are evaluated as node rules
+MANUAL_EXTRACTORS = {
+    "dbz": (find_dbz_src, find_dbz_sink),
+    "xss": (find_xss_src, find_xss_sink),
+    "osci": (find_ci_src, find_ci_sink),
+}
+
+
+class OfflineBenchmark:
+    """
+    OfflineBenchmark class for measuring the analysis engine without any LLM latency.
+    The Juliet files are analyzed by DFA with the offline model,
+    which answers every query deterministically,
+    and the manual extractors in TS_manual_extractor.py are used instead of the LLM-based extractors,
+    unless the extractors selected at runtime, i.e., a registered or a synthesized one, are measured.
+    The offline model answers the solving program queries with a program reporting SAT,
+    so that the solver-based path check can be measured as well.
+    """
+
+    def __init__(
+        self,
+        bug_types: List[str],
+        limit: int = None,
+        log_dir: str = None,
+        is_syn_solver: bool = False,
+        is_manual_extractor: bool = True,
+    ) -> None:
+        """
+        :param bug_types: the bug types of the analyzed suites
+        :param limit: the maximal number of the analyzed files in each suite, or None for all the files
+        :param log_dir: the directory of the reports, or None for a new temporary directory
+        :param is_syn_solver: whether to check the path feasibility with the synthesized solving programs
+        :param is_manual_extractor: whether to use the manual extractors instead of the extractors selected at runtime
+        """
+        self.bug_types: List[str] = bug_types
+        self.limit: int = limit
+        self.log_dir: str = log_dir
+        self.is_syn_solver: bool = is_syn_solver
+        self.is_manual_extractor: bool = is_manual_extractor
+        self.cwd: Path = Path(__file__).resolve().parent.parent.absolute()
+
+    def collect_files(self, project_name: str) -> Tuple[List[str], List[str]]:
+        """
+        :param project_name: the name of the suite under the benchmark directory
+        :return the sorted paths of the analyzed java files and the support files
+        """
+        suite_dir = self.cwd / "benchmark" / project_name
+        java_files = []
+        support_files = []
+        for root, dirs, files in os.walk(suite_dir):
+            for file in files:
+                if not file.endswith(".java"):
+                    continue
+                if os.path.basename(root) == "testcasesupport":
+                    support_files.append(os.path.join(root, file))
+                elif re.search(r"_\d+$", file.replace(".java", "")):
+                    java_files.append(os.path.join(root, file))
+        java_files.sort()
+        support_files.sort()
+        if self.limit is not None:
+            java_files = java_files[: self.limit]
+        return java_files, support_files
+
+    def run_suite(self, bug_type: str) -> Dict:
+        """
+        Analyze the files of a suite and summarize the throughput of the stages
+        :param bug_type: the bug type of the suite
+        :return the summary of the suite
+        """
+        (
+            project_name,
+            src_spec,
+            sink_spec,
+            propagator_spec,
+            validator_spec,
+        ) = BENCHMARK_SUITES[bug_type]
+        java_files, support_files = self.collect_files(project_name)
+        if self.log_dir is None:
+            self.log_dir = tempfile.mkdtemp(prefix="llmdfa_benchmark_")
+        base_log_dir_path = self.log_dir
+
+        metrics = Metrics()
+        start_time = time.perf_counter()
+        with metrics.span("static_field_cache"):
+            TSStaticFieldCache.get(support_files)
+        for java_file in java_files:
+            dfa = DFA(
+                java_file,
+                support_files,
+                base_log_dir_path,
+                project_name,
+                src_spec,
+                sink_spec,
+                propagator_spec,
+                validator_spec,
+                "offline",
+                True,
+                True,
+                self.is_syn_solver,
+                1,
+                "",
+                0,
+            )
+            if self.is_manual_extractor:
+                src_extractor, sink_extractor = MANUAL_EXTRACTORS[bug_type]
+                dfa.extraction_visitor = TSExtractionVisitor(
+                    [ExtractionRule.from_extractor(src_extractor)],
+                    [ExtractionRule.from_extractor(sink_extractor)],
+                )
+            dfa.analyze()
+            dfa.validate()
+            with metrics.span("report"):
+                dfa.report()
+            metrics.merge(dfa.compute_metrics())
+        wall_time = time.perf_counter() - start_time
+        return OfflineBenchmark.summarize(metrics, len(java_files), wall_time)
+
+    @staticmethod
+    def summarize(metrics: Metrics, file_num: int, wall_time: float) -> Dict:
+        """
+        :param metrics: the merged metrics of all the files in a suite
+        :param file_num: the number of the analyzed files
+        :param wall_time: the wall-clock time of the suite
+        :return the throughput of the suite and of each stage,
+        and the numbers of the propagated pairs and the LLM calls per file.
+        The peak RSS is the peak of the process running the suite.
+        """
+        metrics_dict = metrics.to_dict()
+        function_num = metrics_dict["counters"].get("analyzed_functions", 0)
+        pair_num = metrics_dict["counters"].get("pairs", 0)
+        llm_call_num = metrics_dict["counters"].get("llm_calls", 0)
+        stages = {}
+        for name, span in metrics_dict["spans"].items():
+            total_time = span["total_time"]
+            stages[name] = {
+                "count": span["count"],
+                "total_time": total_time,
+                "files_per_second": file_num / total_time if total_time > 0 else 0,
+                "functions_per_second": (
+                    function_num / total_time if total_time > 0 else 0
+                ),
+            }
+        return {
+            "file_num": file_num,
+            "function_num": function_num,
+            "wall_time": wall_time,
+            "files_per_second": file_num / wall_time if wall_time > 0 else 0,
+            "functions_per_second": function_num / wall_time if wall_time > 0 else 0,
+            "pairs_per_file": pair_num / file_num if file_num > 0 else 0,
+            "llm_calls_per_file": llm_call_num / file_num if file_num > 0 else 0,
+            "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+            "stages": stages,
+            "counters": metrics_dict["counters"],
+        }
+
+    def run(self) -> Dict:
+        """
+        Run each suite in a new process, so that the peak RSS of a suite is not the peak of the earlier suites
+        :return the results of all the suites
+        """
+        if self.log_dir is None:
+            self.log_dir = tempfile.mkdtemp(prefix="llmdfa_benchmark_")
+        results = {
+            "limit": self.limit,
+            "is_syn_solver": self.is_syn_solver,
+            "is_manual_extractor": self.is_manual_extractor,
+            "suites": {},
+        }
+        for bug_type in self.bug_types:
+            with concurrent.futures.ProcessPoolExecutor(
+                max_workers=1, mp_context=multiprocessing.get_context("spawn")
+            ) as executor:
+                results["suites"][bug_type] = executor.submit(
+                    self.run_suite, bug_type
+                ).result()
+        return results
+
+    @staticmethod
+    def compare(
+        results: Dict, baseline: Dict, tolerance: float, min_time: float = 0.05
+    ) -> List[str]:
+        """
+        Compare the throughput with a baseline.
+        A suite or a stage regresses if its throughput drops by more than the tolerance,
+        and a suite also regresses if it propagates more pairs or issues more LLM calls per file.
+        The stages taking less than min_time seconds in the baseline are too noisy to be compared.
+        :param results: the results of the current run
+        :param baseline: the results of the baseline run
+        :param tolerance: the tolerated ratio of the throughput drop
+        :param min_time: the minimal total time of a compared stage in the baseline
+        :return the descriptions of the regressions
+        """
+        regressions = []
+        for bug_type, suite in results["suites"].items():
+            if bug_type not in baseline["suites"]:
+                continue
+            base_suite = baseline["suites"][bug_type]
+            if base_suite["file_num"] != suite["file_num"]:
+                regressions.append(
+                    "%s: %d files are analyzed, while the baseline analyzes %d files"
+                    % (bug_type, suite["file_num"], base_suite["file_num"])
+                )
+                continue
+            # The analysis is deterministic offline, so any growth of the work per file is a regression
+            for name in ["pairs_per_file", "llm_calls_per_file"]:
+                if name in base_suite and suite[name] > base_suite[name]:
+                    regressions.append(
+                        "%s: %.2f %s, baseline %.2f"
+                        % (bug_type, suite[name], name, base_suite[name])
+                    )
+            measures = [("total", suite, base_suite)]
+            for name, stage in suite["stages"].items():
+                if name not in base_suite["stages"]:
+                    continue
+                if base_suite["stages"][name]["total_time"] >= min_time:
+                    measures.append((name, stage, base_suite["stages"][name]))
+            for name, current, base in measures:
+                if current["files_per_second"] < base["files_per_second"] * (
+                    1 - tolerance
+                ):
+                    regressions.append(
+                        "%s/%s: %.2f files/sec, baseline %.2f files/sec"
+                        % (
+                            bug_type,
+                            name,
+                            current["files_per_second"],
+                            base["files_per_second"],
+                        )
+                    )
+        return regressions
+
+    @staticmethod
+    def print_work_comparison(results: Dict, baseline: Dict) -> None:
+        """
+        Print the numbers of the propagated pairs and the LLM calls per file in the baseline and in the current run
+        """
+        for bug_type, suite in results["suites"].items():
+            if bug_type not in baseline["suites"]:
+                continue
+            base_suite = baseline["suites"][bug_type]
+            print(
+                "%s: %.2f -> %.2f pairs/file, %.2f -> %.2f LLM calls/file"
+                % (
+                    bug_type,
+                    base_suite.get("pairs_per_file", 0),
+                    suite["pairs_per_file"],
+                    base_suite.get("llm_calls_per_file", 0),
+                    suite["llm_calls_per_file"],
+                )
+            )
+
+    @staticmethod
+    def print_results(results: Dict) -> None:
+        for bug_type, suite in results["suites"].items():
+            print(
+                "%s: %d files, %d functions, %.2fs, %.2f files/sec, %.2f functions/sec, peak RSS %d KB"
+                % (
+                    bug_type,
+                    suite["file_num"],
+                    suite["function_num"],
+                    suite["wall_time"],
+                    suite["files_per_second"],
+                    suite["functions_per_second"],
+                    suite["peak_rss_kb"],
+                )
+            )
+            print(
+                "    %.2f pairs/file, %.2f LLM calls/file"
+                % (suite["pairs_per_file"], suite["llm_calls_per_file"])
+            )
+            for name, stage in suite["stages"].items():
+                print(
+                    "    %-28s %9.4fs %12.2f functions/sec"
+                    % (name, stage["total_time"], stage["functions_per_second"])
+                )
+
+
+def run():
+    """
+    Run the offline benchmark of the analysis engine
+    """
+    parser = argparse.ArgumentParser(
+        description="Benchmark the LLMDFA analysis engine offline on the bundled Juliet suites."
+    )
+    parser.add_argument(
+        "--bug-type",
+        choices=BENCHMARK_SUITES.keys(),
+        action="append",
+        help="The suites to benchmark. All the suites are benchmarked by default.",
+    )
+    parser.add_argument(
+        "--limit",
+        type=int,
+        default=None,
+        help="The maximal number of the analyzed files in each suite.",
+    )
+    parser.add_argument(
+        "--log-dir",
+        type=str,
+        default=None,
+        help="The directory of the reports. A new temporary directory is used by default.",
+    )
+    parser.add_argument(
+        "-syn-solver",
+        action="store_true",
+        help="Check the path feasibility with the solving programs answered by the offline model.",
+    )
+    parser.add_argument(
+        "-selected-extractor",
+        action="store_true",
+        help="Use the extractors selected at runtime instead of the manual extractors.",
+    )
+    parser.add_argument(
+        "--save-baseline",
+        type=str,
+        help="The path of the JSON file storing the results as a baseline.",
+    )
+    parser.add_argument(
+        "--baseline",
+        type=str,
+        help="The path of a baseline JSON file to compare with.",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="The tolerated ratio of the throughput drop against the baseline.",
+    )
+    args = parser.parse_args()
+
+    bug_types = args.bug_type if args.bug_type else list(BENCHMARK_SUITES.keys())
+    results = OfflineBenchmark(
+        bug_types,
+        args.limit,
+        args.log_dir,
+        args.syn_solver,
+        not args.selected_extractor,
+    ).run()
+    OfflineBenchmark.print_results(results)
+
+    if args.save_baseline is not None:
+        with open(args.save_baseline, "w") as file:
+            json.dump(results, file, indent=4)
+
+    if args.baseline is not None:
+        with open(args.baseline, "r") as file:
+            baseline = json.load(file)
+        OfflineBenchmark.print_work_comparison(results, baseline)
+        regressions = OfflineBenchmark.compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print("Regression: " + regression)
+        if len(regressions) > 0:
+            sys.exit(1)
+        print("No regression against the baseline")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,304 @@
+import argparse
+import importlib
+import json
+import os
+import time
+from typing import Callable, Dict, List, Tuple
+
+import tree_sitter
+
+from run_benchmark import BENCHMARK_SUITES, OfflineBenchmark
+from TSAgent.TS_analyzer import TSAnalyzer
+from TSAgent.TS_extractor_registry import EXTRACTOR_SUFFIXES, TSExtractorRegistry
+from TSAgent.TS_query_extractor import TSQueryExtractor
+from TSAgent.TS_transformer import TSFunctionTransformer
+from TSAgent.synthesis.specs import get_spec_hash
+
+# The modules implementing the extractors, named by their implementations
+EXTRACTOR_MODULES = {
+    "manual": "TSAgent.TS_manual_extractor",
+    "synthesis": "TSAgent.TS_synthesis_extractor",
+    "synthezied_parser": "TSAgent.synthezied_parser",
+}
+
+# The extracted values of a function, i.e., the sorted (line number, name) pairs
+ExtractedValues = Tuple[Tuple[int, str], ...]
+
+
+class ExtractorBenchmark:
+    """
+    ExtractorBenchmark class for measuring the speed and the agreement of the source/sink extractors.
+    All the functions of the Juliet files are transformed to the SSI form and parsed once,
+    as in DFA, and then every available implementation of an extractor runs over the same parse trees,
+    including the query forms compiled from the python forms.
+    The LLM-based extraction is not measured, since it cannot be run offline.
+    """
+
+    def __init__(self, bug_types: List[str], limit: int = None, repeats: int = 3):
+        """
+        :param bug_types: the bug types of the analyzed suites
+        :param limit: the maximal number of the analyzed files in each suite, or None for all the files
+        :param repeats: the number of the timed runs of an extractor on each function
+        """
+        self.bug_types: List[str] = bug_types
+        self.limit: int = limit
+        self.repeats: int = repeats
+
+    @staticmethod
+    def collect_extractors(spec_file_path: str) -> Dict[str, Callable]:
+        """
+        :param spec_file_path: the path of the spec file of a source or sink extractor
+        :return the available implementations of the extractor, keyed by their names
+        """
+        bug_type, role = TSExtractorRegistry.parse_spec_path(spec_file_path)
+        fn_name = "find_%s_%s" % (bug_type, "src" if role == "source" else "sink")
+        extractors = {}
+        for name, module_name in EXTRACTOR_MODULES.items():
+            module = importlib.import_module(module_name)
+            if hasattr(module, fn_name):
+                extractors[name] = getattr(module, fn_name)
+                # The query form compiled from the python form, if any
+                with open(module.__file__, "r") as file:
+                    query_extractor = TSQueryExtractor.from_python(file.read(), fn_name)
+                if query_extractor is not None:
+                    extractors[name + "_query"] = query_extractor
+        # The registered query forms are measured as well, although they are not selected by default
+        for kind in EXTRACTOR_SUFFIXES:
+            entry = TSExtractorRegistry.select(
+                bug_type, role, get_spec_hash(bug_type, role), (kind,)
+            )
+            if entry is not None:
+                extractors["registry_%s_v%d" % (kind, entry.version)] = entry.load()
+        return extractors
+
+    @staticmethod
+    def collect_functions(
+        java_files: List[str], support_files: List[str]
+    ) -> List[Tuple[str, str, tree_sitter.Tree]]:
+        """
+        :param java_files: the paths of the analyzed java files
+        :param support_files: the paths of the support files
+        :return the name, the SSI source code, and the parse tree of each function
+        """
+        functions = []
+        for java_file in java_files:
+            ts_analyzer = TSAnalyzer(java_file, support_files)
+            transformer = TSFunctionTransformer(ts_analyzer)
+            for function_id, (name, code) in ts_analyzer.ts_parser.methods.items():
+                transformer.transform(function_id, code)
+                tree = ts_analyzer.ts_parser.parse(transformer.SSI_without_comments)
+                functions.append(
+                    (
+                        "%s:%s" % (os.path.basename(java_file), name),
+                        transformer.SSI_without_comments,
+                        tree,
+                    )
+                )
+        return functions
+
+    @staticmethod
+    def count_nodes(root_node: tree_sitter.Node) -> int:
+        count = 0
+        cursor: tree_sitter.TreeCursor = root_node.walk()
+        while True:
+            count += 1
+            if cursor.goto_first_child():
+                continue
+            while not cursor.goto_next_sibling():
+                if not cursor.goto_parent():
+                    return count
+
+    @staticmethod
+    def percentile(sorted_values: List[float], ratio: float) -> float:
+        if len(sorted_values) == 0:
+            return 0.0
+        index = min(len(sorted_values) - 1, int(ratio * len(sorted_values)))
+        return sorted_values[index]
+
+    def measure(
+        self, extractor: Callable, functions: List[Tuple[str, str, tree_sitter.Tree]]
+    ) -> Tuple[List[ExtractedValues], List[float]]:
+        """
+        Run an extractor over the functions.
+        The first run of each function warms up the caches and collects the extracted values,
+        and the latency of a function is the minimum of the timed runs.
+        :return the extracted values and the latency of each function
+        """
+        outputs = []
+        latencies = []
+        for _, code, tree in functions:
+            values = extractor(code, tree.root_node)
+            outputs.append(
+                tuple(sorted(set((value.line_number, value.name) for value in values)))
+            )
+            latency = float("inf")
+            for _ in range(self.repeats):
+                start_time = time.perf_counter()
+                extractor(code, tree.root_node)
+                latency = min(latency, time.perf_counter() - start_time)
+            latencies.append(latency)
+        return outputs, latencies
+
+    def run_extractor(
+        self, spec_file_path: str, functions: List[Tuple[str, str, tree_sitter.Tree]]
+    ) -> Dict:
+        """
+        Measure all the implementations of an extractor and diff their outputs pairwise
+        :param spec_file_path: the path of the spec file of a source or sink extractor
+        :param functions: the functions of the suite
+        :return the speed of each implementation and the disagreements between the implementations
+        """
+        node_num = sum(self.count_nodes(tree.root_node) for _, _, tree in functions)
+        implementations = {}
+        outputs = {}
+        for name, extractor in self.collect_extractors(spec_file_path).items():
+            outputs[name], latencies = self.measure(extractor, functions)
+            total_time = sum(latencies)
+            latencies.sort()
+            implementations[name] = {
+                "total_time": total_time,
+                "nodes_per_second": node_num / total_time if total_time > 0 else 0,
+                "functions_per_second": (
+                    len(functions) / total_time if total_time > 0 else 0
+                ),
+                "p50_latency": self.percentile(latencies, 0.5),
+                "p90_latency": self.percentile(latencies, 0.9),
+                "p99_latency": self.percentile(latencies, 0.99),
+                "max_latency": latencies[-1] if len(latencies) > 0 else 0.0,
+                "value_num": sum(len(values) for values in outputs[name]),
+            }
+
+        diffs = {}
+        names = list(outputs.keys())
+        for i in range(len(names)):
+            for j in range(i + 1, len(names)):
+                disagreements = []
+                for index, (function_name, _, _) in enumerate(functions):
+                    left = outputs[names[i]][index]
+                    right = outputs[names[j]][index]
+                    if left != right:
+                        disagreements.append(
+                            {
+                                "function": function_name,
+                                names[i]: sorted(set(left) - set(right)),
+                                names[j]: sorted(set(right) - set(left)),
+                            }
+                        )
+                diffs["%s/%s" % (names[i], names[j])] = {
+                    "agreement": (
+                        1 - len(disagreements) / len(functions)
+                        if len(functions) > 0
+                        else 1.0
+                    ),
+                    "disagreements": disagreements,
+                }
+        return {
+            "node_num": node_num,
+            "implementations": implementations,
+            "diffs": diffs,
+        }
+
+    def run_suite(self, bug_type: str) -> Dict:
+        project_name, src_spec, sink_spec, _, _ = BENCHMARK_SUITES[bug_type]
+        java_files, support_files = OfflineBenchmark(
+            [bug_type], self.limit
+        ).collect_files(project_name)
+        functions = self.collect_functions(java_files, support_files)
+        return {
+            "file_num": len(java_files),
+            "function_num": len(functions),
+            "source": self.run_extractor(src_spec, functions),
+            "sink": self.run_extractor(sink_spec, functions),
+        }
+
+    def run(self) -> Dict:
+        results = {"limit": self.limit, "repeats": self.repeats, "suites": {}}
+        for bug_type in self.bug_types:
+            results["suites"][bug_type] = self.run_suite(bug_type)
+        return results
+
+    @staticmethod
+    def print_results(results: Dict, diff_num: int) -> None:
+        """
+        :param results: the results of the benchmark
+        :param diff_num: the maximal number of the printed disagreements of each pair of implementations
+        """
+        for bug_type, suite in results["suites"].items():
+            print(
+                "%s: %d files, %d functions"
+                % (bug_type, suite["file_num"], suite["function_num"])
+            )
+            for role in ["source", "sink"]:
+                extractor = suite[role]
+                print("  %s (%d nodes)" % (role, extractor["node_num"]))
+                for name, measure in extractor["implementations"].items():
+                    print(
+                        "    %-20s %12.0f nodes/sec  p50 %.1fus  p90 %.1fus  p99 %.1fus  max %.1fus  %d values"
+                        % (
+                            name,
+                            measure["nodes_per_second"],
+                            measure["p50_latency"] * 1e6,
+                            measure["p90_latency"] * 1e6,
+                            measure["p99_latency"] * 1e6,
+                            measure["max_latency"] * 1e6,
+                            measure["value_num"],
+                        )
+                    )
+                for pair, diff in extractor["diffs"].items():
+                    print(
+                        "    %-41s agreement %.2f%%, %d disagreements"
+                        % (pair, diff["agreement"] * 100, len(diff["disagreements"]))
+                    )
+                    for disagreement in diff["disagreements"][:diff_num]:
+                        print("      " + json.dumps(disagreement))
+
+
+def run():
+    """
+    Run the micro-benchmark and the differential comparison of the extractors
+    """
+    parser = argparse.ArgumentParser(
+        description="Benchmark and diff the source/sink extractors on the bundled Juliet suites."
+    )
+    parser.add_argument(
+        "--bug-type",
+        choices=BENCHMARK_SUITES.keys(),
+        action="append",
+        help="The suites to benchmark. All the suites are benchmarked by default.",
+    )
+    parser.add_argument(
+        "--limit",
+        type=int,
+        default=None,
+        help="The maximal number of the analyzed files in each suite.",
+    )
+    parser.add_argument(
+        "--repeats",
+        type=int,
+        default=3,
+        help="The number of the timed runs of an extractor on each function.",
+    )
+    parser.add_argument(
+        "--show-diffs",
+        type=int,
+        default=5,
+        help="The maximal number of the printed disagreements of each pair of extractors.",
+    )
+    parser.add_argument(
+        "--output",
+        type=str,
+        help="The path of the JSON file storing the results.",
+    )
+    args = parser.parse_args()
+
+    bug_types = args.bug_type if args.bug_type else list(BENCHMARK_SUITES.keys())
+    results = ExtractorBenchmark(bug_types, args.limit, args.repeats).run()
+    ExtractorBenchmark.print_results(results, args.show_diffs)
+
+    if args.output is not None:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=4)
+
+
+if __name__ == "__main__":
+    run()
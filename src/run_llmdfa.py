@@ -5,6 +5,9 @@ import os
 import re
 import time
 from engine.DFA import DFA
+from TSAgent.TS_parser import TSStaticFieldCache
+from utility.metrics import Metrics
+from utility.event_log import EventLog
 from typing import List
 from pathlib import Path
 from typing import Tuple
@@ -133,6 +136,10 @@ class BatchRun:
         temp: float,
         model_key: str,
         analysis_mode: str,
+        is_prefix_caching: bool = False,
+        verbosity: int = EventLog.STAGE,
+        is_extraction_cache: bool = False,
+        is_streaming: bool = False,
     ):
         self.src_spec_file = src_spec_file
         self.sink_spec_file = sink_spec_file
@@ -157,6 +164,10 @@ class BatchRun:
         self.batch_run_statistics = {}
         self.temp = temp
         self.model_key = model_key
+        self.is_prefix_caching = is_prefix_caching
+        self.verbosity = verbosity
+        self.is_extraction_cache = is_extraction_cache
+        self.is_streaming = is_streaming
         return
 
     def batch_transform_projects(self, main_test: str) -> None:
@@ -280,8 +291,8 @@ class BatchRun:
                         isFP = True
                         break
                 if not isFP:
-                    (function_id_start, local_value_start) = bug_trace[0]
-                    (function_id_end, local_value_end) = bug_trace[-1]
+                    function_id_start, local_value_start = bug_trace[0]
+                    function_id_end, local_value_end = bug_trace[-1]
                     start_function = DFAEngine.environment.analyzed_functions[
                         function_id_start
                     ].original_function
@@ -312,14 +323,7 @@ class BatchRun:
             results = {"TPs": len(TPs), "FPs": len(FPs)}
         return results, positive_num, negative_num
 
-    def startBatchRun(self, main_test: str) -> None:
-        self.batch_transform_projects(main_test)
-        total_input_token_cost = 0
-        total_output_token_cost = 0
-        analysis_result = {}
-
-        DFA_num = 1
-
+    def construct_base_log_dir_path(self) -> str:
         log_dir_name = ""
         if self.is_syn_parser:
             log_dir_name += "synparser"
@@ -345,6 +349,31 @@ class BatchRun:
 
         if not os.path.exists(base_log_dir_path):
             os.makedirs(base_log_dir_path)
+        return base_log_dir_path
+
+    def construct_event_log(self, base_log_dir_path: str) -> EventLog:
+        """
+        Create the JSONL event log of a run, which is named after the start time of the run
+        :param base_log_dir_path: the base log directory
+        """
+        event_log_path = (
+            base_log_dir_path
+            + "/events_"
+            + datetime.now().strftime("%Y%m%d_%H%M%S")
+            + ".jsonl"
+        )
+        return EventLog(event_log_path, self.verbosity)
+
+    def startBatchRun(self, main_test: str) -> None:
+        self.batch_transform_projects(main_test)
+        total_input_token_cost = 0
+        total_output_token_cost = 0
+        analysis_result = {}
+
+        DFA_num = 1
+
+        base_log_dir_path = self.construct_base_log_dir_path()
+        event_log = self.construct_event_log(base_log_dir_path)
 
         support_files = []
         cwd = Path(__file__).resolve().parent.parent.absolute()
@@ -355,8 +384,23 @@ class BatchRun:
             for file in files:
                 support_files.append(support_dir + "/" + str(file))
 
+        # Compute the static fields of the support files once per batch,
+        # which are shared read-only by all the DFA instances
+        TSStaticFieldCache.get(support_files)
+
         total_results = {}
 
+        # Stage timing and counters aggregated over all the analyzed files
+        batch_metrics = Metrics()
+
+        event_log.emit(
+            "batch_start",
+            EventLog.RUN,
+            bug_type=self.bug_type,
+            analysis_mode=self.analysis_mode,
+            file_num=len(self.all_single_files),
+        )
+
         # for java_file in self.analyzed_java_files:
         for java_file in self.all_single_files:
             name = java_file[java_file.rfind("/") + 1 :].replace(".java", "")
@@ -377,32 +421,40 @@ class BatchRun:
                 self.solving_refine_number,
                 self.model_key,
                 self.temp,
+                self.is_prefix_caching,
+                False,
+                event_log,
+                self.is_extraction_cache,
+                self.is_streaming,
             )
 
-            print(
-                "Start to analyze the case ",
-                DFA_num,
-                "out of ",
-                len(self.all_single_files),
-            )
-            print(java_file)
+            event_log.emit("file_start", EventLog.RUN, file=name, index=DFA_num)
 
             start_time = time.time()
             DFAEngine.analyze()
             DFAEngine.validate()
-            print("finish validate")
             DFAEngine.report()
-            print("finish report")
             end_time = time.time()
             single_time_cost = end_time - start_time
+            batch_metrics.merge(DFAEngine.compute_metrics())
+            batch_metrics.add_time("file_analysis", single_time_cost)
 
             results, positive_num, negative_num = BatchRun.examineBugReport(DFAEngine)
             input_token_cost, output_token_cost = DFAEngine.compute_total_token_cost()
             total_input_token_cost += input_token_cost
             total_output_token_cost += output_token_cost
+            llm_statistics = DFAEngine.compute_llm_statistics()
             analysis_result = {
                 "input_token_cost": input_token_cost,
                 "output_token_cost": output_token_cost,
+                "cached_input_token_cost": llm_statistics["cached_input_token_cost"],
+                "average_llm_latency": llm_statistics["average_latency"],
+                "skipped_llm_calls": llm_statistics["skipped_query_count"],
+                "coalesced_llm_calls": llm_statistics["coalesced_query_count"],
+                "stopped_llm_calls": llm_statistics["stopped_query_count"],
+                "average_first_token_latency": llm_statistics[
+                    "average_first_token_latency"
+                ],
                 "analysis_result": results,
                 "ground_truth": {"TPs": positive_num, "FPs": negative_num},
                 "single time cost": single_time_cost,
@@ -419,18 +471,104 @@ class BatchRun:
             total_results["TPs"] += results["TPs"]
             total_results["FPs"] += results["FPs"]
 
-            print("===================================================")
-            print(DFA_num, " / ", len(self.all_single_files), "\n")
-            print(name, "\n")
-            print(analysis_result, "\n")
-            print("===================================================")
-            print("\n")
+            event_log.emit(
+                "file_finish",
+                EventLog.RUN,
+                file=name,
+                index=DFA_num,
+                duration=single_time_cost,
+                input_token_cost=input_token_cost,
+                output_token_cost=output_token_cost,
+                analysis_result=results,
+            )
+            event_log.flush()
+            print(DFA_num, "/", len(self.all_single_files), name, results)
 
             DFA_num += 1
 
             if DFA_num > 10 and self.analysis_mode == "single":
                 break
 
+        batch_metrics.dump(base_log_dir_path + "/batch_metrics.json")
+        event_log.emit(
+            "batch_finish",
+            EventLog.RUN,
+            file_num=DFA_num - 1,
+            input_token_cost=total_input_token_cost,
+            output_token_cost=total_output_token_cost,
+        )
+        event_log.flush()
+        return
+
+    def startProjectRun(self, project_path: str) -> None:
+        """
+        Analyze the entry points across all the java files under the project path with a single DFA
+        :param project_path: The path of the project
+        """
+        base_log_dir_path = self.construct_base_log_dir_path()
+        event_log = self.construct_event_log(base_log_dir_path)
+
+        # The static fields of all the java files in the project are visible
+        support_files = []
+        for root, dirs, files in os.walk(project_path):
+            for file in files:
+                if file.endswith(".java"):
+                    support_files.append(os.path.join(root, file))
+        support_files.sort()
+
+        start_time = time.time()
+        DFAEngine = DFA(
+            project_path,
+            support_files,
+            base_log_dir_path,
+            self.bug_type,
+            self.src_spec_file,
+            self.sink_spec_file,
+            self.propagator_spec_file,
+            self.validator_spec_file,
+            self.online_model_name,
+            self.is_syn_parser,
+            self.is_fscot,
+            self.is_syn_solver,
+            self.solving_refine_number,
+            self.model_key,
+            self.temp,
+            self.is_prefix_caching,
+            True,
+            event_log,
+            self.is_extraction_cache,
+            self.is_streaming,
+        )
+        event_log.emit("project_start", EventLog.RUN, project_path=project_path)
+        DFAEngine.analyze()
+        DFAEngine.validate()
+        DFAEngine.report()
+        end_time = time.time()
+
+        input_token_cost, output_token_cost = DFAEngine.compute_total_token_cost()
+        llm_statistics = DFAEngine.compute_llm_statistics()
+        analysis_result = {
+            "input_token_cost": input_token_cost,
+            "output_token_cost": output_token_cost,
+            "cached_input_token_cost": llm_statistics["cached_input_token_cost"],
+            "average_llm_latency": llm_statistics["average_latency"],
+            "skipped_llm_calls": llm_statistics["skipped_query_count"],
+            "coalesced_llm_calls": llm_statistics["coalesced_query_count"],
+            "stopped_llm_calls": llm_statistics["stopped_query_count"],
+            "average_first_token_latency": llm_statistics[
+                "average_first_token_latency"
+            ],
+            "analyzed_function_num": len(DFAEngine.environment.analyzed_functions),
+            "bug_report_num": sum(
+                len(bug_traces) for bug_traces in DFAEngine.bug_reports.values()
+            ),
+            "total time cost": end_time - start_time,
+        }
+        with open(DFAEngine.log_dir_path + "/report_summary.json", "w") as file:
+            json.dump(analysis_result, file, indent=4)
+        event_log.emit("project_finish", EventLog.RUN, **analysis_result)
+        event_log.flush()
+        print(analysis_result, "\n")
         return
 
 
@@ -489,6 +627,11 @@ def run():
     parser.add_argument(
         "-syn-solver", action="store_true", help="Enable or disable syntax solver."
     )
+    parser.add_argument(
+        "-prompt-cache",
+        action="store_true",
+        help="Mark the static prompt prefix as cacheable for the provider.",
+    )
     parser.add_argument(
         "--solving-refine-number",
         type=int,
@@ -497,8 +640,30 @@ def run():
     )
     parser.add_argument(
         "--analysis-mode",
-        choices=["all", "single"],
-        help="Analyze all the subjects or a single demo",
+        choices=["all", "single", "project"],
+        help="Analyze all the subjects, a single demo, or a whole project",
+    )
+    parser.add_argument(
+        "--project-path",
+        type=str,
+        help="The path of the project analyzed in the project mode.",
+    )
+    parser.add_argument(
+        "--verbosity",
+        type=int,
+        choices=[EventLog.RUN, EventLog.STAGE, EventLog.DETAIL],
+        default=EventLog.STAGE,
+        help="The level of the events in the JSONL event log (0: files, 1: stages, 2: queries).",
+    )
+    parser.add_argument(
+        "-extraction-cache",
+        action="store_true",
+        help="Persist the source/sink values extracted by the LLM across runs.",
+    )
+    parser.add_argument(
+        "-streaming",
+        action="store_true",
+        help="Stream the Yes/No answers of the LLM and stop reading once the answers appear.",
     )
 
     args = parser.parse_args()
@@ -525,8 +690,17 @@ def run():
         0,
         tokenkeys[0],
         args.analysis_mode,
+        args.prompt_cache,
+        args.verbosity,
+        args.extraction_cache,
+        args.streaming,
     )
-    batch_run.startBatchRun(main_test)
+    if args.analysis_mode == "project":
+        if args.project_path is None:
+            parser.error("--project-path is required in the project mode")
+        batch_run.startProjectRun(args.project_path)
+    else:
+        batch_run.startBatchRun(main_test)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,70 @@
+import json
+import threading
+import time
+from typing import List, Optional
+
+
+class EventLog:
+    """
+    EventLog class for the structured progress events of a run, written as JSON lines.
+    The events are buffered and written in batches instead of being printed one by one.
+    An event is recorded only if its level does not exceed the verbosity:
+    RUN for the events of runs and files, STAGE for the analysis stages of functions,
+    and DETAIL for the individual queries of the agents.
+    """
+
+    RUN = 0
+    STAGE = 1
+    DETAIL = 2
+
+    def __init__(
+        self,
+        file_path: Optional[str] = None,
+        verbosity: int = STAGE,
+        buffer_size: int = 256,
+    ) -> None:
+        """
+        :param file_path: the path of the JSONL file, or None to discard all the events
+        :param verbosity: the maximal level of the recorded events
+        :param buffer_size: the number of the buffered events that triggers a write
+        """
+        self.file_path: Optional[str] = file_path
+        self.verbosity: int = verbosity
+        self.buffer_size: int = buffer_size
+        self.buffer: List[str] = []
+        self.lock = threading.Lock()
+
+    def is_enabled(self, level: int) -> bool:
+        return self.file_path is not None and level <= self.verbosity
+
+    def emit(self, event: str, level: int = STAGE, **fields) -> None:
+        """
+        Record an event
+        :param event: the event name, e.g., file_start or stage
+        :param level: the level of the event
+        :param fields: the JSON-serializable fields of the event, e.g., file, function_id, duration
+        """
+        if not self.is_enabled(level):
+            return
+        record = {"time": time.time(), "event": event}
+        record.update(fields)
+        line = json.dumps(record)
+        with self.lock:
+            self.buffer.append(line)
+            if len(self.buffer) < self.buffer_size:
+                return
+            lines = self.buffer
+            self.buffer = []
+            self.write(lines)
+
+    def flush(self) -> None:
+        with self.lock:
+            lines = self.buffer
+            self.buffer = []
+            self.write(lines)
+
+    def write(self, lines: List[str]) -> None:
+        if self.file_path is None or len(lines) == 0:
+            return
+        with open(self.file_path, "a") as file:
+            file.write("\n".join(lines) + "\n")
@@ -0,0 +1,126 @@
+import functools
+import hashlib
+import inspect
+import json
+import os
+import threading
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from utility.function import LocalValue, ValueType
+
+# The source values and the sink values of a function
+ExtractedValues = Tuple[Tuple[LocalValue, ...], Tuple[LocalValue, ...]]
+
+
+class ExtractionCache:
+    """
+    ExtractionCache class for persisting the source/sink values extracted by the LLMs across runs.
+    The values are keyed by the hash of the SSI function, the contents of the spec files,
+    the code processing the responses, the model, and the temperature,
+    so that a function with the same text is never sent to the model again for the same specs.
+    """
+
+    # Bump the version when the extraction changes in a way not covered by the key
+    version: int = 2
+    cache_dir: Path = (
+        Path(__file__).resolve().parent.parent.parent / "log" / "extraction_cache"
+    )
+    lock = threading.Lock()
+
+    @staticmethod
+    @functools.lru_cache(maxsize=None)
+    def digest_file(file_path: Path, mtime_ns: int) -> str:
+        """
+        :param file_path: the path of a file
+        :param mtime_ns: the modification time of the file, which invalidates the cached digest
+        :return the hash of the contents of the file
+        """
+        with open(file_path, "rb") as file:
+            return hashlib.sha256(file.read()).hexdigest()
+
+    @classmethod
+    def digest_spec_file(cls, spec_file_path: str) -> str:
+        """
+        :param spec_file_path: the path of a spec file relative to src/prompt
+        :return the hash of the contents of the spec file, including its prompt and its keywords
+        """
+        from LMAgent.prompt_registry import PromptRegistry
+
+        file_path = PromptRegistry.prompt_config_file_base / spec_file_path
+        return cls.digest_file(file_path, os.stat(file_path).st_mtime_ns)
+
+    @staticmethod
+    @functools.lru_cache(maxsize=1)
+    def digest_response_processing() -> str:
+        """
+        :return the hash of the code turning the responses of the LLMs into the values
+        """
+        from LMAgent.LM_agent import LMAgent
+
+        return hashlib.sha256(
+            inspect.getsource(LMAgent.process_response_item_lines).encode()
+        ).hexdigest()
+
+    @classmethod
+    def compute_key(
+        cls,
+        function_text: str,
+        src_spec_file_path: str,
+        sink_spec_file_path: str,
+        model_name: str,
+        temp: float,
+    ) -> str:
+        hasher = hashlib.sha256(str(cls.version).encode())
+        parts = [
+            cls.digest_spec_file(path)
+            for path in [src_spec_file_path, sink_spec_file_path]
+        ]
+        parts += [cls.digest_response_processing(), model_name, str(temp)]
+        for part in parts:
+            hasher.update(part.encode())
+            hasher.update(b"\0")
+        hasher.update(function_text.encode())
+        return hasher.hexdigest()
+
+    @staticmethod
+    def dump_values(values: Tuple[LocalValue, ...]) -> List:
+        return [
+            [value.name, value.line_number, value.v_type.name, value.index]
+            for value in values
+        ]
+
+    @staticmethod
+    def load_values(items: List) -> Tuple[LocalValue, ...]:
+        return tuple(
+            LocalValue(name, line_number, ValueType[v_type], index)
+            for name, line_number, v_type, index in items
+        )
+
+    @classmethod
+    def get(cls, key: str) -> Optional[ExtractedValues]:
+        """
+        :param key: the key computed by compute_key
+        :return: the persisted source values and sink values, or None if they are not persisted
+        """
+        cache_file_path = cls.cache_dir / (key + ".json")
+        if not cache_file_path.exists():
+            return None
+        try:
+            with open(cache_file_path, "r") as file:
+                items = json.load(file)
+            return cls.load_values(items["srcs"]), cls.load_values(items["sinks"])
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    @classmethod
+    def put(cls, key: str, values: ExtractedValues) -> None:
+        srcs, sinks = values
+        items = {"srcs": cls.dump_values(srcs), "sinks": cls.dump_values(sinks)}
+        with cls.lock:
+            try:
+                os.makedirs(cls.cache_dir, exist_ok=True)
+                with open(cls.cache_dir / (key + ".json"), "w") as file:
+                    json.dump(items, file)
+            except OSError:
+                pass
@@ -1,4 +1,4 @@
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 import tree_sitter
 from enum import Enum
 
@@ -88,6 +88,10 @@ class Function:
         # switch statement info
         self.switch_statements: Dict[Tuple, List] = {}
 
+        # source values and sink values, which are extracted once and never modified
+        self.extracted_srcs: Optional[Tuple[LocalValue, ...]] = None
+        self.extracted_sinks: Optional[Tuple[LocalValue, ...]] = None
+
         # function summaries
         self.reachable_summaries: List[Tuple[LocalValue, LocalValue]] = []
         self.unreachable_summaries: List[Tuple[LocalValue, LocalValue]] = []
@@ -1,12 +1,66 @@
-from openai import *
+import os
 import sys
-import tiktoken
-from typing import Tuple
+import functools
+import threading
+from typing import Callable, Dict, Tuple
 import time
 import signal
 from pathlib import Path
-import replicate
-import google.generativeai as genai
+from types import SimpleNamespace
+
+
+class TokenCounter:
+    """
+    TokenCounter class for counting tokens locally.
+    The tiktoken encoder is loaded lazily and at most once per process.
+    """
+
+    encoding = None
+    lock = threading.Lock()
+
+    @staticmethod
+    def get_encoding():
+        if TokenCounter.encoding is None:
+            with TokenCounter.lock:
+                if TokenCounter.encoding is None:
+                    import tiktoken
+
+                    TokenCounter.encoding = tiktoken.encoding_for_model(
+                        "gpt-3.5-turbo-0125"
+                    )
+        return TokenCounter.encoding
+
+    @staticmethod
+    def count(text: str) -> int:
+        if text == "":
+            return 0
+        return len(TokenCounter.get_encoding().encode(text))
+
+    @staticmethod
+    @functools.lru_cache(maxsize=256)
+    def count_static(text: str) -> int:
+        """
+        Count the tokens of a static prompt segment, e.g., a system role or a prompt prefix,
+        which is encoded only once
+        """
+        return TokenCounter.count(text)
+
+
+# The program answered by the offline model, which reports the path condition as satisfiable
+OFFLINE_PROGRAM = '```python\nprint("SAT")\n```'
+
+# The bound of the output tokens of a Claude query, which is required by the Anthropic API
+CLAUDE_MAX_TOKENS = 4096
+
+
+class InFlightRequest:
+    """
+    InFlightRequest class for a provider call shared by the concurrent identical queries
+    """
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.output = ""
 
 
 class LLM:
@@ -14,52 +68,285 @@ class LLM:
     An online inference model using ChatGPT
     """
 
+    # Whether the queries go through the single-flight layer, which is only useful to the callers
+    # issuing queries from several threads of a process and is thus disabled by default
+    is_single_flight: bool = False
+
+    # The provider calls in flight, keyed by the queries and shared by all the LLM instances,
+    # so that the concurrent identical queries are coalesced into a single provider call
+    in_flight: Dict[Tuple, InFlightRequest] = {}
+    in_flight_lock = threading.Lock()
+
+    # The bound of the concurrent provider calls
+    max_concurrent_requests: int = 8
+    request_semaphore = threading.BoundedSemaphore(max_concurrent_requests)
+
     def __init__(
         self,
         online_model_name: str,
         openai_key: str,
         temperature: float,
         system_role="",
+        is_prefix_caching: bool = False,
+        is_streaming: bool = False,
     ) -> None:
         """
         Initialize the LLM with model name, OpenAI key, and temperature.
         :param online_model_name: Name of the online model to use
         :param openai_key: API key for OpenAI
         :param temperature: Temperature setting for the model
+        :param system_role: The system role shared by all the queries
+        :param is_prefix_caching: Whether to mark the static prompt prefix as cacheable for the provider
+        :param is_streaming: Whether to stream the outputs of the queries with stop predicates
         """
         self.online_model_name = online_model_name
-        self.encoding = tiktoken.encoding_for_model("gpt-3.5-turbo-0125")
         self.openai_key = openai_key
         self.temperature = temperature
         self.systemRole = system_role
+        self.is_prefix_caching = is_prefix_caching
+        self.is_streaming = is_streaming
+
+        # Latency and prompt caching statistics
+        self.query_count = 0
+        self.total_latency = 0.0
+        self.cached_input_token_cost = 0
+
+        # The number of the queries answered by the provider call of an identical query in flight
+        self.coalesced_query_count = 0
+
+        # Streaming statistics, i.e., the number of the streamed queries,
+        # the number of the streams stopped by the stop predicates, and the latency of the first tokens
+        self.streamed_query_count = 0
+        self.stopped_query_count = 0
+        self.total_first_token_latency = 0.0
+
+        # The usage reported by the provider for the latest query
+        self.last_usage = None
+
+        # Provider clients are created lazily
+        self.openai_client = None
+        self.claude_client = None
 
     # Main Inference Function
-    def infer(self, message: str, is_measure_cost: bool = True) -> Tuple[str, int, int]:
+    def infer(
+        self,
+        message: str,
+        is_measure_cost: bool = True,
+        prefix: str = "",
+        stop_predicate: Callable[[str], bool] = None,
+        is_program: bool = False,
+    ) -> Tuple[str, int, int]:
         """
         Perform inference using the specified online model.
         :param message: The input message for the model
         :param is_measure_cost: Flag to measure token cost
+        :param prefix: The static part of the input message that precedes the message
+        :param stop_predicate: If streaming is enabled, the output is read until the predicate holds on the partial output
+        :param is_program: Whether the output is expected to be a program wrapped in a pair of ```
         :return: Tuple containing the output, input token cost, and output token cost
         """
+        if not self.is_streaming:
+            stop_predicate = None
         output = ""
+        self.last_usage = None
+
+        start_time = time.time()
+        if self.online_model_name == "offline":
+            output = self.infer_offline(message, is_program)
+        elif LLM.is_single_flight:
+            output, is_coalesced = self.infer_single_flight(
+                message, prefix, stop_predicate
+            )
+            if is_coalesced:
+                # No provider call is issued for the query, so it costs no tokens
+                return output, 0, 0
+        else:
+            output = self.infer_with_provider(message, prefix, stop_predicate)
+        self.total_latency += time.time() - start_time
+        self.query_count += 1
+
+        # The offline model is free, which avoids loading the tokenizer as well
+        if not is_measure_cost or self.online_model_name == "offline":
+            return output, 0, 0
+        input_token_cost, output_token_cost = self.measure_token_cost(
+            message, prefix, output
+        )
+        return output, input_token_cost, output_token_cost
 
+    @classmethod
+    def enable_single_flight(cls, max_concurrent_requests: int = 8) -> None:
+        """
+        Coalesce the concurrent identical queries and bound the concurrent provider calls,
+        which should be done before any query is issued.
+        The analyses in this repository issue the queries of a process sequentially,
+        so the layer only pays off for the callers issuing queries from several threads.
+        The in-flight queries are not shared across processes.
+        :param max_concurrent_requests: The maximal number of the concurrent provider calls
+        """
+        cls.is_single_flight = True
+        cls.max_concurrent_requests = max_concurrent_requests
+        cls.request_semaphore = threading.BoundedSemaphore(max_concurrent_requests)
+
+    def infer_single_flight(
+        self, message: str, prefix: str, stop_predicate: Callable[[str], bool] = None
+    ) -> Tuple[str, bool]:
+        """
+        Issue the query to the provider, or wait for the provider call of an identical query in flight.
+        The first caller of a query issues the provider call, and the others wait for its output.
+        :param message: The input message for the model
+        :param prefix: The static part of the input message
+        :param stop_predicate: The stop predicate of the streamed output, or None
+        :return: Tuple containing the output and whether the query is coalesced with an identical query
+        """
+        key = (
+            self.online_model_name,
+            self.temperature,
+            self.systemRole,
+            prefix,
+            message,
+            stop_predicate,
+        )
+        with LLM.in_flight_lock:
+            request = LLM.in_flight.get(key)
+            is_coalesced = request is not None
+            if is_coalesced:
+                self.coalesced_query_count += 1
+            else:
+                request = InFlightRequest()
+                LLM.in_flight[key] = request
+
+        if is_coalesced:
+            request.done.wait()
+            return request.output, True
+
+        try:
+            with LLM.request_semaphore:
+                request.output = self.infer_with_provider(
+                    message, prefix, stop_predicate
+                )
+        finally:
+            with LLM.in_flight_lock:
+                del LLM.in_flight[key]
+            request.done.set()
+        return request.output, False
+
+    def infer_with_provider(
+        self, message: str, prefix: str, stop_predicate: Callable[[str], bool] = None
+    ) -> str:
+        """
+        :param message: The input message for the model
+        :param prefix: The static part of the input message
+        :param stop_predicate: The stop predicate of the streamed output, or None
+        :return: The output from the provider of the model
+        """
         if "gemini" in self.online_model_name:
-            output = self.infer_with_gemini(message)
+            return self.infer_with_gemini(prefix + message)
         elif "claude" in self.online_model_name:
-            output = self.infer_claude(message)
+            return self.infer_claude(message, prefix, stop_predicate)
         elif "gpt" in self.online_model_name:
-            output = self.infer_with_openai_model(message)
+            return self.infer_with_openai_model(message, prefix, stop_predicate)
+        return ""
 
-        input_token_cost = (
-            0
-            if not is_measure_cost
-            else len(self.encoding.encode(self.systemRole))
-            + len(self.encoding.encode(message))
-        )
-        output_token_cost = (
-            0 if not is_measure_cost else len(self.encoding.encode(output))
-        )
-        return output, input_token_cost, output_token_cost
+    def read_stream(
+        self, stream, stop_predicate: Callable[[str], bool], start_time: float
+    ) -> str:
+        """
+        Read the streamed output until it ends or the stop predicate holds.
+        The stream is closed once the predicate holds, so that the rest of the output is not generated.
+        The streamed chunks carry no usage, and thus the received output tokens are counted locally.
+        :param stream: The chunks of the output, in the format of the OpenAI chat completion chunks
+        :param stop_predicate: The predicate on the partial output
+        :param start_time: The time of issuing the query
+        :return: The received output
+        """
+        output = ""
+        is_first_token = True
+        for chunk in stream:
+            if len(chunk.choices) == 0:
+                continue
+            content = getattr(chunk.choices[0].delta, "content", None)
+            if not content:
+                continue
+            if is_first_token:
+                self.total_first_token_latency += time.time() - start_time
+                is_first_token = False
+            output += content
+            if stop_predicate(output):
+                self.stopped_query_count += 1
+                break
+        if hasattr(stream, "close"):
+            stream.close()
+        self.streamed_query_count += 1
+        return output
+
+    @staticmethod
+    def set_timeout_handler(timeout_handler) -> None:
+        """
+        SIGALRM can only be handled in the main thread.
+        The provider calls in the other threads rely on the timeouts of the provider clients.
+        """
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGALRM, timeout_handler)
+
+    @staticmethod
+    def set_alarm(seconds: int) -> None:
+        if threading.current_thread() is threading.main_thread():
+            signal.alarm(seconds)
+
+    def measure_token_cost(
+        self, message: str, prefix: str, output: str
+    ) -> Tuple[int, int]:
+        """
+        Measure the token cost of the latest query.
+        The usage reported by the provider is preferred.
+        Otherwise, the tokens are counted locally, where the counts of the system role
+        and the prompt prefix are cached as they are identical across the queries of an agent.
+        :param message: The input message for the model
+        :param prefix: The static part of the input message
+        :param output: The output from the model
+        :return: Tuple containing the input token cost and the output token cost
+        """
+        # OpenAI reports prompt_tokens/completion_tokens, and Claude reports input_tokens/output_tokens
+        input_token_cost = getattr(self.last_usage, "prompt_tokens", None)
+        if input_token_cost is None:
+            input_token_cost = getattr(self.last_usage, "input_tokens", None)
+            # Claude excludes the tokens read from or written to the prompt cache from input_tokens
+            if input_token_cost is not None:
+                for cache_field in [
+                    "cache_read_input_tokens",
+                    "cache_creation_input_tokens",
+                ]:
+                    input_token_cost += getattr(self.last_usage, cache_field, None) or 0
+        output_token_cost = getattr(self.last_usage, "completion_tokens", None)
+        if output_token_cost is None:
+            output_token_cost = getattr(self.last_usage, "output_tokens", None)
+
+        if input_token_cost is None:
+            input_token_cost = (
+                TokenCounter.count_static(self.systemRole)
+                + TokenCounter.count_static(prefix)
+                + TokenCounter.count(message)
+            )
+        if output_token_cost is None:
+            output_token_cost = TokenCounter.count(output)
+        return input_token_cost, output_token_cost
+
+    # Inference without any provider
+    def infer_offline(self, message: str, is_program: bool = False) -> str:
+        """
+        Answer every query deterministically without any provider,
+        which is used to measure the performance of the analysis engine apart from the model latency.
+        All the data-flow facts and paths are regarded as feasible,
+        so that the engine explores as many summaries and bug candidates as possible.
+        A query expecting a program, e.g., a path constraint solving program, is answered by
+        a program reporting the path condition as satisfiable.
+        :param message: The input message for the model
+        :param is_program: Whether the output is expected to be a program
+        :return: The fixed answer
+        """
+        if is_program:
+            return OFFLINE_PROGRAM
+        return "Answer: Yes"
 
     # Inference with Gemini
     def infer_with_gemini(self, message: str) -> str:
@@ -75,15 +362,18 @@ class LLM:
         def simulate_ctrl_c(signal, frame):
             raise KeyboardInterrupt("Simulating Ctrl+C")
 
+        # Import the provider SDK only when the provider is used
+        import google.generativeai as genai
+
         gemini_model = genai.GenerativeModel("gemini-pro")
-        signal.signal(signal.SIGALRM, timeout_handler)
+        LLM.set_timeout_handler(timeout_handler)
 
         received = False
         tryCnt = 0
         while not received:
             tryCnt += 1
             try:
-                signal.alarm(50)  # Set a timeout of 50 seconds
+                LLM.set_alarm(50)  # Set a timeout of 50 seconds
                 message = self.systemRole + "\n" + message
 
                 safety_settings = [
@@ -109,8 +399,9 @@ class LLM:
                     generation_config=genai.types.GenerationConfig(
                         temperature=self.temperature
                     ),
+                    request_options={"timeout": 50},
                 )
-                signal.alarm(0)  # Cancel the timeout
+                LLM.set_alarm(0)  # Cancel the timeout
                 output = response.text
                 return output
             except TimeoutError:
@@ -124,11 +415,52 @@ class LLM:
             if tryCnt > 5:
                 return ""
 
+    def build_user_content(self, message: str, prefix: str):
+        """
+        Build the content of the user message.
+        If prefix caching is enabled, the prefix is sent as a separate block marked as cacheable.
+        :param message: The dynamic part of the input message
+        :param prefix: The static part of the input message
+        :return: The content of the user message
+        """
+        if not self.is_prefix_caching or prefix == "":
+            return prefix + message
+        return [
+            {"type": "text", "text": prefix, "cache_control": {"type": "ephemeral"}},
+            {"type": "text", "text": message},
+        ]
+
+    def record_usage(self, usage) -> None:
+        """
+        Record the usage of the latest query
+        and the number of input tokens served from the provider-side prompt cache
+        :param usage: The usage reported by the provider
+        """
+        self.last_usage = usage
+        if usage is None:
+            return
+        # OpenAI reports cached tokens in prompt_tokens_details and Claude in cache_read_input_tokens
+        prompt_tokens_details = getattr(usage, "prompt_tokens_details", None)
+        cached_tokens = getattr(prompt_tokens_details, "cached_tokens", None)
+        if cached_tokens is None:
+            cached_tokens = getattr(usage, "cache_read_input_tokens", None)
+        if cached_tokens is not None:
+            self.cached_input_token_cost += cached_tokens
+        return
+
     # Inference with Claude
-    def infer_claude(self, message: str) -> str:
+    def infer_claude(
+        self,
+        message: str,
+        prefix: str = "",
+        stop_predicate: Callable[[str], bool] = None,
+    ) -> str:
         """
-        Perform inference using the Claude model.
+        Perform inference using the Claude model with the Anthropic SDK,
+        which accepts the prefix block marked by cache_control for prompt caching.
         :param message: The input message for the model
+        :param prefix: The static part of the input message
+        :param stop_predicate: The stop predicate of the streamed output, or None
         :return: The output from the model
         """
 
@@ -138,26 +470,44 @@ class LLM:
         def simulate_ctrl_c(signal, frame):
             raise KeyboardInterrupt("Simulating Ctrl+C")
 
-        input = [
-            {"role": "system", "content": self.systemRole},
-            {"role": "user", "content": message},
+        model_input = [
+            {"role": "user", "content": self.build_user_content(message, prefix)},
         ]
-        signal.signal(signal.SIGALRM, timeout_handler)
+        kwargs = {}
+        if self.systemRole != "":
+            kwargs["system"] = self.systemRole
+        if self.is_prefix_caching:
+            # Prompt caching is a beta feature of the pinned SDK version
+            kwargs["extra_headers"] = {"anthropic-beta": "prompt-caching-2024-07-31"}
+        LLM.set_timeout_handler(timeout_handler)
 
         received = False
         tryCnt = 0
         while not received:
             tryCnt += 1
             try:
-                signal.alarm(60)  # Set a timeout of 60 seconds
-                openai.api_key = self.openai_key
-                response = openai.ChatCompletion.create(
+                LLM.set_alarm(60)  # Set a timeout of 60 seconds
+                start_time = time.time()
+                response = self.get_claude_client().messages.create(
                     model=self.online_model_name,
-                    messages=input,
+                    messages=model_input,
+                    max_tokens=CLAUDE_MAX_TOKENS,
                     temperature=self.temperature,
+                    timeout=60,
+                    stream=stop_predicate is not None,
+                    **kwargs,
                 )
-                signal.alarm(0)  # Cancel the timeout
-                output = response.choices[0].message.content
+                if stop_predicate is not None:
+                    output = self.read_claude_stream(
+                        response, stop_predicate, start_time
+                    )
+                    LLM.set_alarm(0)  # Cancel the timeout
+                    return output
+                LLM.set_alarm(0)  # Cancel the timeout
+                output = "".join(
+                    block.text for block in response.content if block.type == "text"
+                )
+                self.record_usage(response.usage)
                 return output
             except TimeoutError:
                 received = False
@@ -169,11 +519,94 @@ class LLM:
             if tryCnt > 5:
                 return ""
 
+    def read_claude_stream(
+        self, stream, stop_predicate: Callable[[str], bool], start_time: float
+    ) -> str:
+        """
+        Read the streamed events of Claude until the message ends or the stop predicate holds.
+        The input usage, including the cached input tokens, arrives in the first event,
+        and the output usage arrives only at the end of the message.
+        Thus the output tokens of a stopped stream are counted locally.
+        :param stream: The streamed events of the Anthropic SDK
+        :param stop_predicate: The predicate on the partial output
+        :param start_time: The time of issuing the query
+        :return: The received output
+        """
+        output = ""
+        is_first_token = True
+        input_usage = None
+        output_tokens = None
+        for event in stream:
+            if event.type == "message_start":
+                input_usage = event.message.usage
+            elif event.type == "message_delta":
+                output_tokens = event.usage.output_tokens
+            elif event.type == "content_block_delta":
+                text = getattr(event.delta, "text", None)
+                if not text:
+                    continue
+                if is_first_token:
+                    self.total_first_token_latency += time.time() - start_time
+                    is_first_token = False
+                output += text
+                if stop_predicate(output):
+                    self.stopped_query_count += 1
+                    break
+        if hasattr(stream, "close"):
+            stream.close()
+        self.streamed_query_count += 1
+        if input_usage is not None:
+            self.record_usage(
+                SimpleNamespace(
+                    input_tokens=input_usage.input_tokens,
+                    cache_read_input_tokens=getattr(
+                        input_usage, "cache_read_input_tokens", None
+                    ),
+                    cache_creation_input_tokens=getattr(
+                        input_usage, "cache_creation_input_tokens", None
+                    ),
+                    output_tokens=output_tokens,
+                )
+            )
+        return output
+
+    def get_claude_client(self):
+        """
+        Create the Anthropic client on the first use, which also defers importing the SDK.
+        The key in CLAUDE_API_KEY is preferred over the key of the model.
+        """
+        if self.claude_client is None:
+            import anthropic
+
+            self.claude_client = anthropic.Anthropic(
+                api_key=os.environ.get("CLAUDE_API_KEY", self.openai_key)
+            )
+        return self.claude_client
+
+    def get_openai_client(self):
+        """
+        Create the OpenAI client on the first use, which also defers importing the SDK
+        """
+        if self.openai_client is None:
+            from openai import OpenAI
+
+            self.openai_client = OpenAI(api_key=self.openai_key)
+        return self.openai_client
+
     # Inference with OpenAI Model
-    def infer_with_openai_model(self, message: str) -> str:
+    def infer_with_openai_model(
+        self,
+        message: str,
+        prefix: str = "",
+        stop_predicate: Callable[[str], bool] = None,
+    ) -> str:
         """
         Perform inference using the OpenAI model.
+        OpenAI caches long identical prompt prefixes automatically,
+        so that the prefix is simply placed at the beginning of the user message.
         :param message: The input message for the model
+        :param prefix: The static part of the input message
+        :param stop_predicate: The stop predicate of the streamed output, or None
         :return: The output from the model
         """
 
@@ -185,26 +618,33 @@ class LLM:
 
         model_input = [
             {"role": "system", "content": self.systemRole},
-            {"role": "user", "content": message},
+            {"role": "user", "content": prefix + message},
         ]
 
         received = False
         tryCnt = 0
         output = ""
 
-        signal.signal(signal.SIGALRM, timeout_handler)
+        LLM.set_timeout_handler(timeout_handler)
         while not received:
             tryCnt += 1
             try:
-                signal.alarm(10)  # Set a timeout of 10 seconds
-                client = OpenAI(api_key=self.openai_key)
-                response = client.chat.completions.create(
+                LLM.set_alarm(10)  # Set a timeout of 10 seconds
+                start_time = time.time()
+                response = self.get_openai_client().chat.completions.create(
                     model=self.online_model_name,
                     messages=model_input,
                     temperature=self.temperature,
+                    timeout=10,
+                    stream=stop_predicate is not None,
                 )
-                signal.alarm(0)  # Cancel the timeout
+                if stop_predicate is not None:
+                    output = self.read_stream(response, stop_predicate, start_time)
+                    LLM.set_alarm(0)  # Cancel the timeout
+                    break
+                LLM.set_alarm(0)  # Cancel the timeout
                 output = response.choices[0].message.content
+                self.record_usage(response.usage)
                 received = True
                 break
             except TimeoutError:
@@ -0,0 +1,75 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator
+
+
+class Metrics:
+    """
+    Metrics class for the wall-clock time of the analysis stages and the counters of the analysis events.
+    A stage is measured by a span, e.g., with metrics.span("propagation"): ...
+    The time and the number of the spans with the same name are accumulated.
+    """
+
+    def __init__(self) -> None:
+        self.span_times: Dict[str, float] = {}
+        self.span_counts: Dict[str, int] = {}
+        self.counters: Dict[str, int] = {}
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name: str) -> Iterator[None]:
+        """
+        Measure the wall-clock time of the enclosed block
+        :param name: the name of the stage
+        """
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start_time)
+
+    def add_time(self, name: str, seconds: float, count: int = 1) -> None:
+        with self.lock:
+            self.span_times[name] = self.span_times.get(name, 0.0) + seconds
+            self.span_counts[name] = self.span_counts.get(name, 0) + count
+
+    def increment(self, name: str, value: int = 1) -> None:
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def merge(self, other: "Metrics") -> "Metrics":
+        """
+        Accumulate the spans and the counters of another metrics
+        :param other: the metrics to be merged
+        :return the metrics itself
+        """
+        with other.lock:
+            span_times = dict(other.span_times)
+            span_counts = dict(other.span_counts)
+            counters = dict(other.counters)
+        for name in span_times:
+            self.add_time(name, span_times[name], span_counts[name])
+        for name in counters:
+            self.increment(name, counters[name])
+        return self
+
+    def to_dict(self) -> Dict:
+        with self.lock:
+            return {
+                "spans": {
+                    name: {
+                        "count": self.span_counts[name],
+                        "total_time": self.span_times[name],
+                    }
+                    for name in sorted(self.span_times)
+                },
+                "counters": {
+                    name: self.counters[name] for name in sorted(self.counters)
+                },
+            }
+
+    def dump(self, file_path: str) -> None:
+        with open(file_path, "w") as file:
+            json.dump(self.to_dict(), file, indent=4)